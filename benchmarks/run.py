@@ -0,0 +1,265 @@
+import argparse
+import contextlib
+import gc
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from benchmarks.stand_in import StandInAPI
+from benchmarks.synthetic import SCALES, generate_scale
+from event_pipeline import cache as cache_module
+from event_pipeline import session_catalog
+from event_pipeline.data_filter import DEFAULT_POLICY, FILTER_SETTINGS
+from event_pipeline.data_ingestor import builder_for
+from event_pipeline.db_schema import connect_db, insert_session_summary, migrate
+from event_pipeline.degradation import fit_sessions
+from event_pipeline.sectors import SectorColumns, analyse_sectors
+from event_pipeline.lap_analyzer import LapAnalyzer
+from event_pipeline.logging_config import configure_logging
+from event_pipeline.openf1_client import configure_base_url
+from event_pipeline.report import FORMATS, write_reports
+from event_pipeline.session import Session
+from event_pipeline.telemetry import TelemetryIngestor
+
+# python -m benchmarks.run --scales session weekend season --output bench.json [--compare baseline.json]
+
+DEFAULT_SCALES = ['session', 'weekend', 'season']
+
+
+def measure(fn, repeat=3, setup=None):
+    # best/median wall time over `repeat` runs, then one extra run under tracemalloc for peak memory
+    times = []
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        gc.collect()
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+
+    args = setup() if setup else ()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'best_s': min(times), 'median_s': statistics.median(times), 'peak_bytes': peak, 'repeat': repeat}
+
+
+@contextlib.contextmanager
+def local_api(api, workdir):
+    # point the pipeline at the stand-in with a fresh cache and catalog
+    configure_base_url(api.base_url)
+    cache_module.configure_cache(cache_dir=os.path.join(workdir, "openf1"))
+    session_catalog.configure_catalog(os.path.join(workdir, "catalog.db"))
+    try:
+        yield
+    finally:
+        configure_base_url(None)
+        cache_module.reset_cache()
+        session_catalog.reset_catalog()
+
+
+def bench_build(payloads, engine, policy=None):
+    build = builder_for(engine)
+    def run():
+        for laps, drivers, stints in payloads.values():
+            build(laps, drivers, stints, policy).build()
+    return run
+
+
+def built_sessions(catalog, payloads):
+    build = builder_for('python')
+    return [
+        (s, *build(*payloads[s['session_key']]).build())
+        for s in catalog
+    ]
+
+
+def bench_summary(sessions):
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            for info, drivers, teams in sessions:
+                LapAnalyzer(drivers, teams, info['circuit_short_name'], info['session_name'], info['year']).summary()
+    return run
+
+
+def bench_report(sessions, workdir, fmt):
+    # every session rendered into one file
+    reports = [LapAnalyzer(drivers, teams, info['circuit_short_name'], info['session_name'], info['year']).report()
+               for info, drivers, teams in sessions]
+    def run():
+        write_reports(reports, os.path.join(workdir, f"report.{fmt}"), fmt)
+    return run
+
+
+def bench_degradation(sessions):
+    # every driver/compound of every session in one batched fit
+    drivers = [drivers for _, drivers, _ in sessions]
+    def run():
+        fit_sessions(drivers)
+    return run
+
+
+def bench_sectors(payloads):
+    # sector columns of every session's laps + the vectorized best sector/theoretical best analysis
+    def run():
+        for laps, _, _ in payloads.values():
+            analyse_sectors(SectorColumns.from_laps(laps))
+    return run
+
+
+def bench_insert(sessions, workdir):
+    def setup():
+        conn = connect_db(os.path.join(tempfile.mkdtemp(dir=workdir), "insert.db"))
+        migrate(conn)
+        return (conn,)
+    def run(conn):
+        for info, drivers, _ in sessions:
+            insert_session_summary(conn, info['circuit_short_name'], info['year'], info['session_name'],
+                                   info['session_key'], drivers.values())
+        conn.close()
+    return run, setup
+
+
+def bench_session_run(catalog, api, workdir, engine):
+    def setup():
+        return (tempfile.mkdtemp(dir=workdir),)
+    def run(run_dir):
+        db_path = os.path.join(run_dir, "f1_analysis.db")
+        with local_api(api, run_dir), contextlib.redirect_stdout(io.StringIO()):
+            for info in catalog:
+                Session(info['circuit_short_name'], info['session_name'], str(info['year']),
+                        engine=engine, db_path=db_path).run()
+    return run, setup
+
+
+def bench_telemetry(catalog, payloads, api, workdir):
+    # windowed car_data ingest through the stand-in (fetch, downsample, store, per lap), two drivers of the
+    # first session: the stand-in generating car_data dominates beyond that
+    key = catalog[0]['session_key']
+    numbers = sorted({lap['driver_number'] for lap in payloads[key][0]})[:2]
+    laps = [lap for lap in payloads[key][0] if lap['driver_number'] in numbers]
+    def setup():
+        return (tempfile.mkdtemp(dir=workdir),)
+    def run(run_dir):
+        with local_api(api, run_dir):
+            TelemetryIngestor(key, store_dir=os.path.join(run_dir, "telemetry")).load(laps)
+    return run, setup
+
+
+def run_scale(scale, repeat, workdir):
+    catalog, payloads = generate_scale(scale)
+    laps = sum(len(p[0]) for p in payloads.values())
+    results = []
+
+    def record(name, stats):
+        stats.update(name=name, scale=scale, sessions=len(catalog), laps=laps,
+                     laps_per_s=laps / stats['best_s'] if stats['best_s'] else None)
+        results.append(stats)
+        print(f"{scale:>12} {name:<28} best {stats['best_s']:8.4f}s  median {stats['median_s']:8.4f}s  "
+              f"peak {stats['peak_bytes'] / 1e6:8.2f} MB", file=sys.stderr)
+
+    for engine in ('python', 'numpy'):
+        record(f"build[{engine}]", measure(bench_build(payloads, engine), repeat))
+    for strategy in ('iqr', 'mad'):
+        policy = DEFAULT_POLICY.with_specs([f"{c}={strategy}" for c in ('SOFT', 'MEDIUM', 'HARD')], FILTER_SETTINGS)
+        for engine in ('python', 'numpy'):
+            record(f"build[{engine},{strategy}]", measure(bench_build(payloads, engine, policy), repeat))
+
+    sessions = built_sessions(catalog, payloads)
+    record("summary", measure(bench_summary(sessions), repeat))
+    record("degradation", measure(bench_degradation(sessions), repeat))
+    record("sectors", measure(bench_sectors(payloads), repeat))
+    for fmt in FORMATS:
+        record(f"report[{fmt}]", measure(bench_report(sessions, workdir, fmt), repeat))
+
+    run, setup = bench_insert(sessions, workdir)
+    record("insert_session_summary", measure(run, repeat, setup))
+
+    with StandInAPI.synthetic(catalog, payloads) as api:
+        for engine in ('python', 'numpy'):
+            run, setup = bench_session_run(catalog, api, workdir, engine)
+            record(f"session_run[{engine}]", measure(run, repeat, setup))
+        run, setup = bench_telemetry(catalog, payloads, api, workdir)
+        record("telemetry[2 drivers]", measure(run, repeat, setup))
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(results, baseline_path, threshold):
+    # ratio > 1 means slower than the baseline
+    with open(baseline_path) as f:
+        baseline = {(r['scale'], r['name']): r for r in json.load(f)['results']}
+    regressions = []
+    print(f"\nCompared with {baseline_path}", file=sys.stderr)
+    for r in results:
+        old = baseline.get((r['scale'], r['name']))
+        if not old:
+            continue
+        time_ratio = r['best_s'] / old['best_s'] if old['best_s'] else float('inf')
+        mem_ratio = r['peak_bytes'] / old['peak_bytes'] if old['peak_bytes'] else float('inf')
+        flag = ''
+        if time_ratio > threshold or mem_ratio > threshold:
+            regressions.append(r)
+            flag = '  REGRESSION'
+        print(f"{r['scale']:>12} {r['name']:<28} time x{time_ratio:5.2f}  memory x{mem_ratio:5.2f}{flag}",
+              file=sys.stderr)
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Pipeline throughput benchmarks on synthetic OpenF1 data")
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=DEFAULT_SCALES)
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per benchmark")
+    parser.add_argument('--output', default='bench_results.json', help="Where to write the JSON results")
+    parser.add_argument('--compare', metavar='BASELINE', help="Earlier results file to compare against")
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help="Time/memory ratio above which --compare reports a regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_logging(log_dir=None, level=logging.WARNING)
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in args.scales:
+            results.extend(run_scale(scale, args.repeat, workdir))
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'revision': git_revision(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+    if args.compare:
+        return 1 if compare(results, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
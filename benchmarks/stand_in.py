@@ -0,0 +1,359 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+from benchmarks.synthetic import SCALES, car_data_duration, generate_car_data, generate_meetings, generate_scale
+
+# local OpenF1 look-alike for load, latency and failure testing.
+# point the pipeline at it with `main.py --api-url <base_url>` or $OPENF1_BASE_URL
+
+API_PREFIX = "/v1"
+
+
+def parse_filters(query):
+    # OpenF1 style filters: key=value, key>value, key<value
+    filters = []
+    for part in unquote(query).split('&'):
+        for op in ('>=', '<=', '>', '<', '='):
+            if op in part:
+                key, value = part.split(op, 1)
+                filters.append((key, op, value))
+                break
+    return filters
+
+
+def matches(record, filters):
+    for key, op, value in filters:
+        field = record.get(key)
+        if field is None:
+            return False
+        try:
+            value = type(field)(value)
+        except (TypeError, ValueError):
+            return False
+        if op == '=' and field != value:
+            return False
+        if op == '>' and not field > value:
+            return False
+        if op == '<' and not field < value:
+            return False
+        if op == '>=' and not field >= value:
+            return False
+        if op == '<=' and not field <= value:
+            return False
+    return True
+
+
+class SyntheticSource:
+    # serves synthetic.generate_* payloads, filtered like the real API.
+    # With a clock (callable -> aware datetime) laps/stints appear as a running session would publish them
+    def __init__(self, catalog, payloads, meetings=None, clock=None):
+        self.clock = clock
+        # payloads: session_key -> (laps, drivers, stints)
+        self.endpoints = {
+            'sessions': catalog,
+            'meetings': meetings or [],
+            'laps': [lap for laps, _, _ in payloads.values() for lap in laps],
+            'drivers': [driver for _, drivers, _ in payloads.values() for driver in drivers],
+            'stints': [stint for _, _, stints in payloads.values() for stint in stints],
+        }
+        # per session index so a request does not scan every session's laps
+        self.by_session = {
+            endpoint: self._index(records) for endpoint, records in self.endpoints.items()
+            if endpoint in ('laps', 'drivers', 'stints')
+        }
+        # (session_key, driver, lap_number) -> lap start, for the clock
+        self.lap_starts = {
+            (lap.get('session_key'), lap['driver_number'], lap['lap_number']): datetime.fromisoformat(lap['date_start'])
+            for lap in self.endpoints['laps'] if clock and lap.get('date_start')
+        }
+
+    @staticmethod
+    def _index(records):
+        index = {}
+        for record in records:
+            index.setdefault(record.get('session_key'), []).append(record)
+        return index
+
+    def query(self, endpoint, query):
+        if endpoint == 'car_data':
+            return self.car_data(parse_filters(query) if query else [])
+        if endpoint not in self.endpoints:
+            return None
+        filters = parse_filters(query) if query else []
+        records = self.endpoints[endpoint]
+        session_filter = [f for f in filters if f[0] == 'session_key' and f[1] == '=']
+        if session_filter and endpoint in self.by_session:
+            records = self.by_session[endpoint].get(int(session_filter[0][2]), [])
+        records = [r for r in records if matches(r, filters)]
+        if self.clock is not None and endpoint in ('laps', 'stints'):
+            records = self.as_of(endpoint, records, self.clock())
+        return records
+
+    def car_data(self, filters):
+        # generated per request from the laps of one driver that overlap the date filters (the full
+        # endpoint would be millions of records), so session_key and driver_number are required
+        fields = {(key, op): value for key, op, value in filters}
+        if ('session_key', '=') not in fields or ('driver_number', '=') not in fields:
+            return []
+        lower = fields.get(('date', '>=')) or fields.get(('date', '>'))
+        upper = fields.get(('date', '<')) or fields.get(('date', '<='))
+        lower = datetime.fromisoformat(lower) if lower else None
+        upper = datetime.fromisoformat(upper) if upper else None
+        driver = int(fields[('driver_number', '=')])
+        laps = []
+        for lap in self.by_session['laps'].get(int(fields[('session_key', '=')]), []):
+            if lap['driver_number'] != driver or not lap.get('date_start'):
+                continue
+            start = datetime.fromisoformat(lap['date_start'])
+            end = start + timedelta(seconds=car_data_duration(lap) or 0)
+            if (upper is None or start <= upper) and (lower is None or end >= lower):
+                laps.append(lap)
+        others = [f for f in filters if f[0] != 'date']
+        records = []
+        for record in generate_car_data(laps):
+            date = datetime.fromisoformat(record['date'])
+            if lower is not None and (date < lower if ('date', '>=') in fields else date <= lower):
+                continue
+            if upper is not None and (date >= upper if ('date', '<') in fields else date > upper):
+                continue
+            if matches(record, others):
+                records.append(record)
+        return records
+
+    def as_of(self, endpoint, records, now):
+        # laps that started by `now`, without a duration until they are complete. stints once their first lap started
+        visible = []
+        for r in records:
+            lap_number = r['lap_number'] if endpoint == 'laps' else r.get('lap_start')
+            start = self.lap_starts.get((r.get('session_key'), r['driver_number'], lap_number))
+            if start is None or start > now:
+                continue
+            if endpoint == 'laps' and r['lap_duration'] is not None and \
+                    start + timedelta(seconds=r['lap_duration']) > now:
+                r = dict(r, lap_duration=None)
+            visible.append(r)
+        return visible
+
+    def get(self, endpoint, query):
+        records = self.query(endpoint, query)
+        return None if records is None else json.dumps(records).encode()
+
+
+class ReplaySource:
+    # serves response bodies recorded by RecordingSource, keyed by endpoint + query
+    def __init__(self, directory):
+        self.directory = directory
+
+    @staticmethod
+    def key_for(endpoint, query):
+        return hashlib.sha1(f"{endpoint}?{query}".encode("utf-8")).hexdigest()
+
+    def path_for(self, endpoint, query):
+        return os.path.join(self.directory, f"{self.key_for(endpoint, query)}.json")
+
+    def get(self, endpoint, query):
+        path = self.path_for(endpoint, query)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+
+class RecordingSource(ReplaySource):
+    # proxies to a real API and stores every successful body for later replay
+    def __init__(self, directory, upstream):
+        super().__init__(directory)
+        self.upstream = upstream.rstrip("/")
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, endpoint, query):
+        import requests
+        url = f"{self.upstream}/{endpoint}" + (f"?{query}" if query else "")
+        response = requests.get(url, timeout=(5, 60))
+        if response.status_code != 200:
+            return None
+        body = response.content
+        path = self.path_for(endpoint, query)
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(body)
+        os.replace(f"{path}.tmp", path)
+        with self._lock:
+            with open(os.path.join(self.directory, "index.jsonl"), "a") as f:
+                f.write(json.dumps({'endpoint': endpoint, 'query': query, 'file': os.path.basename(path)}) + "\n")
+        return body
+
+
+class StandInAPI:
+    def __init__(self, source, latency=0.0, jitter=0.0, error_rate=0.0, error_codes=(500, 502, 503),
+                 rate_limit=None, drip_bytes=None, drip_delay=0.0, seed=0):
+        self.source = source
+        self.latency = latency # seconds before every response
+        self.jitter = jitter # extra random 0..jitter seconds
+        self.error_rate = error_rate # fraction of requests answered with one of error_codes
+        self.error_codes = error_codes
+        self.rate_limit = rate_limit # requests per second, excess requests get 429
+        self.drip_bytes = drip_bytes # send bodies in chunks of this size ...
+        self.drip_delay = drip_delay # ... with this pause between chunks
+        self.requests = 0
+        self.statuses = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recent = deque()
+        self.server = None
+        self.thread = None
+
+    @classmethod
+    def synthetic(cls, catalog, payloads, meetings=None, clock=None, **faults):
+        return cls(SyntheticSource(catalog, payloads, meetings, clock), **faults)
+
+    @classmethod
+    def replay(cls, directory, **faults):
+        return cls(ReplaySource(directory), **faults)
+
+    def _admit(self):
+        # -> (status code to fail with or None, seconds to wait)
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0)
+            if self.rate_limit:
+                now = time.monotonic()
+                while self._recent and now - self._recent[0] >= 1:
+                    self._recent.popleft()
+                if len(self._recent) >= self.rate_limit:
+                    return 429, delay
+                self._recent.append(now)
+            if self.error_rate and self._rng.random() < self.error_rate:
+                return self._rng.choice(self.error_codes), delay
+        return None, delay
+
+    def handle(self, request):
+        path, _, query = request.path.partition('?')
+        failure, delay = self._admit()
+        if delay:
+            time.sleep(delay)
+
+        body = None
+        if failure is None:
+            endpoint = path[len(API_PREFIX) + 1:] if path.startswith(API_PREFIX + "/") else None
+            try:
+                body = self.source.get(endpoint, query) if endpoint else None
+            except Exception:
+                failure = 502
+            else:
+                if body is None:
+                    failure = 404
+        if failure is not None:
+            body = json.dumps({'detail': f"stand-in error {failure}"}).encode()
+
+        status = failure or 200
+        with self._lock:
+            self.statuses[status] += 1
+        request.send_response(status)
+        request.send_header('Content-Type', 'application/json')
+        request.send_header('Content-Length', str(len(body)))
+        if status == 429:
+            request.send_header('Retry-After', '1')
+        request.end_headers()
+
+        if not self.drip_bytes or failure:
+            request.wfile.write(body)
+            return
+        for start in range(0, len(body), self.drip_bytes):
+            request.wfile.write(body[start:start + self.drip_bytes])
+            request.wfile.flush()
+            if self.drip_delay:
+                time.sleep(self.drip_delay)
+
+    def start(self, host='127.0.0.1', port=0):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                try:
+                    api.handle(self)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass # client gave up, e.g. on a timeout
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self.base_url
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Local OpenF1 stand-in server")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--synthetic', metavar='SCALE', choices=list(SCALES), help="Serve generated data at this scale")
+    source.add_argument('--replay', metavar='DIR', help="Serve responses recorded with --record")
+    source.add_argument('--record', metavar='DIR', help="Proxy to --upstream and record every response")
+    parser.add_argument('--upstream', default="https://api.openf1.org/v1", help="API to record from")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Random extra latency, up to this many seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests failing with 5xx")
+    parser.add_argument('--rate-limit', type=int, help="Requests per second before answering 429")
+    parser.add_argument('--drip-bytes', type=int, help="Send bodies slowly, this many bytes at a time")
+    parser.add_argument('--drip-delay', type=float, default=0.0, help="Seconds between dripped chunks")
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.synthetic:
+        catalog, payloads = generate_scale(args.synthetic)
+        meetings = [m for year in SCALES[args.synthetic][0] for m in generate_meetings(year)]
+        source = SyntheticSource(catalog, payloads, meetings)
+    elif args.replay:
+        source = ReplaySource(args.replay)
+    else:
+        source = RecordingSource(args.record, args.upstream)
+
+    api = StandInAPI(source, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                     rate_limit=args.rate_limit, drip_bytes=args.drip_bytes, drip_delay=args.drip_delay,
+                     seed=args.seed)
+    print(f"OpenF1 stand-in on {api.start(args.host, args.port)} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api.stop()
+        print(f"{api.requests} requests: {dict(api.statuses)}")
+
+
+if __name__ == '__main__':
+    main()
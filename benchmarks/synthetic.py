@@ -0,0 +1,192 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+# deterministic OpenF1-shaped payloads for benchmarks and load tests
+
+TEAMS = [
+    ("McLaren", [(4, "Lando", "Norris"), (81, "Oscar", "Piastri")]),
+    ("Ferrari", [(16, "Charles", "Leclerc"), (44, "Lewis", "Hamilton")]),
+    ("Red Bull Racing", [(1, "Max", "Verstappen"), (22, "Yuki", "Tsunoda")]),
+    ("Mercedes", [(63, "George", "Russell"), (12, "Kimi", "Antonelli")]),
+    ("Aston Martin", [(14, "Fernando", "Alonso"), (18, "Lance", "Stroll")]),
+    ("Alpine", [(10, "Pierre", "Gasly"), (43, "Franco", "Colapinto")]),
+    ("Williams", [(23, "Alexander", "Albon"), (55, "Carlos", "Sainz")]),
+    ("Racing Bulls", [(6, "Isack", "Hadjar"), (30, "Liam", "Lawson")]),
+    ("Kick Sauber", [(27, "Nico", "Hulkenberg"), (5, "Gabriel", "Bortoleto")]),
+    ("Haas F1 Team", [(31, "Esteban", "Ocon"), (87, "Oliver", "Bearman")]),
+]
+
+CIRCUITS = [
+    ("Sakhir", "Bahrain", 92.0), ("Jeddah", "Saudi Arabia", 89.0), ("Melbourne", "Australia", 78.0),
+    ("Suzuka", "Japan", 90.0), ("Shanghai", "China", 94.0), ("Miami", "United States", 88.0),
+    ("Imola", "Italy", 77.0), ("Monte Carlo", "Monaco", 72.0), ("Montreal", "Canada", 74.0),
+    ("Catalunya", "Spain", 74.0), ("Spielberg", "Austria", 66.0), ("Silverstone", "United Kingdom", 88.0),
+    ("Hungaroring", "Hungary", 77.0), ("Spa-Francorchamps", "Belgium", 105.0), ("Zandvoort", "Netherlands", 72.0),
+    ("Monza", "Italy", 81.0), ("Baku", "Azerbaijan", 103.0), ("Singapore", "Singapore", 92.0),
+    ("Austin", "United States", 95.0), ("Mexico City", "Mexico", 78.0), ("Interlagos", "Brazil", 71.0),
+    ("Las Vegas", "United States", 94.0), ("Lusail", "Qatar", 83.0), ("Yas Marina Circuit", "UAE", 84.0),
+]
+
+PRACTICE_SESSIONS = ["Practice 1", "Practice 2", "Practice 3"]
+COMPOUND_OFFSET = {"SOFT": 0.0, "MEDIUM": 0.6, "HARD": 1.1}
+COMPOUND_DEG = {"SOFT": 0.12, "MEDIUM": 0.07, "HARD": 0.04}
+GARAGE_TIME = 240 # seconds in the garage between two stints
+CAR_DATA_HZ = 3.7 # car_data samples per second
+# (share of the lap, top speed km/h) per straight of the synthetic lap, each ends in a braking zone
+LAP_SEGMENTS = ((0.22, 320), (0.18, 240), (0.25, 300), (0.15, 180), (0.20, 310))
+
+
+def session_key_for(year, event_idx, session_idx):
+    return year * 1000 + event_idx * 10 + session_idx
+
+
+def session_start(year, event_idx, session_idx):
+    weekend = datetime(max(year, 1), 3, 1, 11, 30, tzinfo=timezone.utc) + timedelta(weeks=event_idx)
+    return weekend + timedelta(hours=4 * session_idx)
+
+
+def generate_catalog(years=(2024,), events=len(CIRCUITS), session_names=PRACTICE_SESSIONS):
+    # /v1/sessions records for every practice session in the requested seasons
+    sessions = []
+    for year in years:
+        for event_idx, (circuit, country, _) in enumerate(CIRCUITS[:events]):
+            for session_idx, session_name in enumerate(session_names):
+                date_start = session_start(year, event_idx, session_idx)
+                sessions.append({
+                    "session_key": session_key_for(year, event_idx, session_idx),
+                    "meeting_key": year * 100 + event_idx,
+                    "circuit_short_name": circuit,
+                    "country_name": country,
+                    "year": year,
+                    "session_name": session_name,
+                    "session_type": "Practice",
+                    "date_start": date_start.isoformat(),
+                    "date_end": (date_start + timedelta(hours=1)).isoformat(),
+                })
+    return sessions
+
+
+def generate_meetings(year, events=len(CIRCUITS)):
+    return [
+        {"meeting_key": year * 100 + idx, "circuit_short_name": circuit, "country_name": country, "year": year}
+        for idx, (circuit, country, _) in enumerate(CIRCUITS[:events])
+    ]
+
+
+def generate_session(session_key, laps_per_driver=30, base_time=None, seed=None):
+    # returns (laps, drivers, stints) for one practice session
+    rng = random.Random(session_key if seed is None else seed)
+    if base_time is None:
+        base_time = CIRCUITS[(session_key // 10) % len(CIRCUITS)][2]
+    # lap start times follow the catalog dates of session_key_for() keys
+    start = session_start(session_key // 1000, (session_key % 1000) // 10, session_key % 10)
+
+    drivers, laps, stints = [], [], []
+    for team_idx, (team, team_drivers) in enumerate(TEAMS):
+        for number, first, last in team_drivers:
+            drivers.append({
+                "driver_number": number, "first_name": first, "last_name": last,
+                "full_name": f"{first} {last.upper()}", "team_name": team, "session_key": session_key,
+            })
+            pace = base_time + team_idx * 0.12 + rng.uniform(-0.2, 0.2)
+            clock = start + timedelta(minutes=2 + team_idx)
+            lap_number = 1
+            stint_number = 1
+            remaining = max(5, int(rng.gauss(laps_per_driver, laps_per_driver * 0.15)))
+            while remaining > 0:
+                compound = rng.choice(["SOFT", "SOFT", "MEDIUM", "MEDIUM", "HARD"])
+                length = min(remaining, rng.randint(3, 12))
+                tyre_age = rng.choice([0, 0, 3])
+                stints.append({
+                    "driver_number": number, "stint_number": stint_number, "compound": compound,
+                    "lap_start": lap_number, "lap_end": lap_number + length - 1,
+                    "tyre_age_at_start": tyre_age, "session_key": session_key,
+                })
+                for age in range(length):
+                    is_pit_out = age == 0
+                    lap_time = pace + COMPOUND_OFFSET[compound] + COMPOUND_DEG[compound] * (tyre_age + age)
+                    lap_time += rng.gauss(0, 0.25)
+                    if rng.random() < 0.2:
+                        lap_time += rng.uniform(8, 25) # cool down / traffic lap
+                    s1 = lap_time * 0.31
+                    s2 = lap_time * 0.37
+                    laps.append({
+                        "driver_number": number,
+                        "lap_number": lap_number,
+                        "lap_duration": None if rng.random() < 0.02 else round(lap_time, 3),
+                        "duration_sector_1": round(s1, 3),
+                        "duration_sector_2": round(s2, 3),
+                        "duration_sector_3": round(lap_time - s1 - s2, 3),
+                        "i1_speed": rng.randint(250, 300),
+                        "i2_speed": rng.randint(250, 300),
+                        "st_speed": rng.randint(290, 335),
+                        "is_pit_out_lap": is_pit_out,
+                        "date_start": clock.isoformat(timespec='milliseconds'),
+                        "session_key": session_key,
+                    })
+                    lap_number += 1
+                    clock += timedelta(seconds=lap_time)
+                remaining -= length
+                clock += timedelta(seconds=GARAGE_TIME)
+                stint_number += 1
+
+    # OpenF1 returns laps roughly in time order, not grouped by driver
+    laps.sort(key=lambda lap: (lap["lap_number"], rng.random()))
+    return laps, drivers, stints
+
+
+def car_data_duration(lap):
+    # seconds of car_data a lap has: its duration, the sector times while the duration is missing
+    sectors = [lap.get(f"duration_sector_{i}") for i in (1, 2, 3)]
+    return lap.get("lap_duration") or (sum(sectors) if None not in sectors else None)
+
+
+def generate_car_data(laps, rate=CAR_DATA_HZ):
+    # /v1/car_data records for these laps (one session): a speed/throttle/brake trace per lap, in date order.
+    # Deterministic per lap so any time window can be generated on its own
+    records = []
+    for lap in sorted(laps, key=lambda lap: (lap["driver_number"], lap["date_start"])):
+        duration = car_data_duration(lap)
+        if not duration or not lap.get("date_start"):
+            continue
+        rng = random.Random(f"{lap.get('session_key')}/{lap['driver_number']}/{lap['lap_number']}")
+        start = datetime.fromisoformat(lap["date_start"])
+        push = 0.9 if lap.get("is_pit_out_lap") else rng.uniform(0.97, 1.0)
+        elapsed = 0.0
+        for share, top in LAP_SEGMENTS:
+            length = duration * share
+            t = 0.0
+            while t < length:
+                phase = t / length
+                braking = phase > 0.85
+                speed = top * push * (0.55 + 0.45 * min(1.0, phase / 0.6)) if not braking else top * 0.5
+                records.append({
+                    "driver_number": lap["driver_number"],
+                    "date": (start + timedelta(seconds=elapsed + t)).isoformat(timespec='milliseconds'),
+                    "speed": int(speed + rng.uniform(-3, 3)),
+                    "throttle": 0 if braking else (100 if phase > 0.3 else int(60 + 40 * phase / 0.3)),
+                    "brake": 100 if braking else 0,
+                    "rpm": int(7000 + 5000 * speed / 340),
+                    "n_gear": min(8, 2 + int(speed // 45)),
+                    "drs": 0,
+                    "session_key": lap.get("session_key"),
+                })
+                t += 1.0 / rate
+            elapsed += length
+    return records
+
+
+SCALES = {
+    # name -> (years, events per year, sessions per event)
+    'session': ((2024,), 1, 1),
+    'weekend': ((2024,), 1, 3),
+    'season': ((2024,), 24, 3),
+    'multi-season': ((2023, 2024, 2025), 24, 3),
+}
+
+def generate_scale(scale):
+    # catalog + payloads for every session at a named scale
+    years, events, sessions_per_event = SCALES[scale]
+    catalog = generate_catalog(years, events, PRACTICE_SESSIONS[:sessions_per_event])
+    payloads = {s["session_key"]: generate_session(s["session_key"]) for s in catalog}
+    return catalog, payloads
@@ -0,0 +1,172 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .cache import configure_cache
+from .metrics import from_dict, profiled
+from .openf1_client import configure_base_url, session_finished
+from .session import Session
+from .session_catalog import get_catalog, configure_catalog
+from .logging_config import get_logger, clean_filename, configure_worker_logging, worker_log_queue
+logger = get_logger()
+
+
+def jobs_from_spec(years, session_type=None, tracks=None):
+    # e.g. years=[2024, 2025], session_type="practice" -> every finished practice session
+    catalog = get_catalog()
+    catalog.refresh()
+    wanted_tracks = {t.strip().lower() for t in tracks} if tracks else None
+
+    jobs = []
+    for session in catalog.find_sessions(years, session_type):
+        if wanted_tracks and session['circuit_short_name'].lower() not in wanted_tracks:
+            continue
+        if not session_finished(session):
+            continue
+        jobs.append((session['circuit_short_name'], session['session_name'], str(session['year'])))
+    return jobs
+
+def parse_job(text):
+    # "track,session,year" -> tuple
+    parts = [p.strip() for p in text.split(',')]
+    if len(parts) != 3 or not parts[2].isdigit():
+        raise ValueError(f"Invalid session '{text}', expected 'track,session,year'")
+    return parts[0], parts[1], parts[2]
+
+
+def _init_worker(cache_options, catalog_path, base_url=None, log_queue=None, log_level=None):
+    configure_worker_logging(log_queue, log_level or logger.getEffectiveLevel())
+    if base_url is not None:
+        configure_base_url(base_url)
+    if cache_options is not None:
+        configure_cache(**cache_options)
+    if catalog_path is not None:
+        configure_catalog(catalog_path)
+
+def run_job(job, show_summary=False, session_options=None, profile_dir=None, report=False):
+    # report=True returns the session report data, the parent renders all of them into one file
+    track_name, session_name, year = job
+    start = time.perf_counter()
+    result = {
+        'track': track_name,
+        'session': session_name,
+        'year': year,
+        'session_key': None,
+        'drivers': 0,
+        'ok': False,
+        'error': None,
+        'metrics': None,
+        'report': None,
+    }
+    try:
+        session = Session(track_name, session_name, year, **(session_options or {}))
+        if profile_dir:
+            name = clean_filename(f"{track_name}_{session_name}_{year}")
+            with profiled(os.path.join(profile_dir, f"{name}.prof"), limit=None):
+                session.run(show_summary=show_summary)
+        else:
+            session.run(show_summary=show_summary)
+        result['metrics'] = session.metrics.to_dict()
+        result['session_key'] = session.session_key
+        result['drivers'] = len(session.drivers)
+        if not session.session_key:
+            result['error'] = "Invalid session key"
+        elif not session.drivers:
+            result['error'] = "No lap data"
+        else:
+            result['ok'] = True
+            if report:
+                result['report'] = session.analyzer.report(session.session_key)
+    except Exception as e:
+        result['error'] = str(e)
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    return result
+
+
+class BatchResult:
+    def __init__(self, results):
+        self.results = results
+
+    @property
+    def succeeded(self):
+        return [r for r in self.results if r['ok']]
+
+    @property
+    def failed(self):
+        return [r for r in self.results if not r['ok']]
+
+    def metrics(self):
+        return [from_dict(r['metrics']) for r in self.results if r.get('metrics')]
+
+    def stage_totals(self):
+        # seconds per stage summed over all jobs, slowest first
+        totals = {}
+        for metrics in self.metrics():
+            for name, seconds in metrics.stage_totals().items():
+                totals[name] = totals.get(name, 0.0) + seconds
+        return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+    def reports(self):
+        # report data of the successful jobs, in job order
+        return [r['report'] for r in self.results if r['ok'] and r.get('report')]
+
+    def write_report(self, path, fmt=None):
+        # every session into one file through one buffered writer
+        from .report import write_reports
+        return write_reports(self.reports(), path, fmt)
+
+    def print_report(self):
+        print(f"\nBatch finished: {len(self.succeeded)} succeeded, {len(self.failed)} failed")
+        print("-" * 60)
+        for r in self.failed:
+            print(f"FAILED {r['track']} - {r['session']} ({r['year']}): {r['error']}")
+        totals = self.stage_totals()
+        if totals:
+            print("Time per stage (all sessions): " +
+                  ", ".join(f"{name} {seconds:.2f}s" for name, seconds in totals.items() if name != 'run'))
+
+
+class BatchRunner:
+    def __init__(self, jobs, workers=None, show_summary=False, cache_options=None, catalog_path=None,
+                 session_options=None, base_url=None, profile_dir=None, report=False):
+        self.jobs = list(jobs)
+        self.report = report # collect session report data from the workers
+        self.profile_dir = profile_dir # one cProfile .prof file per job
+        self.base_url = base_url # OpenF1 base URL for the workers, e.g. a local stand-in
+        self.session_options = session_options or {} # passed to every Session
+        self.workers = workers or os.cpu_count() or 1
+        self.show_summary = show_summary
+        self.cache_options = cache_options
+        self.catalog_path = catalog_path
+
+    def run(self):
+        logger.info("Running %s sessions on %s workers", len(self.jobs), self.workers)
+        if not self.jobs:
+            return BatchResult([])
+
+        if self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+        results = []
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(self.jobs)),
+                                 initializer=_init_worker,
+                                 initargs=(self.cache_options, self.catalog_path, self.base_url,
+                                           worker_log_queue(), logger.getEffectiveLevel())) as pool:
+            futures = {
+                pool.submit(run_job, job, self.show_summary, self.session_options, self.profile_dir, self.report): job
+                for job in self.jobs
+            }
+            for future in as_completed(futures):
+                track_name, session_name, year = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # worker process died
+                    result = {'track': track_name, 'session': session_name, 'year': year, 'session_key': None,
+                              'drivers': 0, 'ok': False, 'error': str(e), 'metrics': None, 'report': None}
+                status = "ok" if result['ok'] else f"failed: {result['error']}"
+                logger.info("%s - %s (%s) %s", track_name, session_name, year, status)
+                results.append(result)
+
+        # keep the report in job order
+        order = {job: idx for idx, job in enumerate(self.jobs)}
+        results.sort(key=lambda r: order.get((r['track'], r['session'], r['year']), 0))
+        return BatchResult(results)
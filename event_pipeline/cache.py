@@ -0,0 +1,173 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from .defaults import DEFAULT_CACHE_DIR, DEFAULT_CATALOG_TTL, DEFAULT_MAX_BYTES
+from .logging_config import get_logger
+logger = get_logger()
+
+
+
+class OfflineCacheMiss(Exception):
+    pass
+
+
+class ResponseCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, catalog_ttl=DEFAULT_CATALOG_TTL,
+                 max_bytes=DEFAULT_MAX_BYTES, offline=False):
+        self.cache_dir = cache_dir
+        self.catalog_ttl = catalog_ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock() # lookups run in fetch threads
+        self._ready = False
+
+    def _connect(self):
+        # short lived connections so threads and worker processes can share the index
+        if not self._ready:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        conn = sqlite3.connect(os.path.join(self.cache_dir, "index.db"), timeout=30)
+        if not self._ready:
+            conn.executescript('''
+            CREATE TABLE IF NOT EXISTS Entry (
+                key         TEXT PRIMARY KEY,
+                url         TEXT NOT NULL,
+                size        INTEGER NOT NULL,
+                stored_at   REAL NOT NULL,
+                last_access REAL NOT NULL,
+                permanent   INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_entry_access ON Entry(last_access);
+            ''')
+            self._ready = True
+        return conn
+
+    @staticmethod
+    def key_for(url):
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def path_for(self, url):
+        return os.path.join(self.cache_dir, f"{self.key_for(url)}.json")
+
+    def lookup(self, url, ttl=None, permanent=False):
+        # ttl None -> entry never expires. Offline mode ignores expiry entirely.
+        # permanent -> only entries stored as permanent: a payload cached while the session was still open
+        # is a miss once it has finished, so the final data replaces it
+        key = self.key_for(url)
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT stored_at, permanent FROM Entry WHERE key = ?", (key,)).fetchone()
+            path = self.path_for(url)
+            if row is None or not os.path.exists(path):
+                self._count_miss()
+                return None
+
+            stored_at, stored_permanent = row
+            expired = not stored_permanent and (permanent or ttl is not None and time.time() - stored_at > ttl)
+            if expired and not self.offline:
+                self._count_miss()
+                return None
+
+            conn.execute("UPDATE Entry SET last_access = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+        finally:
+            conn.close()
+        with self._stats_lock:
+            self.hits += 1
+        return path
+
+    def _count_miss(self):
+        with self._stats_lock:
+            self.misses += 1
+
+    def get(self, url, ttl=None, permanent=False):
+        path = self.lookup(url, ttl, permanent)
+        if path is None:
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+    def temp_path(self, url):
+        if not self._ready:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        return f"{self.path_for(url)}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def put(self, url, body, permanent=False):
+        tmp_path = self.temp_path(url)
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+        return self.put_file(url, tmp_path, permanent)
+
+    def put_file(self, url, tmp_path, permanent=False):
+        # moves an already written response body into the cache
+        key = self.key_for(url)
+        path = self.path_for(url)
+        conn = self._connect()
+        try:
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+
+            now = time.time()
+            conn.execute('''
+                INSERT OR REPLACE INTO Entry (key, url, size, stored_at, last_access, permanent)
+                VALUES (?, ?, ?, ?, ?, ?)''', (key, url, size, now, now, int(permanent)))
+            self._evict(conn, keep=key)
+            conn.commit()
+        finally:
+            conn.close()
+        return path
+
+    def _evict(self, conn, keep=None):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM Entry").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # until we are back under budget: expired entries, then the other TTL entries, then permanent
+        # (finished session) ones, each least recently used first. `keep` (the entry just written) stays
+        expired_before = time.time() - self.catalog_ttl
+        evicted = []
+        for key, size in conn.execute('''
+                SELECT key, size FROM Entry WHERE key != ?
+                ORDER BY CASE WHEN permanent THEN 2 WHEN stored_at < ? THEN 0 ELSE 1 END, last_access''',
+                (keep or '', expired_before)):
+            if total <= self.max_bytes:
+                break
+            evicted.append(key)
+            total -= size
+
+        conn.executemany("DELETE FROM Entry WHERE key = ?", [(k,) for k in evicted])
+        for key in evicted:
+            try:
+                os.remove(os.path.join(self.cache_dir, f"{key}.json"))
+            except FileNotFoundError:
+                pass
+        logger.debug("Evicted %s cached responses", len(evicted))
+
+    def total_bytes(self):
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COALESCE(SUM(size), 0) FROM Entry").fetchone()[0]
+        finally:
+            conn.close()
+
+
+_cache = None
+
+def configure_cache(**kwargs):
+    global _cache
+    _cache = ResponseCache(**kwargs)
+    return _cache
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache()
+    return _cache
+
+def reset_cache():
+    # drops the configured cache, the next get_cache() opens the default one
+    global _cache
+    _cache = None
@@ -0,0 +1,230 @@
+from array import array
+import numpy as np
+from .data_filter import DriverBuilder
+from .logging_config import get_logger
+logger = get_logger()
+
+UNKNOWN = "Unknown"
+
+
+class CompoundCodes:
+    # compound value <-> small int code, "Unknown" is always 0
+    def __init__(self):
+        self.values = [UNKNOWN]
+        self.codes = {UNKNOWN: 0}
+
+    def code(self, compound):
+        if compound not in self.codes:
+            self.codes[compound] = len(self.values)
+            self.values.append(compound)
+        return self.codes[compound]
+
+
+def lap_columns(lap_data):
+    # lap dicts (list or stream) -> parallel arrays in one pass, None becomes 0 / -1 / nan
+    drivers, lap_numbers, times = array('q'), array('q'), array('d')
+    deleted, pit_out = array('b'), array('b')
+    for lap in lap_data:
+        lap_number = lap.get('lap_number')
+        lap_time = lap.get('lap_duration')
+        drivers.append(lap.get('driver_number') or 0)
+        lap_numbers.append(-1 if lap_number is None else lap_number)
+        times.append(np.nan if lap_time is None else lap_time)
+        deleted.append(bool(lap.get('deleted', False)))
+        pit_out.append(bool(lap.get('is_pit_out_lap', False)))
+    return (
+        np.frombuffer(drivers, dtype=np.int64),
+        np.frombuffer(lap_numbers, dtype=np.int64),
+        np.frombuffer(times, dtype=np.float64),
+        np.frombuffer(deleted, dtype=np.int8).astype(bool),
+        np.frombuffer(pit_out, dtype=np.int8).astype(bool),
+    )
+
+
+def stint_columns(tire_data, codes):
+    stints = [s for s in tire_data if s.get('driver_number') and s.get('lap_start') is not None]
+    drivers = np.array([s['driver_number'] for s in stints], dtype=np.int64)
+    starts = np.array([s['lap_start'] for s in stints], dtype=np.int64)
+    # open stints (live sessions) have no lap_end yet
+    ends = np.array([np.iinfo(np.int32).max if s.get('lap_end') is None else s['lap_end'] for s in stints],
+                    dtype=np.int64)
+    compounds = np.array([codes.code(s.get('compound')) for s in stints], dtype=np.int64)
+    numbers = np.array([s.get('stint_number') or 0 for s in stints], dtype=np.int64)
+    ages = np.array([s.get('tyre_age_at_start') or 0 for s in stints], dtype=np.float64)
+    return drivers, starts, ends, compounds, numbers, ages
+
+
+def match_stints(lap_drivers, lap_numbers, stint_drivers, stint_starts, stint_ends):
+    # index of the stint every lap was driven in, -1 when no stint covers it.
+    # stints are sorted by (driver, lap_start) and searched once for every lap.
+    # OpenF1 stints of one driver never overlap so the preceding stint is the only candidate.
+    result = np.full(len(lap_drivers), -1, dtype=np.int64)
+    if not len(stint_drivers) or not len(lap_drivers):
+        return result
+
+    order = np.lexsort((stint_starts, stint_drivers))
+    s_drivers = stint_drivers[order]
+    s_starts = stint_starts[order]
+    s_ends = stint_ends[order]
+
+    stride = max(int(s_ends.max()), int(lap_numbers.max()), 0) + 2
+    stint_keys = s_drivers * stride + s_starts
+    lap_keys = lap_drivers * stride + lap_numbers
+    idx = np.searchsorted(stint_keys, lap_keys, side='right') - 1
+    safe_idx = np.clip(idx, 0, None)
+
+    match = ((idx >= 0) & (lap_numbers >= 0)
+             & (s_drivers[safe_idx] == lap_drivers)
+             & (lap_numbers <= s_ends[safe_idx]))
+    result[match] = order[safe_idx[match]]
+    return result
+
+
+def assign_compounds(lap_drivers, lap_numbers, stint_drivers, stint_starts, stint_ends, stint_codes):
+    stint_idx = match_stints(lap_drivers, lap_numbers, stint_drivers, stint_starts, stint_ends)
+    return stint_values(stint_idx, stint_codes, 0)
+
+
+def stint_values(stint_idx, values, missing):
+    # per lap value of its stint, `missing` for laps without one
+    result = np.full(len(stint_idx), missing, dtype=values.dtype)
+    matched = stint_idx >= 0
+    result[matched] = values[stint_idx[matched]]
+    return result
+
+
+def tyre_ages(stint_idx, lap_numbers, stint_starts, stint_ages):
+    # age when fitted + laps since the stint started, nan without a stint
+    return stint_values(stint_idx, stint_ages, np.nan) + (lap_numbers - stint_values(stint_idx, stint_starts, 0))
+
+
+class LapGroups:
+    # lap times of many (driver, compound) groups as flat columns. Per group order statistics use one
+    # np.partition over a padded group x lap matrix (partial selection, no sort of the lap times)
+    def __init__(self, times, group_ids, n_groups):
+        self.times = times
+        self.group_ids = group_ids
+        self.n_groups = n_groups
+        self.counts = np.bincount(group_ids, minlength=n_groups)
+        # slot of every lap within its group, in lap order
+        order = np.argsort(group_ids, kind='stable')
+        starts = np.concatenate(([0], np.cumsum(self.counts)[:-1]))
+        self.slots = np.empty(len(times), dtype=np.int64)
+        self.slots[order] = np.arange(len(times)) - starts[group_ids[order]]
+        self._fastest = None
+
+    @property
+    def fastest(self):
+        if self._fastest is None:
+            self._fastest = np.full(self.n_groups, np.inf)
+            np.minimum.at(self._fastest, self.group_ids, self.times)
+        return self._fastest
+
+    def matrix(self, values, rows):
+        # values of the groups in `rows`, one row each, padded with inf
+        row_of = np.full(self.n_groups, -1)
+        row_of[rows] = np.arange(len(rows))
+        matrix = np.full((len(rows), int(self.counts[rows].max())), np.inf)
+        member = row_of[self.group_ids] >= 0
+        matrix[row_of[self.group_ids[member]], self.slots[member]] = values[member]
+        return matrix
+
+    def kth_smallest(self, values, rows, k):
+        # k (0 based, per row) smallest value of each group in rows
+        matrix = self.matrix(values, rows)
+        matrix.partition(np.unique(k), axis=1)
+        return matrix[np.arange(len(rows)), k]
+
+    def quantile(self, values, rows, q):
+        # linear interpolation between closest ranks, same arithmetic as lap_filters.quantile
+        pos = q * (self.counts[rows] - 1)
+        lo = pos.astype(np.int64)
+        hi = np.minimum(lo + 1, self.counts[rows] - 1)
+        matrix = self.matrix(values, rows)
+        matrix.partition(np.unique(np.concatenate((lo, hi))), axis=1)
+        r = np.arange(len(rows))
+        return matrix[r, lo] + (matrix[r, hi] - matrix[r, lo]) * (pos - lo)
+
+
+class ColumnarDriverBuilder(DriverBuilder):
+    # Same output as DriverBuilder, computed over NumPy columns instead of per lap dicts.
+    def build(self):
+        logger.info("Building driver objects and assigning lap/tirre data (columnar)")
+        codes = CompoundCodes()
+        drivers, lap_numbers, times, deleted, pit_out = lap_columns(self.lap_data)
+        stint_drivers, stint_starts, stint_ends, stint_codes, stint_numbers, stint_ages = \
+            stint_columns(self.tire_data, codes)
+        stint_idx = match_stints(drivers, lap_numbers, stint_drivers, stint_starts, stint_ends)
+        return self.build_columns(drivers, times, ~deleted & ~pit_out, stint_values(stint_idx, stint_codes, 0),
+                                  codes.values, tyre_ages(stint_idx, lap_numbers, stint_starts, stint_ages),
+                                  stint_values(stint_idx, stint_numbers, 0))
+
+    def build_columns(self, drivers, times, usable, compound_codes, compound_values, ages=None, stints=None):
+        # drivers/times/compound codes per lap in original order, usable = not deleted and not a pit out lap.
+        # ages/stints: tyre age (nan unknown) and stint number (0 unknown) per lap, for the degradation fit
+        self.build_lookups()
+        drivers = np.asarray(drivers, dtype=np.int64)
+        compound_codes = np.asarray(compound_codes, dtype=np.int64)
+        ages = np.full(len(times), np.nan) if ages is None else np.asarray(ages, dtype=np.float64)
+        stints = np.zeros(len(times), dtype=np.int64) if stints is None else np.asarray(stints, dtype=np.int64)
+
+        # skip out laps, deleted laps and laps without a time
+        valid = (drivers != 0) & ~np.isnan(times) & usable
+        self.laps_seen = len(times)
+        self.laps_usable = int(valid.sum())
+        self.assign_laps(drivers[valid], times[valid], compound_codes[valid], compound_values, ages[valid],
+                         stints[valid])
+
+        logger.debug("Total laps processed: %s", len(times))
+        logger.debug("Total drivers mapped: %s", len(self.drivers))
+
+        return self.drivers, self.teams
+
+    @classmethod
+    def from_store(cls, store, policy=None):
+        # build straight from a memory mapped LapStore, no JSON or dicts
+        driver_data = [
+            {'driver_number': number, 'first_name': name, 'last_name': '', 'team_name': team}
+            for number, (name, team) in store.drivers.items()
+        ]
+        builder = cls([], driver_data, [], policy)
+        return builder.build_columns(store.driver_number, store.lap_duration, store.usable(),
+                                     store.compound, store.compounds, store.tyre_age, store.stint_number)
+
+    def filter_laps(self, drivers, times, compound_codes, compound_values):
+        # returns (kept lap indexes in output order, first lap index per driver)
+        n_codes = len(compound_values)
+        group_keys = drivers * n_codes + compound_codes
+        _, first_idx, group_ids = np.unique(group_keys, return_index=True, return_inverse=True)
+        groups = LapGroups(times, group_ids, len(first_idx))
+
+        # one batched pass per strategy over every group that uses it
+        group_codes = compound_codes[first_idx]
+        strategies = [self.policy.strategy_for(compound_values[c]) for c in range(n_codes)]
+        keep = np.zeros(len(times), dtype=bool)
+        for strategy in {id(s): s for s in strategies}.values():
+            uses = np.array([s is strategy for s in strategies])
+            keep |= strategy.keep_mask(groups, uses[group_codes])
+
+        # drivers in order of first lap, compounds in order of first lap per driver, laps in lap order
+        _, driver_first_idx, driver_ids = np.unique(drivers, return_index=True, return_inverse=True)
+        driver_first = driver_first_idx[driver_ids]
+        group_first = first_idx[group_ids]
+
+        kept = np.flatnonzero(keep)
+        out_order = np.lexsort((kept, group_first[kept], driver_first[kept]))
+        return kept[out_order], driver_first_idx
+
+    def assign_laps(self, drivers, times, compound_codes, compound_values, ages, stints):
+        if not len(times):
+            return
+        kept, driver_first_idx = self.filter_laps(drivers, times, compound_codes, compound_values)
+        self.laps_kept = len(kept)
+
+        for driver in drivers[np.sort(driver_first_idx)].tolist():
+            self.get_or_create_driver(driver)
+
+        for driver, lap_time, code, age, stint in zip(drivers[kept].tolist(), times[kept].tolist(),
+                                                      compound_codes[kept].tolist(), ages[kept].tolist(),
+                                                      stints[kept].tolist()):
+            self.drivers[driver].add_lap(lap_time, compound_values[code], age, stint)
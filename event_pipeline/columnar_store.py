@@ -0,0 +1,130 @@
+import json
+import os
+import shutil
+import numpy as np
+from .columnar_filter import CompoundCodes, match_stints, stint_columns, stint_values, tyre_ages
+from .defaults import DEFAULT_STORE_DIR
+from .sectors import SECTOR_FIELDS, SPEED_FIELDS
+from .logging_config import get_logger
+logger = get_logger()
+
+STORE_VERSION = 3 # 2: stint_number, tyre_age 3: sector times, speed traps
+
+# per lap flags
+PIT_OUT = 1
+DELETED = 2
+
+# fixed width columns, one .npy file each
+LAP_COLUMNS = {
+    'driver_number': np.int32,
+    'lap_number': np.int32,     # -1 when missing
+    'lap_duration': np.float64, # nan when missing
+    'compound': np.int16,       # index into header compounds
+    'flags': np.uint8,
+    'stint_number': np.int16,   # 0 when no stint covers the lap
+    'tyre_age': np.float32,     # laps on the set, nan without a stint
+    'duration_sector_1': np.float64, # sector times and speed traps (km/h), nan when missing
+    'duration_sector_2': np.float64,
+    'duration_sector_3': np.float64,
+    'i1_speed': np.float32,
+    'i2_speed': np.float32,
+    'st_speed': np.float32,
+}
+SPLIT_COLUMNS = SECTOR_FIELDS + SPEED_FIELDS # lap record fields 5.. (lap_store.lap_record)
+
+
+class LapStore:
+    # read side: columns are opened with mmap so worker processes share the pages
+    def __init__(self, path, header, columns):
+        self.path = path
+        self.header = header
+        self.session_key = header['session_key']
+        self.compounds = header['compounds']
+        self.drivers = {int(n): tuple(info) for n, info in header['drivers'].items()}
+        for name, column in columns.items():
+            setattr(self, name, column)
+
+    def __len__(self):
+        return self.header['n_laps']
+
+    def usable(self):
+        return (self.flags & (PIT_OUT | DELETED)) == 0
+
+    @classmethod
+    def open(cls, path):
+        with open(os.path.join(path, "header.json")) as f:
+            header = json.load(f)
+        if header.get('version') != STORE_VERSION:
+            raise ValueError(f"Unsupported lap store version in {path}")
+        columns = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') if header['n_laps'] else np.empty(0, dtype)
+            for name, dtype in LAP_COLUMNS.items()
+        }
+        return cls(path, header, columns)
+
+
+def store_path(session_key, store_dir=DEFAULT_STORE_DIR):
+    return os.path.join(store_dir, str(session_key))
+
+def has_store(session_key, store_dir=DEFAULT_STORE_DIR):
+    # stores of an older version are rewritten by the next ingest
+    try:
+        with open(os.path.join(store_path(session_key, store_dir), "header.json")) as f:
+            return json.load(f).get('version') == STORE_VERSION
+    except (OSError, ValueError):
+        return False
+
+def open_store(session_key, store_dir=DEFAULT_STORE_DIR):
+    return LapStore.open(store_path(session_key, store_dir))
+
+
+def write_store(session_key, laps, driver_data, tire_data, store_dir=DEFAULT_STORE_DIR):
+    # laps: RawSessionData.laps tuples, see lap_store.lap_record()
+    n = len(laps)
+    driver_number = np.fromiter((lap[0] or 0 for lap in laps), dtype=np.int32, count=n)
+    lap_number = np.fromiter((-1 if lap[1] is None else lap[1] for lap in laps), dtype=np.int32, count=n)
+    lap_duration = np.fromiter((np.nan if lap[2] is None else lap[2] for lap in laps), dtype=np.float64, count=n)
+    flags = np.fromiter(((PIT_OUT if lap[3] else 0) | (DELETED if lap[4] else 0) for lap in laps),
+                        dtype=np.uint8, count=n)
+
+    # compounds and tyre ages are resolved once here, readers never need the stints
+    codes = CompoundCodes()
+    stint_drivers, stint_starts, stint_ends, stint_codes, stint_numbers, stint_ages = stint_columns(tire_data, codes)
+    lap_numbers = lap_number.astype(np.int64)
+    stint_idx = match_stints(driver_number.astype(np.int64), lap_numbers, stint_drivers, stint_starts, stint_ends)
+    compound = stint_values(stint_idx, stint_codes, 0).astype(np.int16)
+
+    header = {
+        'version': STORE_VERSION,
+        'session_key': session_key,
+        'n_laps': n,
+        'compounds': codes.values,
+        'drivers': {
+            str(d['driver_number']): [f"{d.get('first_name', '')} {d.get('last_name', '')}".strip(),
+                                      d.get('team_name', 'Unknown')]
+            for d in driver_data if d.get('driver_number')
+        },
+        'columns': {name: np.dtype(dtype).str for name, dtype in LAP_COLUMNS.items()},
+    }
+    columns = {'driver_number': driver_number, 'lap_number': lap_number, 'lap_duration': lap_duration,
+               'compound': compound, 'flags': flags,
+               'stint_number': stint_values(stint_idx, stint_numbers, 0).astype(np.int16),
+               'tyre_age': tyre_ages(stint_idx, lap_numbers, stint_starts, stint_ages).astype(np.float32)}
+    for idx, name in enumerate(SPLIT_COLUMNS, 5):
+        columns[name] = np.fromiter((np.nan if lap[idx] is None else lap[idx] for lap in laps),
+                                    dtype=LAP_COLUMNS[name], count=n)
+
+    path = store_path(session_key, store_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(tmp_path, exist_ok=True)
+    for name, column in columns.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), column)
+    # header last: a store without one is never opened
+    with open(os.path.join(tmp_path, "header.json"), "w") as f:
+        json.dump(header, f)
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+    logger.debug("Wrote lap store for session %s: %s laps", session_key, n)
+    return path
@@ -1,31 +1,66 @@
 from collections import defaultdict
 from .driver import Driver
 from .team import Team
-from .logging_config import setup_logger
-logger = setup_logger()
+from .lap_filters import default_policy
+from .logging_config import get_logger
+logger = get_logger()
+
+# default lap filter thresholds, see lap_filters for the strategies
+FILTER_SETTINGS = {
+    'race_min_laps': 5,        # MEDIUM/HARD stints with this many laps use the percentile cutoff
+    'race_percentile': 0.9,
+    'race_ratio': 1.04,        # otherwise cutoff = fastest * ratio
+    'other_ratio': 1.08,
+    'floor': 65,               # cutoff never below this many seconds
+}
+
+DEFAULT_POLICY = default_policy(FILTER_SETTINGS)
 
 class DriverBuilder:
-    def __init__(self, lap_data, driver_data, tire_data):
+    def __init__(self, lap_data, driver_data, tire_data, policy=None):
         self.lap_data = lap_data
         self.driver_data = driver_data
         self.tire_data = tire_data
+        self.policy = policy or DEFAULT_POLICY # lap_filters.FilterPolicy
         self.drivers = {}
         self.teams = {}
+        # lap counts of the last build: every record, usable (timed, not deleted/out lap), kept after filtering
+        self.laps_seen = 0
+        self.laps_usable = 0
+        self.laps_kept = 0
 
-    def build(self):
-        logger.info("Building driver objects and assigning lap/tirre data")
+    def lap_counts(self):
+        return {'laps_seen': self.laps_seen, 'laps_usable': self.laps_usable,
+                'laps_filtered': self.laps_usable - self.laps_kept, 'laps_kept': self.laps_kept}
+
+    def build_lookups(self):
         # build a name lookup number -> name
-        name_map = {
+        self.name_map = {
             d['driver_number']: f"{d.get('first_name', '')} {d.get('last_name', '')}".strip()
             for d in self.driver_data if d.get('driver_number')
         }
 
         # build a team lookup
-        team_map = {
+        self.team_map = {
             d['driver_number']: d.get('team_name', 'Unknown')
             for d in self.driver_data if d.get('driver_number')
         }
 
+    def get_or_create_driver(self, driver):
+        # Add driver object if not already in self.drivers
+        if driver not in self.drivers:
+            name = self.name_map.get(driver, f"Driver {driver}")
+            team = self.team_map.get(driver, "Unknown")
+            self.drivers[driver] = Driver(name=name, number=driver, team_name=team)
+            if team not in self.teams:
+                self.teams[team] = Team(name=team)
+            self.teams[team].add_driver(self.drivers[driver])
+        return self.drivers[driver]
+
+    def build(self):
+        logger.info("Building driver objects and assigning lap/tirre data")
+        self.build_lookups()
+
         # build stint dictionary dr number -> list of stints
         driver_stints = {}
         for stint in self.tire_data:
@@ -34,22 +69,25 @@ class DriverBuilder:
                 'stint_number': stint['stint_number'],
                 'compound': stint['compound'],
                 'start_lap': stint['lap_start'],
-                'end_lap': stint['lap_end']
+                'end_lap': stint['lap_end'],
+                'tyre_age_at_start': stint.get('tyre_age_at_start') or 0,
             })
 
-        # Helper to get compound per lap
-        def get_compound(driver_number, lap_number):
+        # Helper to get the stint (compound, tyre age) per lap
+        def get_stint(driver_number, lap_number):
             stints = driver_stints.get(driver_number, [])
             for stint in stints:
                 if stint['start_lap'] <= lap_number <= stint['end_lap']:
-                    return stint['compound']
-            return "Unknown"
+                    return stint
+            return None
         
         # Temporary structure driver -> comp -> laps
         compound_laps_temp = defaultdict(lambda: defaultdict(list))
 
-        # first pass: collect all laps
+        # first pass: collect all laps (lap_data may be a stream, it is read once)
+        laps_seen = 0
         for lap in self.lap_data:
+            laps_seen += 1
             driver = lap.get('driver_number')
             lap_time = lap.get('lap_duration')
             lap_number = lap.get('lap_number')
@@ -59,47 +97,31 @@ class DriverBuilder:
             if not driver or lap_time is None or not is_valid or is_pit_out:
                 continue # skip out laps
 
-            compound = get_compound(driver, lap_number)
-            compound_laps_temp[driver][compound].append((lap_time, lap_number))
+            stint = get_stint(driver, lap_number)
+            compound = stint['compound'] if stint else "Unknown"
+            compound_laps_temp[driver][compound].append((lap_time, lap_number, stint))
+            self.laps_usable += 1
 
         # second pass: filter and assign to objects
         for driver, compound_data in compound_laps_temp.items():
-            name = name_map.get(driver, f"Driver {driver}")
-            team = team_map.get(driver, "Unknown")
-
-            # Add driver object if not already in self.drivers
-            if driver not in self.drivers:
-                self.drivers[driver] = Driver(name=name, number=driver, team_name=team)
-                if team not in self.teams:
-                    self.teams[team] = Team(name=team)
-                self.teams[team].add_driver(self.drivers[driver])
-            
+            driver_obj = self.get_or_create_driver(driver)
+
             for compound, laps in compound_data.items():
                 if not laps:
                     continue
 
-                filtered_laps = []
-                
-                if compound in ("MEDIUM", "HARD"):
-                    if len(laps) >= 5:
-                        sorted_laps = sorted(laps, key=lambda x: x[0])
-                        cutoff_idx = int(len(sorted_laps) * 0.9)
-                        filtered_laps = sorted_laps[:cutoff_idx]
-                    else:
-                        fastest = min(t[0] for t in laps)
-                        cutoff = max(fastest * 1.04, 65)
-                        filtered_laps = [lap for lap in laps if lap[0] <= cutoff]
-                else: 
-                    fastest = min(t[0] for t in laps)
-                    cutoff = max(fastest * 1.08, 65)
-                    filtered_laps = [lap for lap in laps if lap[0] <= cutoff]
-
-
-                for lap_time, lap_number in filtered_laps:
-                    self.drivers[driver].add_lap(lap_time, compound)
-
-        logger.debug(f"Total laps processed: {len(self.lap_data)}")
-        logger.debug(f"Total drivers mapped: {len(self.drivers)}")
+                filtered_laps = self.policy.select(compound, laps)
+                for lap_time, lap_number, stint in filtered_laps:
+                    if stint is None:
+                        driver_obj.add_lap(lap_time, compound)
+                        continue
+                    age = stint['tyre_age_at_start'] + lap_number - stint['start_lap']
+                    driver_obj.add_lap(lap_time, compound, age, stint['stint_number'])
+                self.laps_kept += len(filtered_laps)
+
+        self.laps_seen = laps_seen
+        logger.debug("Total laps processed: %s", laps_seen)
+        logger.debug("Total drivers mapped: %s", len(self.drivers))
 
         return self.drivers, self.teams
     
\ No newline at end of file
@@ -1,7 +1,13 @@
-import requests
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from .data_filter import DriverBuilder
-from .logging_config import setup_logger
-logger = setup_logger()
+from .openf1_client import api_url, get_json, open_json_stream, session_finished, DEFAULT_TIMEOUT
+from .session_catalog import get_catalog
+from .lap_store import RawSessionData
+from .sectors import SectorColumns
+from .metrics import PipelineMetrics
+from .logging_config import get_logger
+logger = get_logger()
 
 class SessionFetcher:
     def __init__(self, track_name, session_name, year):
@@ -10,69 +16,167 @@ class SessionFetcher:
         self.year = year
 
     def get_session_key(self):
-        #call API + build driver objects
-            # Get all sessions
-        logger.info(f"Fetching session key for: {self.track_name} - {self.session_name} ({self.year})")
-        self.session_key = None
-        response = requests.get('https://api.openf1.org/v1/sessions')
-        data = response.json()
-
-        # get session key from track name and session type. with error handling
-        found_track = False
-        for session in data:
-            if (session.get('circuit_short_name', '').lower() == self.track_name.lower() and session.get('year') == int(self.year)):
-                found_track = True
-                if session.get('session_name', '').lower() == self.session_name.lower():
-                    self.session_key = session.get('session_key')
-                    logger.info(f"Found session_key: {self.session_key}")
-                    return self.session_key
-        
-        if not found_track:
-            logger.warning(f"Track '{self.track_name}' not found for year {self.year}")
-        elif self.session_key is None:
-            logger.warning(f"Session '{self.session_name}' not found at track '{self.track_name}'")
+        # resolve through the local session catalog, only new sessions are downloaded
+        logger.info("Fetching session key for: %s - %s (%s)", self.track_name, self.session_name, self.year)
+        catalog = get_catalog()
+        self.session_key = catalog.resolve(self.track_name, self.year, self.session_name)
+        self.session_info = None
 
+        if self.session_key is not None:
+            self.session_info = catalog.get_session(self.session_key)
+            if not session_finished(self.session_info):
+                # cataloged while it was running, its date_end may be known by now
+                catalog.refresh()
+                self.session_info = catalog.get_session(self.session_key)
+            logger.info("Found session_key: %s", self.session_key)
+            return self.session_key
+
+        if not catalog.has_track(self.track_name, self.year):
+            logger.warning("Track '%s' not found for year %s", self.track_name, self.year)
+        else:
+            logger.warning("Session '%s' not found at track '%s'", self.session_name, self.track_name)
 
         # return none if no match found
         return None
 
+    def is_finished(self):
+        return session_finished(self.session_info)
+
 class URLBuilder:
     def __init__(self, session_key):
         self.session_key = session_key
 
     def lap_data_url(self):
         if self.session_key:
-            return f"https://api.openf1.org/v1/laps?session_key={self.session_key}"
+            return api_url(f"laps?session_key={self.session_key}")
         return None
     
     def tire_data_url(self):
         if self.session_key:
-            return f"https://api.openf1.org/v1/stints?session_key={self.session_key}"
+            return api_url(f"stints?session_key={self.session_key}")
         return None
     
     def driver_data_url(self):
         if self.session_key:
-            return f"https://api.openf1.org/v1/drivers?session_key={self.session_key}"
+            return api_url(f"drivers?session_key={self.session_key}")
         return None
 
+def builder_for(engine):
+    if engine == 'numpy':
+        from .columnar_filter import ColumnarDriverBuilder
+        return ColumnarDriverBuilder
+    return DriverBuilder
+
 class DataIngestor:
-    def __init__(self, session_key):
+    def __init__(self, session_key, finished=False, timeout=DEFAULT_TIMEOUT, deadline=60, engine='python',
+                 stream=False, keep_raw=False, store_dir=None, metrics=None, policy=None):
         self.url_builder = URLBuilder(session_key)
+        self.metrics = metrics or PipelineMetrics() # stage timers: fetch, build, write_store
+        self.builder = None
+        self.session_key = session_key
+        self.store_dir = store_dir # write a memory mapped LapStore here after ingest
+        self.keep_raw = keep_raw # keep compact raw laps/stints for the Lap and Stint tables
+        self.raw = None
+        self.sectors = None # SectorColumns of the ingested laps
+        self.engine = engine # 'python' or 'numpy'
+        self.policy = policy # lap_filters.FilterPolicy, None -> default filters
+        self.stream = stream # parse laps incrementally straight into the builder
+        # finished sessions never change so their payloads are cached permanently
+        self.finished = finished
+        self.timeout = timeout
+        self.deadline = deadline # seconds for the whole ingest step, streamed laps included
+        self.deadline_at = None # time.monotonic() of the deadline of the running fetch
+        self.failed = set() # endpoints ('laps', 'drivers', 'stints') that failed or timed out
 
-    def safe_get(self, url):
+    def safe_get(self, url, name=None):
         if not url:
             logger.warning("Missing session_key; cannot build URL.")
+            self.failed.add(name or 'url')
             return []
         try:
-            return requests.get(url).json()
+            return get_json(url, permanent=self.finished, ttl=0, timeout=self.timeout, deadline=self.deadline_at)
         except Exception as e:
-            logger.error(f"Failed to fetch data from {url}: {e}")
+            logger.error("Failed to fetch data from %s: %s", url, e)
+            self.failed.add(name or url)
             return []
 
+    def safe_stream(self, url, name='laps'):
+        if not url:
+            logger.warning("Missing session_key; cannot build URL.")
+            self.failed.add(name)
+            return iter([])
+        try:
+            records = open_json_stream(url, permanent=self.finished, ttl=0, timeout=self.timeout,
+                                       deadline=self.deadline_at)
+        except Exception as e:
+            logger.error("Failed to fetch data from %s: %s", url, e)
+            self.failed.add(name)
+            return iter([])
+        return self._guard_stream(records, url, name)
+
+    def _guard_stream(self, records, url, name='laps'):
+        try:
+            yield from records
+        except Exception as e:
+            logger.error("Lap stream from %s failed: %s", url, e)
+            self.failed.add(name)
+
+    def fetch_all(self):
+        # laps, drivers and stints in parallel -> wall time of the slowest endpoint.
+        # Requests still running at the deadline stop at their next read (DeadlineExceeded), so does a
+        # lap stream that is read later, while building
+        urls = {
+            'laps': self.url_builder.lap_data_url(),
+            'drivers': self.url_builder.driver_data_url(),
+            'stints': self.url_builder.tire_data_url(),
+        }
+        self.failed = set()
+        self.deadline_at = time.monotonic() + self.deadline
+        pool = ThreadPoolExecutor(max_workers=len(urls))
+        futures = {
+            name: pool.submit(self.safe_stream if self.stream and name == 'laps' else self.safe_get, url, name)
+            for name, url in urls.items()
+        }
+        wait(futures.values(), timeout=self.deadline)
+        pool.shutdown(wait=False, cancel_futures=True)
+
+        results = {}
+        for name, future in futures.items():
+            if future.done():
+                results[name] = future.result()
+            else:
+                logger.error("Fetching %s exceeded the %ss ingest deadline", name, self.deadline)
+                self.failed.add(name)
+                results[name] = []
+        return results['laps'], results['drivers'], results['stints']
+
     def load_data(self):
-        lap_data = self.safe_get(self.url_builder.lap_data_url())
-        driver_data = self.safe_get(self.url_builder.driver_data_url())
-        tire_data = self.safe_get(self.url_builder.tire_data_url())
+        # with stream=True laps are parsed while building, so "fetch" covers drivers/stints and the lap headers
+        with self.metrics.stage('fetch'):
+            lap_data, driver_data, tire_data = self.fetch_all()
+        if self.keep_raw or self.store_dir:
+            self.raw = RawSessionData(driver_data, tire_data)
+            lap_data = self.raw.record(lap_data)
+        else:
+            self.sectors = SectorColumns()
+            lap_data = self.sectors.record(lap_data)
+
+        self.builder = self.builder_class()(lap_data, driver_data, tire_data, self.policy)
+        with self.metrics.stage('build'):
+            result = self.builder.build()
+        self.metrics.update(self.builder.lap_counts())
+        if self.raw is not None:
+            self.sectors = SectorColumns.from_records(self.raw.laps)
+
+        # a finished session's store is reused for good: only write it from a complete ingest
+        if self.store_dir and self.failed:
+            logger.warning("Not writing the lap store of session %s, failed to fetch: %s",
+                           self.session_key, ", ".join(sorted(self.failed)))
+        elif self.store_dir and self.raw.laps:
+            from .columnar_store import write_store
+            with self.metrics.stage('write_store'):
+                write_store(self.session_key, self.raw.laps, driver_data, tire_data, self.store_dir)
+        return result
 
-        builder = DriverBuilder(lap_data, driver_data, tire_data)
-        return builder.build()
\ No newline at end of file
+    def builder_class(self):
+        return builder_for(self.engine)
\ No newline at end of file
@@ -1,16 +1,49 @@
+import hashlib
+import json
 import os
+from .data_filter import DEFAULT_POLICY
 from .driver import Driver
-from .logging_config import setup_logger
-from .db_schema import connect_db, create_table, insert_session_summary
-logger = setup_logger()
+from .logging_config import get_logger
+from .db_schema import get_connection, insert_event, insert_session, insert_session_summary, DEFAULT_DB_PATH
+from .lap_store import sync_raw_session
+logger = get_logger()
+
+def session_input_hash(drivers, filter_settings=None, sectors=None):
+    # content hash of the laps (times, tyre ages, stints) that feed the analysis plus the filter settings
+    # and the sector analysis
+    filter_settings = DEFAULT_POLICY.settings() if filter_settings is None else filter_settings
+    digest = hashlib.sha256(json.dumps(filter_settings, sort_keys=True).encode())
+    for number in sorted(drivers, key=str):
+        driver = drivers[number]
+        digest.update(f"|{driver.number}|{driver.name}|{driver.team_name}".encode())
+        for compound in sorted(driver.compound_laps, key=str):
+            digest.update(f"|{compound}|".encode())
+            digest.update(driver.compound_laps[compound].tobytes())
+            digest.update(driver.compound_ages[compound].tobytes())
+            digest.update(driver.compound_stints[compound].tobytes())
+    if sectors is not None:
+        digest.update(json.dumps([[d.to_dict() for d in sectors.drivers.values()], sectors.session_best]).encode())
+    return digest.hexdigest()
 
 class DBHandler:
-    def __init__(self, drivers, track_name, session_name, year, session_key):
+    def __init__(self, drivers, track_name, session_name, year, session_key, db_path=DEFAULT_DB_PATH, raw=None,
+                 metrics=None, policy=None, leaderboard=None, degradation=None,
+                 sectors=None, hash_inputs=True):
         self.drivers = drivers
+        self.db_path = db_path
+        self.raw = raw # RawSessionData to sync into Lap/Stint
         self.track_name = track_name
         self.session_name = session_name
         self.year = year
         self.session_key = session_key
+        self.rows_written = 0
+        self.metrics = metrics # PipelineMetrics to add rows_written to
+        self.policy = policy or DEFAULT_POLICY # lap filters the drivers were built with
+        self.leaderboard = leaderboard # SessionLeaderboard of the analysis, built on save when None
+        self.degradation = degradation # LapAnalyzer.degradation, fitted on save when None
+        self.sectors = sectors # LapAnalyzer.sectors (SectorSummary), sector tables untouched when None
+        # False: always write, without hashing every lap (live polls only save after changes)
+        self.hash_inputs = hash_inputs
 
     def save_to_db(self):
         if not self.session_key:
@@ -19,17 +52,29 @@ class DBHandler:
         
         logger.info("Saving session summary to database")
         
-        conn = connect_db()
+        # long lived connection, schema is migrated once per process
+        conn = get_connection(self.db_path)
+        changes_before = conn.total_changes
 
-        create_table(conn)
+        if self.raw is not None:
+            event_id = insert_event(conn, self.track_name, self.year)
+            session_id = insert_session(conn, event_id, self.session_name, self.session_key)
+            sync_raw_session(conn, session_id, self.raw)
 
         # BUild driver results for database
         driver_results = []
         for driver in self.drivers.values():
-            driver.prepare_summary()
             driver_results.append(driver)
 
-        logger.debug(f"Number of drivers to save: {len(driver_results)}")
-        insert_session_summary(conn, self.track_name, self.year, self.session_name, self.session_key, driver_results)
-        conn.commit()
-        conn.close()
\ No newline at end of file
+        logger.debug("Number of drivers to save: %s", len(driver_results))
+        input_hash = None
+        if self.hash_inputs:
+            input_hash = session_input_hash(self.drivers, self.policy.settings(), self.sectors)
+        written = insert_session_summary(conn, self.track_name, self.year, self.session_name, self.session_key,
+                                         driver_results, input_hash=input_hash, leaderboard=self.leaderboard,
+                                         degradation=self.degradation, sectors=self.sectors)
+        self.rows_written = conn.total_changes - changes_before
+        if self.metrics is not None:
+            self.metrics.incr('rows_written', self.rows_written)
+        if not written:
+            logger.info("Session inputs unchanged - skipping database write")
\ No newline at end of file
@@ -1,12 +1,85 @@
+import atexit
+import os
 import sqlite3
+from .defaults import DEFAULT_DB_PATH
 
-def connect_db():
-    conn = sqlite3.connect('f1_analysis.db')
+# applied once when a connection is opened
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -65536",
+)
+
+_connections = {} # (pid, path) -> connection
+
+def connect_db(path=DEFAULT_DB_PATH):
+    conn = sqlite3.connect(path, timeout=30)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
     return conn
 
-def create_table(conn):
+def get_connection(path=DEFAULT_DB_PATH):
+    # one tuned, migrated connection per database per process
+    key = (os.getpid(), os.path.abspath(path) if path != ':memory:' else path)
+    conn = _connections.get(key)
+    if conn is None:
+        conn = connect_db(path)
+        migrate(conn)
+        _connections[key] = conn
+    return conn
+
+def close_connections():
+    for key, conn in list(_connections.items()):
+        if key[0] == os.getpid():
+            conn.close()
+        del _connections[key]
+
+atexit.register(close_connections)
+
+def schema_version(conn):
     cur = conn.cursor()
-    cur.executescript('''
+    cur.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL PRIMARY KEY)")
+    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return cur.fetchone()[0]
+
+def migrate(conn):
+    latest = MIGRATIONS[-1][0]
+    if schema_version(conn) >= latest:
+        return latest
+    # one write transaction: batch workers opening a fresh database migrate it once, in turn
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        current = schema_version(conn)
+        for version, step in MIGRATIONS:
+            if version <= current:
+                continue
+            step(conn)
+            conn.execute("INSERT INTO schema_version (version) VALUES (?)", (version,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return latest
+
+def run_script(conn, script):
+    # like executescript, but inside the caller's transaction (executescript commits first)
+    statement = ''
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ''
+
+def create_table(conn):
+    # kept for existing callers, brings the schema up to date
+    migrate(conn)
+
+def create_base_schema(conn):
+    run_script(conn, '''
     CREATE TABLE IF NOT EXISTS Event(
         event_id    INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT UNIQUE,
         name        TEXT NOT NULL,
@@ -19,6 +92,7 @@ def create_table(conn):
         event_id    INTEGER NOT NULL,
         name        TEXT NOT NULL,
         session_key INTEGER,
+        input_hash  TEXT,
     
         FOREIGN KEY (event_id) REFERENCES Event(event_id) ON DELETE CASCADE
     );
@@ -63,11 +137,265 @@ def create_table(conn):
     );
                       
     CREATE INDEX IF NOT EXISTS idx_session_event ON Session(event_id);
+    CREATE INDEX IF NOT EXISTS idx_event_name_year ON Event(name, year);
+    CREATE INDEX IF NOT EXISTS idx_session_event_name ON Session(event_id, name);
     CREATE INDEX IF NOT EXISTS idx_team_session ON Team(session_id);
     CREATE INDEX IF NOT EXISTS idx_driver_session ON DriverSessionParticipation(session_id, driver_id);
     CREATE INDEX IF NOT EXISTS idx_analysis_participation ON Analysis(session_driver_id);
     ''')
 
+def upgrade_schema(conn):
+    # databases created before re-runs were idempotent
+    cur = conn.cursor()
+    columns = [row[1] for row in cur.execute("PRAGMA table_info(Session)")]
+    if 'input_hash' not in columns:
+        cur.execute("ALTER TABLE Session ADD COLUMN input_hash TEXT")
+
+    # one current Analysis row per driver and session, keep the latest
+    run_script(conn, '''
+    DELETE FROM Analysis WHERE analysis_id NOT IN (
+        SELECT MAX(analysis_id) FROM Analysis GROUP BY session_driver_id
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_analysis_unique_participation ON Analysis(session_driver_id);
+    ''')
+
+def create_raw_tables(conn):
+    # raw laps and stints so a session can be re-analysed without the API
+    run_script(conn, '''
+    CREATE TABLE IF NOT EXISTS Lap (
+        lap_id              INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id          INTEGER NOT NULL,
+        driver_id           INTEGER NOT NULL,
+        lap_number          INTEGER NOT NULL,
+        compound            TEXT,
+        lap_duration        REAL,
+        is_pit_out_lap      INTEGER NOT NULL DEFAULT 0,
+        deleted             INTEGER NOT NULL DEFAULT 0,
+        UNIQUE(session_id, driver_id, lap_number),
+
+        FOREIGN KEY (session_id) REFERENCES Session(session_id) ON DELETE CASCADE
+        FOREIGN KEY (driver_id) REFERENCES Driver(driver_id) ON DELETE CASCADE
+    );
+
+    CREATE TABLE IF NOT EXISTS Stint (
+        stint_id            INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id          INTEGER NOT NULL,
+        driver_id           INTEGER NOT NULL,
+        stint_number        INTEGER NOT NULL,
+        compound            TEXT,
+        lap_start           INTEGER,
+        lap_end             INTEGER,
+        tyre_age_at_start   INTEGER,
+        UNIQUE(session_id, driver_id, stint_number),
+
+        FOREIGN KEY (session_id) REFERENCES Session(session_id) ON DELETE CASCADE
+        FOREIGN KEY (driver_id) REFERENCES Driver(driver_id) ON DELETE CASCADE
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_lap_cover
+        ON Lap(session_id, driver_id, compound, lap_number, lap_duration, is_pit_out_lap, deleted);
+    CREATE INDEX IF NOT EXISTS idx_stint_session ON Stint(session_id, driver_id, lap_start);
+    CREATE INDEX IF NOT EXISTS idx_session_key ON Session(session_key);
+    ''')
+
+def create_summary_tables(conn):
+    # cross-session aggregates, kept current by refresh_session_aggregates
+    cur = conn.cursor()
+    run_script(conn, '''
+    CREATE TABLE IF NOT EXISTS TeamSessionPace (
+        session_id          INTEGER NOT NULL,
+        team_name           TEXT NOT NULL,
+        event_id            INTEGER NOT NULL,
+        year                INTEGER NOT NULL,
+        race_pace           REAL,
+        compound            TEXT,
+        PRIMARY KEY (session_id, team_name),
+
+        FOREIGN KEY (session_id) REFERENCES Session(session_id) ON DELETE CASCADE
+    );
+
+    CREATE TABLE IF NOT EXISTS DriverEventPace (
+        event_id            INTEGER NOT NULL,
+        driver_id           INTEGER NOT NULL,
+        year                INTEGER NOT NULL,
+        sessions            INTEGER NOT NULL,
+        best_soft_time      REAL,
+        best_race_pace      REAL,
+        avg_race_pace       REAL,
+        PRIMARY KEY (event_id, driver_id),
+
+        FOREIGN KEY (event_id) REFERENCES Event(event_id) ON DELETE CASCADE
+        FOREIGN KEY (driver_id) REFERENCES Driver(driver_id) ON DELETE CASCADE
+    );
+
+    CREATE TABLE IF NOT EXISTS DriverSeasonBest (
+        year                INTEGER NOT NULL,
+        driver_id           INTEGER NOT NULL,
+        best_soft_time      REAL NOT NULL,
+        session_id          INTEGER NOT NULL,
+        PRIMARY KEY (year, driver_id),
+
+        FOREIGN KEY (driver_id) REFERENCES Driver(driver_id) ON DELETE CASCADE
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_team_pace_year ON TeamSessionPace(year, team_name);
+    CREATE INDEX IF NOT EXISTS idx_season_best_time ON DriverSeasonBest(year, best_soft_time);
+    CREATE INDEX IF NOT EXISTS idx_participation_driver ON DriverSessionParticipation(driver_id, session_id);
+    ''')
+
+    # backfill from existing results
+    for (session_id,) in cur.execute("SELECT session_id FROM Session").fetchall():
+        refresh_session_aggregates(conn, session_id)
+
+# race pace of one Analysis row: the average on its best compound
+RACE_PACE_SQL = '''CASE a.best_avg_compound WHEN 'MEDIUM' THEN a.avg_med_time
+                                            WHEN 'HARD' THEN a.avg_hard_time END'''
+
+def refresh_session_aggregates(conn, session_id):
+    # only the rows this session feeds: its teams, its drivers' weekend and season
+    cur = conn.cursor()
+    cur.execute('''
+        SELECT s.event_id, e.year FROM Session s JOIN Event e ON e.event_id = s.event_id
+        WHERE s.session_id = ?''', (session_id,))
+    row = cur.fetchone()
+    if row is None:
+        return
+    event_id, year = row
+
+    cur.execute("DELETE FROM TeamSessionPace WHERE session_id = ?", (session_id,))
+    cur.execute('''
+        INSERT INTO TeamSessionPace (session_id, team_name, event_id, year, race_pace, compound)
+        SELECT ?, t.name, ?, ?,
+               CASE WHEN x.med IS NOT NULL AND (x.hard IS NULL OR x.med <= x.hard) THEN x.med ELSE x.hard END,
+               CASE WHEN x.med IS NOT NULL AND (x.hard IS NULL OR x.med <= x.hard) THEN 'MEDIUM' ELSE 'HARD' END
+        FROM (
+            SELECT p.team_id, AVG(a.avg_med_time) AS med, AVG(a.avg_hard_time) AS hard
+            FROM Analysis a
+            JOIN DriverSessionParticipation p ON p.session_driver_id = a.session_driver_id
+            WHERE p.session_id = ?
+            GROUP BY p.team_id
+        ) x
+        JOIN Team t ON t.team_id = x.team_id
+        WHERE x.med IS NOT NULL OR x.hard IS NOT NULL''', (session_id, event_id, year, session_id))
+
+    drivers = "SELECT driver_id FROM DriverSessionParticipation WHERE session_id = ?"
+    cur.execute(f"DELETE FROM DriverEventPace WHERE event_id = ? AND driver_id IN ({drivers})", (event_id, session_id))
+    cur.execute(f'''
+        INSERT INTO DriverEventPace (event_id, driver_id, year, sessions, best_soft_time, best_race_pace, avg_race_pace)
+        SELECT s.event_id, p.driver_id, ?, COUNT(*), MIN(a.fastest_soft_time), MIN({RACE_PACE_SQL}), AVG({RACE_PACE_SQL})
+        FROM Analysis a
+        JOIN DriverSessionParticipation p ON p.session_driver_id = a.session_driver_id
+        JOIN Session s ON s.session_id = p.session_id
+        WHERE s.event_id = ? AND p.driver_id IN ({drivers})
+        GROUP BY p.driver_id''', (year, event_id, session_id))
+
+    cur.execute(f"DELETE FROM DriverSeasonBest WHERE year = ? AND driver_id IN ({drivers})", (year, session_id))
+    # bare session_id column comes from the MIN row (SQLite)
+    cur.execute(f'''
+        INSERT INTO DriverSeasonBest (year, driver_id, best_soft_time, session_id)
+        SELECT ?, p.driver_id, MIN(a.fastest_soft_time), p.session_id
+        FROM Analysis a
+        JOIN DriverSessionParticipation p ON p.session_driver_id = a.session_driver_id
+        JOIN Session s ON s.session_id = p.session_id
+        JOIN Event e ON e.event_id = s.event_id
+        WHERE e.year = ? AND a.fastest_soft_time IS NOT NULL AND p.driver_id IN ({drivers})
+        GROUP BY p.driver_id''', (year, year, session_id))
+
+def add_analysis_ranks(conn):
+    # session ranks from the LapAnalyzer leaderboard. Clearing the input hashes makes the next
+    # save of every stored session fill them in
+    cur = conn.cursor()
+    columns = [row[1] for row in cur.execute("PRAGMA table_info(Analysis)")]
+    for column in ('soft_rank', 'pace_rank'):
+        if column not in columns:
+            cur.execute(f"ALTER TABLE Analysis ADD COLUMN {column} INTEGER")
+    cur.execute("UPDATE Session SET input_hash = NULL")
+
+def create_degradation_table(conn):
+    # tyre degradation fits per driver and compound (degradation.py). Clearing the input hashes makes
+    # the next save of every stored session fill them in
+    run_script(conn, '''
+    CREATE TABLE IF NOT EXISTS Degradation (
+        session_driver_id   INTEGER NOT NULL,
+        compound            TEXT NOT NULL,
+        deg_rate            REAL NOT NULL,
+        r2                  REAL,
+        laps                INTEGER NOT NULL,
+        stints              INTEGER NOT NULL,
+        PRIMARY KEY (session_driver_id, compound),
+
+        FOREIGN KEY (session_driver_id) REFERENCES DriverSessionParticipation(session_driver_id) ON DELETE CASCADE
+    );
+    UPDATE Session SET input_hash = NULL;
+    ''')
+
+def create_sector_tables(conn):
+    # sector times/speed traps on Lap, the sector analysis (sectors.py) next to Analysis and the
+    # session best sector owners. Clearing the input hashes makes the next save fill them in
+    cur = conn.cursor()
+    columns = [row[1] for row in cur.execute("PRAGMA table_info(Lap)")]
+    for column in ('duration_sector_1', 'duration_sector_2', 'duration_sector_3', 'i1_speed', 'i2_speed', 'st_speed'):
+        if column not in columns:
+            cur.execute(f"ALTER TABLE Lap ADD COLUMN {column} REAL")
+    run_script(conn, '''
+    CREATE TABLE IF NOT EXISTS SectorAnalysis (
+        session_driver_id   INTEGER PRIMARY KEY,
+        best_sector_1       REAL,
+        best_sector_2       REAL,
+        best_sector_3       REAL,
+        theoretical_best    REAL,
+        best_lap            REAL,
+        ideal_gap           REAL,
+        top_speed           REAL,
+
+        FOREIGN KEY (session_driver_id) REFERENCES DriverSessionParticipation(session_driver_id) ON DELETE CASCADE
+    );
+
+    CREATE TABLE IF NOT EXISTS SessionSectorBest (
+        session_id          INTEGER NOT NULL,
+        sector              INTEGER NOT NULL,
+        session_driver_id   INTEGER NOT NULL,
+        sector_time         REAL NOT NULL,
+        PRIMARY KEY (session_id, sector),
+
+        FOREIGN KEY (session_id) REFERENCES Session(session_id) ON DELETE CASCADE
+        FOREIGN KEY (session_driver_id) REFERENCES DriverSessionParticipation(session_driver_id) ON DELETE CASCADE
+    );
+    UPDATE Session SET input_hash = NULL;
+    ''')
+
+def create_lap_telemetry_table(conn):
+    # per lap car telemetry aggregates (telemetry.py), keyed like Lap
+    run_script(conn, '''
+    CREATE TABLE IF NOT EXISTS LapTelemetry (
+        session_id          INTEGER NOT NULL,
+        driver_id           INTEGER NOT NULL,
+        lap_number          INTEGER NOT NULL,
+        samples             INTEGER NOT NULL,
+        top_speed           REAL,
+        avg_speed           REAL,
+        avg_throttle        REAL,
+        full_throttle       REAL,
+        braking             REAL,
+        PRIMARY KEY (session_id, driver_id, lap_number),
+
+        FOREIGN KEY (session_id) REFERENCES Session(session_id) ON DELETE CASCADE
+        FOREIGN KEY (driver_id) REFERENCES Driver(driver_id) ON DELETE CASCADE
+    );
+    ''')
+
+# (version, step) in order, databases without schema_version start at 0
+MIGRATIONS = [
+    (1, create_base_schema),
+    (2, upgrade_schema),
+    (3, create_raw_tables),
+    (4, create_summary_tables),
+    (5, add_analysis_ranks),
+    (6, create_degradation_table),
+    (7, create_sector_tables),
+    (8, create_lap_telemetry_table),
+]
+
 def insert_event(conn, name, year):
     cur = conn.cursor()
     name = name.strip().title()
@@ -128,32 +456,188 @@ def insert_driver_session(conn, session_id, driver_id, team_id, number):
         VALUES (?, ?, ?, ?)''', (session_id, driver_id, team_id, number))
     return cur.lastrowid
 
-def insert_analysis(conn, session_driver_id, fastest_soft_time, avg_med_time, avg_hard_time, best_avg_compound):
+UPSERT_ANALYSIS = '''
+    INSERT INTO Analysis (session_driver_id, fastest_soft_time, avg_med_time, avg_hard_time, best_avg_compound,
+                          soft_rank, pace_rank)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(session_driver_id) DO UPDATE SET
+        fastest_soft_time = excluded.fastest_soft_time,
+        avg_med_time = excluded.avg_med_time,
+        avg_hard_time = excluded.avg_hard_time,
+        best_avg_compound = excluded.best_avg_compound,
+        soft_rank = excluded.soft_rank,
+        pace_rank = excluded.pace_rank'''
+
+def insert_analysis(conn, session_driver_id, fastest_soft_time, avg_med_time, avg_hard_time, best_avg_compound,
+                    soft_rank=None, pace_rank=None):
+    # replaces the current analysis of this driver in this session
     cur = conn.cursor()
-    cur.execute('''
-                INSERT INTO Analysis (session_driver_id, fastest_soft_time, avg_med_time, avg_hard_time, best_avg_compound)
-                VALUES (?, ?, ?, ?, ?)''', 
-                (session_driver_id, fastest_soft_time, avg_med_time, avg_hard_time, best_avg_compound)
+    cur.execute(UPSERT_ANALYSIS,
+                (session_driver_id, fastest_soft_time, avg_med_time, avg_hard_time, best_avg_compound,
+                 soft_rank, pace_rank)
                 )
-    analysis_id = cur.lastrowid
+    cur.execute("SELECT analysis_id FROM Analysis WHERE session_driver_id = ?", (session_driver_id,))
+    analysis_id = cur.fetchone()[0]
     return analysis_id
 
-def insert_session_summary(conn, track_name, year, session_name, session_key, driver_results):
+def bulk_get_or_create_teams(conn, session_id, names):
+    cur = conn.cursor()
+    names = {name.strip().title() for name in names}
+    cur.executemany("INSERT OR IGNORE INTO Team (session_id, name) VALUES (?, ?)",
+                    [(session_id, name) for name in names])
+    cur.execute("SELECT name, team_id FROM Team WHERE session_id = ?", (session_id,))
+    return dict(cur.fetchall())
+
+def bulk_get_or_create_drivers(conn, drivers):
+    # drivers: iterable of (name, number), first number wins like get_or_create_driver
     cur = conn.cursor()
+    rows = {}
+    for name, number in drivers:
+        rows.setdefault(name.strip().title(), number)
+    cur.executemany("INSERT OR IGNORE INTO Driver (name, number) VALUES (?, ?)", list(rows.items()))
+    names = list(rows)
+    cur.execute(f"SELECT name, driver_id FROM Driver WHERE name IN ({', '.join('?' for _ in names)})", names)
+    return dict(cur.fetchall())
+
+def bulk_insert_driver_sessions(conn, session_id, rows):
+    # rows: (driver_id, team_id, number) -> {driver_id: session_driver_id}
+    cur = conn.cursor()
+    cur.executemany('''
+        INSERT OR IGNORE INTO DriverSessionParticipation (session_id, driver_id, team_id, number)
+        VALUES (?, ?, ?, ?)''', [(session_id, driver_id, team_id, number) for driver_id, team_id, number in rows])
+    cur.execute('''
+        SELECT driver_id, session_driver_id FROM DriverSessionParticipation
+        WHERE session_id = ?''', (session_id,))
+    return dict(cur.fetchall())
+
+def bulk_insert_analysis(conn, rows):
+    cur = conn.cursor()
+    cur.executemany(UPSERT_ANALYSIS, rows)
+
+def replace_degradation(conn, session_id, rows):
+    # rows: (session_driver_id, compound, deg_rate, r2, laps, stints), the session's previous fits are dropped
+    cur = conn.cursor()
+    cur.execute('''
+        DELETE FROM Degradation WHERE session_driver_id IN (
+            SELECT session_driver_id FROM DriverSessionParticipation WHERE session_id = ?)''', (session_id,))
+    cur.executemany('''
+        INSERT INTO Degradation (session_driver_id, compound, deg_rate, r2, laps, stints)
+        VALUES (?, ?, ?, ?, ?, ?)''', rows)
+
+def replace_sectors(conn, session_id, rows, session_best):
+    # rows: (session_driver_id, best_sector_1..3, theoretical_best, best_lap, ideal_gap, top_speed),
+    # session_best: (sector, session_driver_id, sector_time). The session's previous rows are dropped
+    cur = conn.cursor()
+    cur.execute('''
+        DELETE FROM SectorAnalysis WHERE session_driver_id IN (
+            SELECT session_driver_id FROM DriverSessionParticipation WHERE session_id = ?)''', (session_id,))
+    cur.executemany('''
+        INSERT INTO SectorAnalysis (session_driver_id, best_sector_1, best_sector_2, best_sector_3, theoretical_best,
+                                    best_lap, ideal_gap, top_speed)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', rows)
+    cur.execute("DELETE FROM SessionSectorBest WHERE session_id = ?", (session_id,))
+    cur.executemany('''
+        INSERT INTO SessionSectorBest (session_id, sector, session_driver_id, sector_time)
+        VALUES (?, ?, ?, ?)''', [(session_id, *row) for row in session_best])
+
+def replace_lap_telemetry(conn, session_id, rows):
+    # rows: LapTelemetry.rows() (number, lap_number, samples, top_speed, avg_speed, avg_throttle, full_throttle,
+    # braking). Drivers are matched by their number in the session, the session's previous rows are dropped.
+    # Runs in the caller's transaction
+    cur = conn.cursor()
+    cur.execute("DELETE FROM LapTelemetry WHERE session_id = ?", (session_id,))
+    cur.executemany('''
+        INSERT INTO LapTelemetry (session_id, driver_id, lap_number, samples, top_speed, avg_speed, avg_throttle,
+                                  full_throttle, braking)
+        SELECT p.session_id, p.driver_id, ?, ?, ?, ?, ?, ?, ? FROM DriverSessionParticipation p
+        WHERE p.session_id = ? AND p.number = ?''',
+        [(*row[1:], session_id, row[0]) for row in rows])
+
+def delete_stale_analysis(conn, session_id, session_driver_ids):
+    # Analysis rows of drivers the session no longer has results for (all laps filtered out on a re-run)
+    cur = conn.cursor()
+    session_driver_ids = list(session_driver_ids)
+    cur.execute(f'''
+        DELETE FROM Analysis WHERE session_driver_id IN (
+            SELECT session_driver_id FROM DriverSessionParticipation WHERE session_id = ?)
+        AND session_driver_id NOT IN ({', '.join('?' for _ in session_driver_ids)})''',
+        (session_id, *session_driver_ids))
+
+def get_session_hash(conn, session_id):
+    cur = conn.cursor()
+    cur.execute("SELECT input_hash FROM Session WHERE session_id = ?", (session_id,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+def set_session_hash(conn, session_id, input_hash):
+    cur = conn.cursor()
+    cur.execute("UPDATE Session SET input_hash = ? WHERE session_id = ?", (input_hash, session_id))
+
+def insert_session_summary(conn, track_name, year, session_name, session_key, driver_results, input_hash=None,
+                           leaderboard=None, degradation=None, sectors=None):
+    # set based: a handful of statements per session instead of several per driver.
+    # returns False when the stored results already match input_hash
+    driver_results = list(driver_results)
     event_id = insert_event(conn, track_name, year)
     session_id = insert_session(conn, event_id, session_name, session_key)
+    if input_hash is not None and get_session_hash(conn, session_id) == input_hash:
+        conn.commit()
+        return False
+    if not driver_results:
+        delete_stale_analysis(conn, session_id, [])
+        refresh_session_aggregates(conn, session_id)
+        set_session_hash(conn, session_id, input_hash)
+        conn.commit()
+        return True
+
+    team_ids = bulk_get_or_create_teams(conn, session_id, [d.team_name for d in driver_results])
+    driver_ids = bulk_get_or_create_drivers(conn, [(d.name, d.number) for d in driver_results])
+
+    participation = {}
     for driver in driver_results:
-        team_id = get_or_create_team(conn, session_id, driver.team_name)
-        driver_id = get_or_create_driver(conn, driver.name, driver.number)
-        session_driver_id = insert_driver_session(conn, session_id, driver_id, team_id, driver.number)
+        driver_id = driver_ids[driver.name.strip().title()]
+        team_id = team_ids[driver.team_name.strip().title()]
+        participation.setdefault(driver_id, (driver_id, team_id, driver.number))
+    session_driver_ids = bulk_insert_driver_sessions(conn, session_id, participation.values())
 
-        insert_analysis(
-            conn,
-            session_driver_id,
+    # ranks and the race pace compound come from the session leaderboard
+    if leaderboard is None:
+        from .leaderboard import SessionLeaderboard
+        leaderboard = SessionLeaderboard({driver.number: driver for driver in driver_results})
+    bulk_insert_analysis(conn, [
+        (
+            session_driver_ids[driver_ids[driver.name.strip().title()]],
             driver.fastest_soft_time,
             driver.avg_med,
             driver.avg_hard,
-            driver.best_avg_compound
+            leaderboard.race_pace.detail(driver.number),
+            leaderboard.fastest_soft.rank(driver.number),
+            leaderboard.race_pace.rank(driver.number),
         )
-    conn.commit()
+        for driver in driver_results
+    ])
 
+    if degradation is None:
+        from .degradation import fit_degradation
+        degradation = fit_degradation({driver.number: driver for driver in driver_results})
+    session_driver_of = {driver.number: session_driver_ids[driver_ids[driver.name.strip().title()]]
+                         for driver in driver_results}
+    delete_stale_analysis(conn, session_id, session_driver_of.values())
+    replace_degradation(conn, session_id, [
+        (session_driver_of[fit.number], fit.compound, fit.deg_rate, fit.r2, fit.laps, fit.stints)
+        for fit in degradation.values() if fit.number in session_driver_of
+    ])
+    # sectors need the raw laps, so they are only replaced when the caller has them (not in live mode)
+    if sectors is not None:
+        replace_sectors(conn, session_id, [
+            (session_driver_of[d.number], *d.best_sectors, d.theoretical_best, d.best_lap, d.ideal_gap, d.top_speed)
+            for d in sectors.drivers.values() if d.number in session_driver_of
+        ], [
+            (sector, session_driver_of[best[0]], best[1])
+            for sector, best in enumerate(sectors.session_best, 1) if best and best[0] in session_driver_of
+        ])
+    refresh_session_aggregates(conn, session_id)
+    # a write without a hash clears the stored one, it no longer describes the rows
+    set_session_hash(conn, session_id, input_hash)
+    conn.commit()
+    return True
@@ -0,0 +1,14 @@
+import os
+
+# default paths and limits, kept free of imports so the CLI can build --help without loading the pipeline
+
+DEFAULT_BASE_URL = "https://api.openf1.org/v1"
+DEFAULT_CACHE_DIR = os.path.join(".cache", "openf1")
+DEFAULT_CATALOG_TTL = 6 * 60 * 60 # seconds
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_CATALOG_PATH = os.path.join(".cache", "session_catalog.db")
+DEFAULT_STORE_DIR = os.path.join(".cache", "laps")
+DEFAULT_TELEMETRY_DIR = os.path.join(".cache", "telemetry")
+DEFAULT_DB_PATH = 'f1_analysis.db'
+DEFAULT_LOG_DIR = "logs"
+REPORT_FORMATS = ['text', 'jsonl', 'csv', 'markdown'] # report.FORMATS, listed here for --help
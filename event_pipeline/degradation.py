@@ -0,0 +1,113 @@
+from array import array
+
+# Tyre degradation: lap time against tyre age, per driver and compound.
+# Model: time = intercept per stint + deg_rate * tyre_age. Every stint gets its own intercept (fuel, track
+# evolution, set-up changes between runs), the slope is shared by the driver's stints on that compound.
+# The least-squares slope is sum(dx * dy) / sum(dx * dx) with dx/dy the distances to the stint means, so
+# all groups of all sessions are solved together from a few np.bincount sums, no loop per stint.
+# Fits use the laps kept by the lap filters (the race pace laps) minus laps far from their stint's median.
+
+MIN_STINT_LAPS = 3 # shorter stints say nothing about the slope
+MIN_LAPS = 5 # laps in usable stints per driver and compound
+OUTLIER_LIMIT = 2.0 # seconds from the stint's median lap time
+
+
+class DegradationFit:
+    __slots__ = ('number', 'compound', 'deg_rate', 'r2', 'laps', 'stints')
+
+    def __init__(self, number, compound, deg_rate, r2, laps, stints):
+        self.number = number
+        self.compound = compound
+        self.deg_rate = deg_rate # seconds per lap of tyre age
+        self.r2 = r2 # share of the within-stint lap time variance explained by tyre age, None if no variance
+        self.laps = laps
+        self.stints = stints
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"DegradationFit({self.number}, {self.compound}, {self.deg_rate:+.4f} s/lap, r2={self.r2})"
+
+
+def lap_columns(sessions):
+    # kept laps of every driver of every session as flat columns:
+    # (session index, driver number, compound code, stint number, tyre age, lap time), compound values
+    import numpy as np
+    session_ids, numbers, codes = array('q'), array('q'), array('q')
+    ages, stints, times = array('h'), array('b'), array('d') # typed like Driver.compound_ages/stints
+    compounds = {}
+    for session_idx, drivers in enumerate(sessions):
+        for number, driver in drivers.items():
+            for compound, laps in driver.compound_laps.items():
+                n = len(laps)
+                session_ids.extend([session_idx] * n)
+                numbers.extend([number] * n)
+                codes.extend([compounds.setdefault(compound, len(compounds))] * n)
+                stints.extend(driver.compound_stints[compound])
+                ages.extend(driver.compound_ages[compound])
+                times.extend(laps)
+    columns = [np.frombuffer(column, dtype=np.int64) for column in (session_ids, numbers, codes)]
+    columns.append(np.frombuffer(stints, dtype=np.int8).astype(np.int64))
+    ages = np.frombuffer(ages, dtype=np.int16).astype(np.float64)
+    ages[ages < 0] = np.nan # NO_AGE
+    columns += [ages, np.frombuffer(times, dtype=np.float64)]
+    return columns, list(compounds)
+
+
+def fit_sessions(sessions, min_stint_laps=MIN_STINT_LAPS, min_laps=MIN_LAPS, outlier_limit=OUTLIER_LIMIT):
+    # sessions: list of {number: Driver} -> list of {(number, compound): DegradationFit}, one per session
+    import numpy as np
+    results = [{} for _ in sessions]
+    columns, compounds = lap_columns(sessions)
+
+    # laps without a stint (no tyre age) cannot be fitted
+    known = ~np.isnan(columns[4]) & (columns[3] > 0)
+    if not known.any():
+        return results
+    session_ids, numbers, codes, stints, ages, times = (column[known] for column in columns)
+
+    # (session, driver, compound) groups and their stints, as one int64 key each
+    group_keys = (session_ids * (int(numbers.max()) + 1) + numbers) * len(compounds) + codes
+    _, group_first, group_ids = np.unique(group_keys, return_index=True, return_inverse=True)
+    stint_keys = group_ids * (int(stints.max()) + 1) + stints
+    _, stint_first, stint_ids = np.unique(stint_keys, return_index=True, return_inverse=True)
+
+    # laps far from their stint's median (traffic, cool down laps the lap filter let through) are dropped
+    from .columnar_filter import LapGroups
+    n_stints = len(stint_first)
+    median = LapGroups(times, stint_ids, n_stints).quantile(times, np.arange(n_stints), 0.5)
+    clean = np.abs(times - median[stint_ids]) <= outlier_limit
+    stint_laps = np.bincount(stint_ids[clean], minlength=n_stints)
+    used = clean & (stint_laps[stint_ids] >= min_stint_laps)
+    stint_used = stint_laps >= min_stint_laps
+
+    # distances to the stint means
+    n = np.maximum(stint_laps, 1)
+    dx = ages - (np.bincount(stint_ids[clean], weights=ages[clean], minlength=n_stints) / n)[stint_ids]
+    dy = times - (np.bincount(stint_ids[clean], weights=times[clean], minlength=n_stints) / n)[stint_ids]
+
+    n_groups = len(group_first)
+    sxx = np.bincount(group_ids[used], weights=dx[used] * dx[used], minlength=n_groups)
+    sxy = np.bincount(group_ids[used], weights=dx[used] * dy[used], minlength=n_groups)
+    syy = np.bincount(group_ids[used], weights=dy[used] * dy[used], minlength=n_groups)
+    laps = np.bincount(group_ids[used], minlength=n_groups)
+    group_stints = np.bincount(group_ids[stint_first][stint_used], minlength=n_groups)
+
+    fitted = (laps >= min_laps) & (sxx > 0)
+    slope = np.divide(sxy, sxx, out=np.zeros(n_groups), where=fitted)
+    has_r2 = fitted & (syy > 0)
+    r2 = np.divide(sxy * sxy, sxx * syy, out=np.zeros(n_groups), where=has_r2)
+
+    for g in np.flatnonzero(fitted).tolist():
+        first = group_first[g]
+        number, compound = int(numbers[first]), compounds[codes[first]]
+        results[session_ids[first]][(number, compound)] = DegradationFit(
+            number, compound, float(slope[g]), float(r2[g]) if has_r2[g] else None, int(laps[g]),
+            int(group_stints[g]))
+    return results
+
+
+def fit_degradation(drivers, min_stint_laps=MIN_STINT_LAPS, min_laps=MIN_LAPS, outlier_limit=OUTLIER_LIMIT):
+    # one session: {(number, compound): DegradationFit}
+    return fit_sessions([drivers], min_stint_laps, min_laps, outlier_limit)[0]
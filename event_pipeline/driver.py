@@ -1,32 +1,88 @@
+from array import array
+
+NO_AGE = -1 # compound_ages value of a lap without a stint
+MAX_AGE = 0x7FFF # array('h')
+MAX_STINT = 0x7F # array('b')
+
+class LapStats:
+    # running count/sum/min so averages never re-scan the laps
+    __slots__ = ('count', 'total', 'fastest')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.fastest = None
+
+    def add(self, lap_time):
+        self.count += 1
+        self.total += lap_time
+        if self.fastest is None or lap_time < self.fastest:
+            self.fastest = lap_time
+
+    @property
+    def avg(self):
+        return self.total / self.count if self.count else None
+
+
 class Driver:
+    __slots__ = ('number', 'name', 'team_name', 'compound_laps', 'compound_ages', 'compound_stints', 'stats',
+                 'compound_stats')
+
     def __init__(self, name, number, team_name=None):
         self.number = number
         self.name = name
         self.team_name = team_name
-        self.lap_times = []
-        self.compound_laps = {} # compound --> list of lap times
+        self.compound_laps = {} # compound --> array of lap times
+        # parallel to compound_laps: tyre age (NO_AGE unknown) and stint number (0 unknown) of every lap,
+        # 2 + 1 bytes next to the 8 of the lap time
+        self.compound_ages = {}
+        self.compound_stints = {}
+        self.stats = LapStats() # all laps
+        self.compound_stats = {} # compound --> LapStats
 
-    def add_lap(self, lap_time, compound):
+    def add_lap(self, lap_time, compound, tyre_age=None, stint_number=None):
         # driver lap builder
-        self.lap_times.append(lap_time)
         if compound not in self.compound_laps:
-            self.compound_laps[compound] = []
+            self.compound_laps[compound] = array('d')
+            self.compound_ages[compound] = array('h')
+            self.compound_stints[compound] = array('b')
+            self.compound_stats[compound] = LapStats()
         self.compound_laps[compound].append(lap_time)
+        known = tyre_age is not None and tyre_age == tyre_age and tyre_age >= 0 # nan from the numpy engine
+        self.compound_ages[compound].append(min(int(tyre_age), MAX_AGE) if known else NO_AGE)
+        self.compound_stints[compound].append(min(int(stint_number or 0), MAX_STINT))
+        self.compound_stats[compound].add(lap_time)
+        self.stats.add(lap_time)
+
+    def clear_laps(self):
+        # live sessions re-filter a driver when new laps arrive
+        self.compound_laps = {}
+        self.compound_ages = {}
+        self.compound_stints = {}
+        self.stats = LapStats()
+        self.compound_stats = {}
+
+    @property
+    def lap_times(self):
+        # every lap, grouped by compound
+        laps = array('d')
+        for compound_laps in self.compound_laps.values():
+            laps.extend(compound_laps)
+        return laps
 
     def avg_lap_time(self, compound=None):
         # avg lap builder
         if compound:
-            laps = self.compound_laps.get(compound, [])
-        else:
-            laps = self.lap_times     
-        return sum(laps) / len(laps) if laps else None
+            stats = self.compound_stats.get(compound)
+            return stats.avg if stats else None
+        return self.stats.avg
 
     def fastest_lap_time(self, compound='SOFT'):
         # fastest lap builder
-        laps = self.compound_laps.get(compound, [])
-        return min(self.lap_times) if self.lap_times else None
-    
-    def best_avg_compound(self):
+        stats = self.compound_stats.get(compound)
+        return stats.fastest if stats else None
+
+    def best_avg_lap(self):
         med = self.avg_lap_time("MEDIUM")
         hard = self.avg_lap_time("HARD")
         if med and (not hard or med < hard):
@@ -35,8 +91,28 @@ class Driver:
             return hard, "HARD"
         else:
             return None, None
+
+    # summary values for the database, all O(1)
+    @property
+    def fastest_soft_time(self):
+        return self.fastest_lap_time("SOFT")
+
+    @property
+    def avg_med(self):
+        return self.avg_lap_time("MEDIUM")
+
+    @property
+    def avg_hard(self):
+        return self.avg_lap_time("HARD")
+
+    @property
+    def best_avg(self):
+        return self.best_avg_lap()[0]
+
+    @property
+    def best_avg_compound(self):
+        return self.best_avg_lap()[1]
+
     def prepare_summary(self):
-        self.fastest_soft_time = min(self.compound_laps.get("SOFT", []), default=None)
-        self.avg_med = self.avg_lap_time("MEDIUM")
-        self.avg_hard = self.avg_lap_time("HARD")
-        self.best_avg, self.best_avg_compound = self.best_avg_compound()
\ No newline at end of file
+        # kept for callers of the old API, summary values are always up to date
+        return self
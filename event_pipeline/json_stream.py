@@ -0,0 +1,74 @@
+import codecs
+import json
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = ' \t\n\r'
+
+
+def read_chunks(path, chunk_size=CHUNK_SIZE):
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def iter_json_array(chunks):
+    # yields the elements of a top level JSON array without loading the whole document
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buf = ''
+    pos = 0
+    started = False
+    finished = False
+
+    def skip(buf, pos, chars):
+        while pos < len(buf) and buf[pos] in chars:
+            pos += 1
+        return pos
+
+    chunks = iter(chunks)
+    eof = False
+    while not finished:
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            chunk = b''
+            eof = True
+        buf = buf[pos:] + text_decoder.decode(chunk, final=eof)
+        pos = 0
+
+        while True:
+            pos = skip(buf, pos, WHITESPACE)
+            if pos >= len(buf):
+                break
+            if not started:
+                if buf[pos] != '[':
+                    raise ValueError(f"Expected a JSON array, got {buf[pos:pos + 40]!r}")
+                started = True
+                pos += 1
+                continue
+
+            pos = skip(buf, pos, WHITESPACE + ',')
+            if pos >= len(buf):
+                break
+            if buf[pos] == ']':
+                finished = True
+                break
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                break # element continues in the next chunk
+            after = skip(buf, end, WHITESPACE)
+            if not eof and (after >= len(buf) or buf[after] not in ',]'):
+                break # a number like "2." might still be cut off
+            yield obj
+            pos = end
+
+        if eof and not finished:
+            raise ValueError("Truncated JSON array")
+
+    # drain the source so readers wrapped around it (cache tee) see the end of the body
+    for _ in chunks:
+        pass
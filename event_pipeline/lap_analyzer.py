@@ -1,78 +1,72 @@
-from .logging_config import setup_logger
-from .utils import format_time, best_avg_lap 
-from .driver import Driver
-from .team import Team
-logger = setup_logger()
+import sys
+from .logging_config import get_logger
+from .degradation import fit_degradation
+from .leaderboard import SessionLeaderboard
+from .sectors import SectorColumns, analyse_sectors
+from .report import ReportWriter, TextRenderer, session_report
+logger = get_logger()
 
 class LapAnalyzer:
-    def __init__(self, drivers, teams, track_name, session_name, year):
+    def __init__(self, drivers, teams, track_name, session_name, year, leaderboard=None, degradation=None,
+                 sector_laps=None):
         self.drivers = drivers
         self.teams = teams
         self.track_name = track_name
         self.session_name = session_name
         self.year = year
+        # rankings are computed once, printing/saving/live updates read and update them in place
+        self.leaderboard = leaderboard or SessionLeaderboard(drivers, teams)
+        # (number, compound) -> DegradationFit, shown next to the race pace
+        self.degradation = fit_degradation(drivers) if degradation is None else degradation
+        # sectors.SectorSummary from the session's SectorColumns, None without them (live mode)
+        self.sectors = analyse_sectors(sector_laps) if sector_laps is not None else None
+        self._report = None # full report, built once for the print_* sections and summary()
 
-    def print_summary(self):
-        logger.info("Creating session summary an lap time analysis")        
-        # return formatted results
-        print(f"\nSummary for {self.session_name.title()} at {self.track_name.title()}, {self.year}")
-        print("-" * 60)
+    @classmethod
+    def from_store(cls, store, track_name, session_name, year, policy=None):
+        # analyse a memory mapped LapStore directly
+        from .columnar_filter import ColumnarDriverBuilder
+        drivers, teams = ColumnarDriverBuilder.from_store(store, policy)
+        return cls(drivers, teams, track_name, session_name, year, sector_laps=SectorColumns.from_store(store))
 
-    def print_fastest_soft(self):
-        # build list of tuples for fastest soft laps
-        qualy_times = []
-        for driver in self.drivers.values():
-            fastest_soft = None
-            #gets fastest soft ONLY
-            soft_laps = driver.compound_laps.get('SOFT', [])
-            fastest_soft = min(soft_laps) if soft_laps else None
-            qualy_times.append((driver, fastest_soft))
+    def update(self, driver_numbers):
+        # after new laps for these drivers (live mode): their rankings and degradation fits, nobody else's
+        numbers = set(driver_numbers)
+        self._report = None
+        self.leaderboard.update(numbers)
+        for key in [key for key in self.degradation if key[0] in numbers]:
+            del self.degradation[key]
+        self.degradation.update(fit_degradation({n: self.drivers[n] for n in numbers if n in self.drivers}))
+
+    def report(self, session_key=None, k=None):
+        # plain data for the renderers in report.py. The default report is kept until the next update()
+        if session_key is not None or k is not None:
+            return session_report(self, session_key, k)
+        if self._report is None:
+            self._report = session_report(self)
+        return self._report
 
-        # Filter drivers without SOFT lap time
-        qualy_times = [qt for qt in qualy_times if qt[1] is not None]
-        # Sort fastest soft laps
-        qualy_times.sort(key=lambda qt: qt[1])
+    def print_summary(self):
+        print('\n'.join(TextRenderer.title(self.report())))
 
-        print(f"\nFastest Soft Tire Performance")
-        print('-' * 60)
-        for driver, fastest_soft in qualy_times:
-            print(f"{driver.name} (#{driver.number})")
-            if fastest_soft:
-                print(f"    Fastest Lap (SOFT): {format_time(fastest_soft)}")
+    def print_fastest_soft(self):
+        # drivers without a SOFT lap are not ranked
+        print('\n'.join(TextRenderer.fastest_soft(self.report())))
 
     def print_race_pace(self):
-        # build list of tuples for fastest race pace
-        race_pace = []
-        for driver in self.drivers.values():
-            best_avg, compound = best_avg_lap(driver)
-            if best_avg:
-                race_pace.append((driver, best_avg, compound))
-
-        race_pace.sort(key=lambda x: x[1])
-        
-        print(f"\nFastest Race Pace Performance")
-        print('-' * 60)
-        for driver, best_avg, compound in race_pace:
-            print(f"{driver.name} (#{driver.number})")
-            print(f"    AVG RACE PACE ({compound}): {format_time(best_avg)}")
+        print('\n'.join(TextRenderer.race_pace(self.report())))
 
     def print_team_pace(self):
-        team_pace = []
-        for team in self.teams.values():
-            best_avg, compound = best_avg_lap(team)
-            if best_avg:
-                team_pace.append((team, best_avg, compound))
+        print('\n'.join(TextRenderer.team_pace(self.report())))
 
-        team_pace.sort(key=lambda x: x[1])
+    def print_sectors(self):
+        # nothing without sector times
+        lines = TextRenderer.sectors(self.report())
+        if lines:
+            print('\n'.join(lines))
 
-        print("\n--- Team Race Pace Averages (MEDIUM/HARD) ---")
-        for team, best_avg, compound in team_pace:
-            if best_avg:
-                print(f"{team.name}: {format_time(best_avg)} ({compound})")
-        print()
-        
-    def summary(self):
-        self.print_summary()
-        self.print_fastest_soft()
-        self.print_race_pace()
-        self.print_team_pace()
\ No newline at end of file
+    def summary(self, out=None):
+        # the whole summary in one write (stdout by default)
+        logger.info("Creating session summary an lap time analysis")
+        with ReportWriter(out or sys.stdout, 'text') as writer:
+            writer.write(self.report())
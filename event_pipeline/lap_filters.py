@@ -0,0 +1,241 @@
+import heapq
+
+# Lap outlier filters, one strategy per compound. Every strategy works on
+# - a list of (lap_time, lap_number) of one driver on one compound (DriverBuilder, live mode): select()
+# - all (driver, compound) groups of a build at once (ColumnarDriverBuilder): keep_mask() over LapGroups.
+# Both return the same laps. Kept laps stay in their original order.
+
+MAD_SCALE = 1.4826 # MAD -> standard deviation for normally distributed lap times
+
+
+def quantile(values, q):
+    # linear interpolation between closest ranks, same arithmetic as LapGroups.quantile
+    ordered = sorted(values)
+    pos = q * (len(ordered) - 1)
+    lo = int(pos)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+
+class LapFilter:
+    # groups with fewer than min_laps laps use the fallback filter (if there is one)
+    name = None
+
+    def __init__(self, min_laps=0, fallback=None):
+        self.min_laps = min_laps
+        self.fallback = fallback
+
+    def select(self, laps):
+        if not laps:
+            return []
+        if self.fallback is not None and len(laps) < self.min_laps:
+            return self.fallback.select(laps)
+        return self._select(laps)
+
+    def keep_mask(self, groups, selected):
+        # bool per lap of `groups`, only laps of groups flagged in `selected` can be kept
+        if self.fallback is None or not self.min_laps:
+            return self._keep_mask(groups, selected)
+        active = selected & (groups.counts >= self.min_laps)
+        return self._keep_mask(groups, active) | self.fallback.keep_mask(groups, selected & ~active)
+
+    def settings(self):
+        # thresholds as plain data, part of the session input hash
+        settings = {'strategy': self.name, **self.params()}
+        if self.fallback is not None:
+            settings.update(min_laps=self.min_laps, fallback=self.fallback.settings())
+        return settings
+
+    def params(self):
+        return {}
+
+    def _select(self, laps):
+        raise NotImplementedError
+
+    def _keep_mask(self, groups, selected):
+        raise NotImplementedError
+
+
+class RatioToBest(LapFilter):
+    # laps within ratio x the group's fastest lap, the cutoff is never below `floor` seconds
+    name = 'ratio'
+
+    def __init__(self, ratio, floor=0.0, min_laps=0, fallback=None):
+        super().__init__(min_laps, fallback)
+        self.ratio = ratio
+        self.floor = floor
+
+    def params(self):
+        return {'ratio': self.ratio, 'floor': self.floor}
+
+    def _select(self, laps):
+        cutoff = max(min(t[0] for t in laps) * self.ratio, self.floor)
+        return [lap for lap in laps if lap[0] <= cutoff]
+
+    def _keep_mask(self, groups, selected):
+        import numpy as np
+        cutoff = np.maximum(groups.fastest * self.ratio, self.floor)
+        return selected[groups.group_ids] & (groups.times <= cutoff[groups.group_ids])
+
+
+class Percentile(LapFilter):
+    # the fastest int(n * q) laps. Ties at the cutoff go to the earlier laps
+    name = 'percentile'
+
+    def __init__(self, q, min_laps=0, fallback=None):
+        super().__init__(min_laps, fallback)
+        self.q = q
+
+    def params(self):
+        return {'q': self.q}
+
+    def _select(self, laps):
+        k = int(len(laps) * self.q)
+        chosen = {i for _, i in heapq.nsmallest(k, ((lap[0], i) for i, lap in enumerate(laps)))}
+        return [lap for i, lap in enumerate(laps) if i in chosen]
+
+    def _keep_mask(self, groups, selected):
+        import numpy as np
+        rows = np.flatnonzero(selected)
+        k = (groups.counts[rows] * self.q).astype(np.int64)
+        rows, k = rows[k > 0], k[k > 0]
+        keep = np.zeros(len(groups.times), dtype=bool)
+        if not len(rows):
+            return keep
+
+        # k-th fastest lap per group by partial selection, then every lap faster than it
+        threshold = np.full(groups.n_groups, -np.inf)
+        threshold[rows] = groups.kth_smallest(groups.times, rows, k - 1)
+        wanted = np.zeros(groups.n_groups, dtype=np.int64)
+        wanted[rows] = k
+        cutoff = threshold[groups.group_ids]
+        below = groups.times < cutoff
+        keep |= below
+
+        # laps equal to the threshold fill the remaining places in lap order
+        ties = np.flatnonzero(groups.times == cutoff)
+        if len(ties):
+            tie_groups = groups.group_ids[ties]
+            order = np.argsort(tie_groups, kind='stable')
+            first = np.searchsorted(tie_groups[order], tie_groups[order], side='left')
+            rank = np.empty(len(ties), dtype=np.int64)
+            rank[order] = np.arange(len(ties)) - first
+            room = wanted - np.bincount(groups.group_ids[below], minlength=groups.n_groups)
+            keep[ties] = rank < room[tie_groups]
+        return keep
+
+
+class IQR(LapFilter):
+    # Tukey fences: laps within [Q1 - k * IQR, Q3 + k * IQR]
+    name = 'iqr'
+
+    def __init__(self, k=1.5, min_laps=0, fallback=None):
+        super().__init__(min_laps, fallback)
+        self.k = k
+
+    def params(self):
+        return {'k': self.k}
+
+    def _select(self, laps):
+        times = [t[0] for t in laps]
+        q1, q3 = quantile(times, 0.25), quantile(times, 0.75)
+        low, high = q1 - self.k * (q3 - q1), q3 + self.k * (q3 - q1)
+        return [lap for lap in laps if low <= lap[0] <= high]
+
+    def _keep_mask(self, groups, selected):
+        import numpy as np
+        rows = np.flatnonzero(selected)
+        low = np.full(groups.n_groups, np.inf)
+        high = np.full(groups.n_groups, -np.inf)
+        if len(rows):
+            q1 = groups.quantile(groups.times, rows, 0.25)
+            q3 = groups.quantile(groups.times, rows, 0.75)
+            low[rows], high[rows] = q1 - self.k * (q3 - q1), q3 + self.k * (q3 - q1)
+        g = groups.group_ids
+        return (groups.times >= low[g]) & (groups.times <= high[g])
+
+
+class MAD(LapFilter):
+    # laps within k scaled median absolute deviations of the median
+    name = 'mad'
+
+    def __init__(self, k=3.0, min_laps=0, fallback=None):
+        super().__init__(min_laps, fallback)
+        self.k = k
+
+    def params(self):
+        return {'k': self.k}
+
+    def _select(self, laps):
+        median = quantile([t[0] for t in laps], 0.5)
+        deviations = [abs(t[0] - median) for t in laps]
+        limit = self.k * MAD_SCALE * quantile(deviations, 0.5)
+        return [lap for lap, deviation in zip(laps, deviations) if deviation <= limit]
+
+    def _keep_mask(self, groups, selected):
+        import numpy as np
+        rows = np.flatnonzero(selected)
+        keep = np.zeros(len(groups.times), dtype=bool)
+        if not len(rows):
+            return keep
+        median = np.zeros(groups.n_groups)
+        median[rows] = groups.quantile(groups.times, rows, 0.5)
+        deviations = np.abs(groups.times - median[groups.group_ids])
+        limit = np.full(groups.n_groups, -np.inf)
+        limit[rows] = self.k * MAD_SCALE * groups.quantile(deviations, rows, 0.5)
+        return deviations <= limit[groups.group_ids]
+
+
+STRATEGIES = {cls.name: cls for cls in (RatioToBest, Percentile, IQR, MAD)}
+
+
+class FilterPolicy:
+    # compound -> LapFilter, compounds without their own entry use `default`
+    def __init__(self, strategies, default):
+        self.strategies = dict(strategies)
+        self.default = default
+
+    def strategy_for(self, compound):
+        return self.strategies.get(compound, self.default)
+
+    def select(self, compound, laps):
+        return self.strategy_for(compound).select(laps)
+
+    def settings(self):
+        settings = {compound: strategy.settings() for compound, strategy in self.strategies.items()}
+        settings['default'] = self.default.settings()
+        return settings
+
+    def with_specs(self, specs, settings):
+        # "MEDIUM=iqr:1.5", "default=ratio:1.1" -> copy of this policy with those compounds replaced
+        strategies, default = dict(self.strategies), self.default
+        for spec in specs:
+            compound, _, text = spec.partition('=')
+            strategy = parse_filter(text, settings)
+            if compound.strip().lower() == 'default':
+                default = strategy
+            else:
+                strategies[compound.strip().upper()] = strategy
+        return FilterPolicy(strategies, default)
+
+
+def parse_filter(text, settings):
+    # "percentile:0.9", "ratio:1.04", "iqr", "mad:3" -> LapFilter. Groups too small for a
+    # statistic fall back to the race ratio like the default MEDIUM/HARD filter
+    name, _, arg = text.strip().lower().partition(':')
+    if name not in STRATEGIES:
+        raise ValueError(f"Unknown lap filter '{name}', choose from {', '.join(STRATEGIES)}")
+    if name == 'ratio':
+        return RatioToBest(float(arg) if arg else settings['other_ratio'], settings['floor'])
+    fallback = RatioToBest(settings['race_ratio'], settings['floor'])
+    if name == 'percentile':
+        return Percentile(float(arg) if arg else settings['race_percentile'], settings['race_min_laps'], fallback)
+    return STRATEGIES[name](float(arg), settings['race_min_laps'], fallback) if arg else \
+        STRATEGIES[name](min_laps=settings['race_min_laps'], fallback=fallback)
+
+
+def default_policy(settings):
+    # the long standing filters: 90th percentile on MEDIUM/HARD (ratio 1.04 below 5 laps), 1.08 x fastest otherwise
+    race = Percentile(settings['race_percentile'], settings['race_min_laps'],
+                      RatioToBest(settings['race_ratio'], settings['floor']))
+    return FilterPolicy({'MEDIUM': race, 'HARD': race}, RatioToBest(settings['other_ratio'], settings['floor']))
@@ -0,0 +1,197 @@
+from bisect import bisect_right
+from .db_schema import bulk_get_or_create_teams, bulk_get_or_create_drivers, bulk_insert_driver_sessions
+from .logging_config import get_logger
+from .sectors import SECTOR_FIELDS, SPEED_FIELDS
+logger = get_logger()
+
+UNKNOWN = "Unknown"
+SPLIT_FIELDS = SECTOR_FIELDS + SPEED_FIELDS # stored after the first five fields of a lap record
+
+
+def lap_record(lap):
+    # compact tuple of an OpenF1 lap:
+    # (driver_number, lap_number, lap_duration, is_pit_out_lap, deleted, *sector times, *speed traps)
+    return (
+        lap.get('driver_number'),
+        lap.get('lap_number'),
+        lap.get('lap_duration'),
+        bool(lap.get('is_pit_out_lap', False)),
+        bool(lap.get('deleted', False)),
+    ) + tuple(lap.get(name) for name in SPLIT_FIELDS)
+
+
+class RawSessionData:
+    # raw ingest payloads kept for the Lap/Stint tables. laps are lap_record() tuples
+    __slots__ = ('laps', 'driver_data', 'tire_data')
+
+    def __init__(self, driver_data=None, tire_data=None):
+        self.laps = []
+        self.driver_data = driver_data or []
+        self.tire_data = tire_data or []
+
+    def record(self, lap_data):
+        # passes laps through (list or stream) while keeping the stored fields
+        for lap in lap_data:
+            self.laps.append(lap_record(lap))
+            yield lap
+
+
+def driver_identities(driver_numbers, driver_data):
+    # number -> (name, team) using the same fallbacks as DriverBuilder
+    info = {
+        d['driver_number']: (f"{d.get('first_name', '')} {d.get('last_name', '')}".strip(), d.get('team_name', UNKNOWN))
+        for d in driver_data if d.get('driver_number')
+    }
+    return {n: info.get(n, (f"Driver {n}", UNKNOWN)) for n in driver_numbers}
+
+
+def stint_lookup(tire_data):
+    # driver -> (sorted lap_start list, stints) for bisect
+    by_driver = {}
+    for stint in tire_data:
+        if stint.get('driver_number') and stint.get('lap_start') is not None:
+            by_driver.setdefault(stint['driver_number'], []).append(stint)
+    lookup = {}
+    for driver, stints in by_driver.items():
+        stints.sort(key=lambda s: s['lap_start'])
+        lookup[driver] = ([s['lap_start'] for s in stints], stints)
+    return lookup
+
+
+def stint_for(lookup, driver, lap_number):
+    # the stint record a lap was driven in, None when no stint covers it
+    if lap_number is None or driver not in lookup:
+        return None
+    starts, stints = lookup[driver]
+    idx = bisect_right(starts, lap_number) - 1
+    if idx < 0:
+        return None
+    stint = stints[idx]
+    if stint.get('lap_end') is not None and lap_number > stint['lap_end']:
+        return None
+    return stint
+
+
+def compound_for(lookup, driver, lap_number):
+    stint = stint_for(lookup, driver, lap_number)
+    return stint['compound'] if stint is not None else UNKNOWN
+
+
+def tyre_age(stint, lap_number):
+    # laps on the set at this lap: age when fitted + laps since the stint started
+    if stint is None:
+        return None
+    return (stint.get('tyre_age_at_start') or 0) + lap_number - stint['lap_start']
+
+
+def sync_raw_session(conn, session_id, raw):
+    # incremental upsert by (session, driver, lap/stint number), unchanged rows are not rewritten
+    numbers = {lap[0] for lap in raw.laps if lap[0]}
+    numbers.update(s['driver_number'] for s in raw.tire_data if s.get('driver_number'))
+    if not numbers:
+        return 0
+
+    identities = driver_identities(numbers, raw.driver_data)
+    team_ids = bulk_get_or_create_teams(conn, session_id, [team for _, team in identities.values()])
+    driver_ids = bulk_get_or_create_drivers(conn, [(name, n) for n, (name, _) in identities.items()])
+    number_to_driver_id = {n: driver_ids[name.strip().title()] for n, (name, _) in identities.items()}
+    bulk_insert_driver_sessions(conn, session_id, [
+        (number_to_driver_id[n], team_ids[team.strip().title()], n) for n, (_, team) in identities.items()
+    ])
+
+    lookup = stint_lookup(raw.tire_data)
+    lap_rows = [
+        (session_id, number_to_driver_id[driver], lap_number, compound_for(lookup, driver, lap_number),
+         lap_duration, int(pit_out), int(deleted), *splits)
+        for driver, lap_number, lap_duration, pit_out, deleted, *splits in raw.laps
+        if driver and lap_number is not None
+    ]
+    stint_rows = [
+        (session_id, number_to_driver_id[s['driver_number']], s.get('stint_number'), s.get('compound'),
+         s.get('lap_start'), s.get('lap_end'), s.get('tyre_age_at_start'))
+        for s in raw.tire_data if s.get('driver_number') and s.get('stint_number') is not None
+    ]
+
+    cur = conn.cursor()
+    before = conn.total_changes
+    cur.executemany(f'''
+        INSERT INTO Lap (session_id, driver_id, lap_number, compound, lap_duration, is_pit_out_lap, deleted,
+                         {', '.join(SPLIT_FIELDS)})
+        VALUES (?, ?, ?, ?, ?, ?, ?, {', '.join('?' for _ in SPLIT_FIELDS)})
+        ON CONFLICT(session_id, driver_id, lap_number) DO UPDATE SET
+            compound = excluded.compound,
+            lap_duration = excluded.lap_duration,
+            is_pit_out_lap = excluded.is_pit_out_lap,
+            deleted = excluded.deleted,
+            {', '.join(f'{name} = excluded.{name}' for name in SPLIT_FIELDS)}
+        WHERE compound IS NOT excluded.compound
+           OR lap_duration IS NOT excluded.lap_duration
+           OR is_pit_out_lap IS NOT excluded.is_pit_out_lap
+           OR deleted IS NOT excluded.deleted
+           {' '.join(f'OR {name} IS NOT excluded.{name}' for name in SPLIT_FIELDS)}''', lap_rows)
+    cur.executemany('''
+        INSERT INTO Stint (session_id, driver_id, stint_number, compound, lap_start, lap_end, tyre_age_at_start)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(session_id, driver_id, stint_number) DO UPDATE SET
+            compound = excluded.compound,
+            lap_start = excluded.lap_start,
+            lap_end = excluded.lap_end,
+            tyre_age_at_start = excluded.tyre_age_at_start
+        WHERE compound IS NOT excluded.compound
+           OR lap_start IS NOT excluded.lap_start
+           OR lap_end IS NOT excluded.lap_end
+           OR tyre_age_at_start IS NOT excluded.tyre_age_at_start''', stint_rows)
+    conn.commit()
+
+    changed = conn.total_changes - before
+    logger.debug("Raw sync: %s laps, %s stints, %s rows written", len(lap_rows), len(stint_rows), changed)
+    return changed
+
+
+def find_session(conn, track_name, year, session_name):
+    # (session_id, session_key) of a stored session, same name normalisation as insert_event/insert_session
+    cur = conn.cursor()
+    cur.execute('''
+        SELECT s.session_id, s.session_key FROM Session s
+        JOIN Event e ON e.event_id = s.event_id
+        WHERE e.name = ? AND e.year = ? AND s.name = ?''',
+        (track_name.strip().title(), int(year), session_name.strip().title()))
+    return cur.fetchone()
+
+
+def load_raw_session(conn, session_id):
+    # stored laps/drivers/stints in the OpenF1 payload shape, ready for DriverBuilder
+    cur = conn.cursor()
+    cur.execute('''
+        SELECT p.number, d.name, t.name FROM DriverSessionParticipation p
+        JOIN Driver d ON d.driver_id = p.driver_id
+        JOIN Team t ON t.team_id = p.team_id
+        WHERE p.session_id = ?''', (session_id,))
+    driver_data = [
+        {'driver_number': number, 'first_name': name, 'last_name': '', 'team_name': team}
+        for number, name, team in cur.fetchall()
+    ]
+
+    cur.execute(f'''
+        SELECT p.number, l.lap_number, l.lap_duration, l.is_pit_out_lap, l.deleted,
+               {', '.join(f'l.{name}' for name in SPLIT_FIELDS)} FROM Lap l
+        JOIN DriverSessionParticipation p ON p.session_id = l.session_id AND p.driver_id = l.driver_id
+        WHERE l.session_id = ?
+        ORDER BY l.lap_id''', (session_id,))
+    lap_data = [
+        {'driver_number': number, 'lap_number': lap_number, 'lap_duration': lap_duration,
+         'is_pit_out_lap': bool(pit_out), 'deleted': bool(deleted), **dict(zip(SPLIT_FIELDS, splits))}
+        for number, lap_number, lap_duration, pit_out, deleted, *splits in cur.fetchall()
+    ]
+
+    cur.execute('''
+        SELECT p.number, s.stint_number, s.compound, s.lap_start, s.lap_end, s.tyre_age_at_start FROM Stint s
+        JOIN DriverSessionParticipation p ON p.session_id = s.session_id AND p.driver_id = s.driver_id
+        WHERE s.session_id = ?
+        ORDER BY s.stint_id''', (session_id,))
+    tire_data = [
+        {'driver_number': number, 'stint_number': stint_number, 'compound': compound,
+         'lap_start': lap_start, 'lap_end': lap_end, 'tyre_age_at_start': tyre_age}
+        for number, stint_number, compound, lap_start, lap_end, tyre_age in cur.fetchall()
+    ]
+    return lap_data, driver_data, tire_data
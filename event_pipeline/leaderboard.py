@@ -0,0 +1,124 @@
+from bisect import bisect_left, insort
+from .utils import best_avg_lap
+
+
+class Ranking:
+    # entries kept sorted by value (lower is better). Updating one entry moves only that entry
+    # (bisect + insert), rank/gap/percentile queries never sort. Ties keep first-seen order
+    def __init__(self):
+        self._order = [] # (value, seq, key), sorted
+        self._entries = {} # key -> ((value, seq, key), detail)
+        self._seq = 0
+
+    def update(self, key, value, detail=None):
+        # value None removes the entry
+        old = self._entries.pop(key, None)
+        if old is not None:
+            del self._order[bisect_left(self._order, old[0])]
+        if value is None:
+            return
+        if old is not None:
+            seq = old[0][1]
+        else:
+            seq = self._seq
+            self._seq += 1
+        item = (value, seq, key)
+        insort(self._order, item)
+        self._entries[key] = (item, detail)
+
+    def __len__(self):
+        return len(self._order)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def top(self, k=None):
+        # [(key, value, detail)] fastest first
+        items = self._order if k is None else self._order[:k]
+        return [(key, value, self._entries[key][1]) for value, _, key in items]
+
+    def leader(self):
+        return self.top(1)[0] if self._order else None
+
+    def value(self, key):
+        entry = self._entries.get(key)
+        return entry[0][0] if entry else None
+
+    def detail(self, key):
+        entry = self._entries.get(key)
+        return entry[1] if entry else None
+
+    def rank(self, key):
+        # 1 = fastest, None when not ranked
+        entry = self._entries.get(key)
+        return bisect_left(self._order, entry[0]) + 1 if entry else None
+
+    def gap(self, key):
+        # seconds behind the leader
+        entry = self._entries.get(key)
+        return entry[0][0] - self._order[0][0] if entry else None
+
+    def percentile(self, key):
+        # share of the other entries this one is at least as fast as: leader 100, last 0
+        rank = self.rank(key)
+        if rank is None:
+            return None
+        return 100.0 if len(self._order) == 1 else 100.0 * (len(self._order) - rank) / (len(self._order) - 1)
+
+    def value_at(self, percent):
+        # value at a percentile of the field (0 = fastest), linear interpolation between ranks
+        if not self._order:
+            return None
+        pos = percent / 100 * (len(self._order) - 1)
+        lo = int(pos)
+        hi = min(lo + 1, len(self._order) - 1)
+        return self._order[lo][0] + (self._order[hi][0] - self._order[lo][0]) * (pos - lo)
+
+
+class SessionLeaderboard:
+    # the rankings of one session, built once and updated per driver as laps arrive.
+    # drivers/teams are the builder's dicts, update() re-reads only the given drivers and their teams
+    def __init__(self, drivers, teams=None):
+        self.drivers = drivers
+        self.teams = teams if teams is not None else {}
+        self.fastest_soft = Ranking() # driver number -> fastest SOFT lap
+        self.race_pace = Ranking() # driver number -> best MEDIUM/HARD average, detail: compound
+        self.team_pace = Ranking() # team name -> best MEDIUM/HARD team average, detail: compound
+        self.update(list(drivers))
+
+    def update(self, driver_numbers):
+        teams = set()
+        for number in driver_numbers:
+            driver = self.drivers.get(number)
+            if driver is None:
+                continue
+            self.fastest_soft.update(number, driver.fastest_soft_time, 'SOFT')
+            pace, compound = best_avg_lap(driver)
+            self.race_pace.update(number, pace or None, compound)
+            teams.add(driver.team_name)
+        for name in teams:
+            team = self.teams.get(name)
+            if team is not None:
+                pace, compound = best_avg_lap(team)
+                self.team_pace.update(name, pace or None, compound)
+
+    def driver_ranks(self, number):
+        return {'soft_rank': self.fastest_soft.rank(number), 'pace_rank': self.race_pace.rank(number)}
+
+    def to_dict(self, k=None):
+        # plain data for JSON consumers
+        def drivers(ranking, field):
+            return [
+                {'rank': rank, 'number': number, 'driver': self.drivers[number].name, field: value,
+                 'gap': value - ranking.leader()[1], 'compound': detail}
+                for rank, (number, value, detail) in enumerate(ranking.top(k), 1)
+            ]
+        return {
+            'fastest_soft': drivers(self.fastest_soft, 'time'),
+            'race_pace': drivers(self.race_pace, 'pace'),
+            'team_pace': [
+                {'rank': rank, 'team': name, 'pace': value, 'gap': value - self.team_pace.leader()[1],
+                 'compound': detail}
+                for rank, (name, value, detail) in enumerate(self.team_pace.top(k), 1)
+            ],
+        }
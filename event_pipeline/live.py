@@ -0,0 +1,254 @@
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote
+from .data_filter import DriverBuilder
+from .data_ingestor import SessionFetcher
+from .db_handler import DBHandler
+from .db_schema import DEFAULT_DB_PATH
+from .lap_analyzer import LapAnalyzer
+from .leaderboard import SessionLeaderboard
+from .lap_store import UNKNOWN, RawSessionData, lap_record, stint_for, stint_lookup, tyre_age
+from .metrics import PipelineMetrics
+from .openf1_client import DEFAULT_TIMEOUT, FINISHED_GRACE, api_url, get_live_json, session_finished
+from .logging_config import get_logger
+logger = get_logger()
+
+# live mode: poll a running session for new laps/stints only and update drivers, teams and the DB in place
+DEFAULT_INTERVAL = 10.0 # seconds between polls
+OPEN_LAP_WINDOW = timedelta(minutes=5) # laps without a duration for longer than this are not waited for
+
+
+class IncrementalDriverBuilder(DriverBuilder):
+    # DriverBuilder fed in batches. Only drivers with new or changed laps/stints are re-filtered,
+    # so the cost of an update follows the new records, not the session length
+    def __init__(self, driver_data=None, policy=None):
+        super().__init__([], driver_data or [], [], policy)
+        self.build_lookups()
+        self.driver_laps = defaultdict(dict) # driver -> lap_number -> compact lap tuple (see RawSessionData)
+        self.driver_stints = defaultdict(dict) # driver -> stint_number -> stint record
+        self.usable = {} # driver -> usable laps
+        self.lookup = {}
+
+    def set_drivers(self, driver_data):
+        self.driver_data = driver_data
+        self.build_lookups()
+
+    def knows_driver(self, driver):
+        return driver in self.name_map
+
+    def apply(self, lap_data=(), tire_data=()):
+        # -> (RawSessionData with the rows to write, drivers that changed)
+        stints_changed = set()
+        for stint in tire_data:
+            driver, number = stint.get('driver_number'), stint.get('stint_number')
+            if driver and number is not None and self.driver_stints[driver].get(number) != stint:
+                self.driver_stints[driver][number] = stint
+                stints_changed.add(driver)
+        if stints_changed:
+            self.lookup = stint_lookup(s for stints in self.driver_stints.values() for s in stints.values())
+
+        new_laps = []
+        for lap in lap_data:
+            record = lap_record(lap)
+            driver, lap_number = record[0], record[1]
+            if not driver or lap_number is None:
+                continue
+            known = self.driver_laps[driver]
+            if known.get(lap_number) != record:
+                if lap_number not in known:
+                    self.laps_seen += 1
+                known[lap_number] = record
+                new_laps.append(record)
+
+        dirty = stints_changed | {lap[0] for lap in new_laps}
+        for driver in dirty:
+            self.refilter(driver)
+
+        # a changed stint can move the compound of laps already stored
+        delta = RawSessionData(self.driver_data, [s for d in dirty for s in self.driver_stints[d].values()])
+        delta.laps = [lap for lap in new_laps if lap[0] not in stints_changed]
+        for driver in stints_changed:
+            delta.laps.extend(self.driver_laps[driver].values())
+        return delta, dirty
+
+    def refilter(self, driver):
+        groups = defaultdict(list)
+        for lap_number in sorted(self.driver_laps[driver]):
+            _, _, lap_time, pit_out, deleted = self.driver_laps[driver][lap_number][:5]
+            if lap_time is None or deleted or pit_out:
+                continue
+            stint = stint_for(self.lookup, driver, lap_number)
+            groups[stint['compound'] if stint else UNKNOWN].append((lap_time, lap_number, stint))
+
+        self.laps_usable += sum(len(laps) for laps in groups.values()) - self.usable.get(driver, 0)
+        self.usable[driver] = sum(len(laps) for laps in groups.values())
+        if not groups and driver not in self.drivers:
+            return # like DriverBuilder: no Driver without usable laps
+
+        driver_obj = self.get_or_create_driver(driver)
+        self.laps_kept -= driver_obj.stats.count
+        driver_obj.clear_laps()
+        for compound, laps in groups.items():
+            for lap_time, lap_number, stint in self.policy.select(compound, laps):
+                driver_obj.add_lap(lap_time, compound, tyre_age(stint, lap_number), stint and stint.get('stint_number'))
+        self.laps_kept += driver_obj.stats.count
+
+    def build(self):
+        return self.drivers, self.teams
+
+
+class LapWatermark:
+    # date_start the next laps request starts from. Laps that are still running (no duration yet)
+    # are requested again until they complete, everything older is never downloaded twice
+    def __init__(self):
+        self.newest = None
+        self.running = {} # (driver, lap_number) -> date_start
+
+    def update(self, lap_data):
+        for lap in lap_data:
+            start = lap.get('date_start')
+            if not start:
+                continue
+            if self.newest is None or start > self.newest:
+                self.newest = start
+            key = (lap.get('driver_number'), lap.get('lap_number'))
+            if lap.get('lap_duration') is None:
+                self.running[key] = start
+            else:
+                self.running.pop(key, None)
+
+        # a lap that never gets a duration (retired, red flag) does not hold the watermark back forever
+        if self.running and self.newest:
+            oldest = datetime.fromisoformat(self.newest) - OPEN_LAP_WINDOW
+            self.running = {key: start for key, start in self.running.items()
+                            if datetime.fromisoformat(start) >= oldest}
+
+    def value(self):
+        if self.running:
+            return min(self.running.values())
+        return self.newest
+
+
+class LiveSession:
+    def __init__(self, track_name, session_name, year, interval=DEFAULT_INTERVAL, db_path=DEFAULT_DB_PATH,
+                 on_update=None, timeout=DEFAULT_TIMEOUT, lap_filter=None):
+        self.track_name = track_name
+        self.session_name = session_name
+        self.year = year
+        self.interval = interval
+        self.db_path = db_path
+        self.timeout = timeout
+        self.on_update = on_update or (lambda live: live.analyzer().summary())
+        self.session_key = None
+        self.session_info = None
+        self.builder = IncrementalDriverBuilder(policy=lap_filter)
+        self.leaderboard = SessionLeaderboard(self.builder.drivers, self.builder.teams)
+        # one analysis for the whole session, only the drivers of a poll are re-ranked and refitted
+        self.analysis = LapAnalyzer(self.builder.drivers, self.builder.teams, track_name, session_name, year,
+                                    leaderboard=self.leaderboard, degradation={})
+        self.watermark = LapWatermark()
+        self.polls = 0
+        self.unknown_drivers = set() # numbers the drivers endpoint was already asked about
+        self.metrics = PipelineMetrics(f"{track_name} - {session_name} ({year}) live")
+
+    @property
+    def drivers(self):
+        return self.builder.drivers
+
+    @property
+    def teams(self):
+        return self.builder.teams
+
+    def analyzer(self):
+        return self.analysis
+
+    def laps_url(self):
+        url = api_url(f"laps?session_key={self.session_key}")
+        start = self.watermark.value()
+        return f"{url}&date_start>={quote(start)}" if start else url
+
+    def stints_url(self):
+        # the current stint of every driver on track is re-read (its lap_end grows), older stints are not
+        url = api_url(f"stints?session_key={self.session_key}")
+        starts = []
+        for driver in self.builder.driver_laps:
+            stints = self.builder.driver_stints.get(driver)
+            starts.append(max(s.get('lap_start') or 1 for s in stints.values()) if stints else 1)
+        return f"{url}&lap_start>={min(starts)}" if starts and min(starts) > 1 else url
+
+    async def fetch(self, url):
+        try:
+            return await asyncio.to_thread(get_live_json, url, self.timeout)
+        except Exception as e:
+            logger.error("Live poll of %s failed: %s", url, e)
+            return []
+
+    async def start(self):
+        fetcher = SessionFetcher(self.track_name, self.session_name, self.year)
+        with self.metrics.stage('session_key'):
+            self.session_key = await asyncio.to_thread(fetcher.get_session_key)
+        self.session_info = fetcher.session_info
+        if not self.session_key:
+            return False
+        await self.refresh_drivers()
+        return True
+
+    async def refresh_drivers(self):
+        driver_data = await self.fetch(api_url(f"drivers?session_key={self.session_key}"))
+        if driver_data:
+            self.builder.set_drivers(driver_data)
+
+    async def poll(self):
+        # one round trip: new laps and stints -> aggregates -> DB -> on_update. Returns the laps that changed
+        with self.metrics.stage('poll'):
+            with self.metrics.stage('poll_fetch'):
+                lap_data, tire_data = await asyncio.gather(self.fetch(self.laps_url()), self.fetch(self.stints_url()))
+            unknown = {lap.get('driver_number') for lap in lap_data} - self.unknown_drivers - {None}
+            unknown = {number for number in unknown if not self.builder.knows_driver(number)}
+            if unknown:
+                self.unknown_drivers |= unknown
+                await self.refresh_drivers()
+
+            with self.metrics.stage('poll_apply'):
+                delta, dirty = self.builder.apply(lap_data, tire_data)
+                self.analysis.update(dirty)
+                self.watermark.update(lap_data)
+            self.polls += 1
+            self.metrics.update({'polls': 1, 'laps_fetched': len(lap_data), 'stints_fetched': len(tire_data),
+                                 'laps_changed': len(delta.laps)})
+
+            if dirty:
+                with self.metrics.stage('poll_db'):
+                    db = DBHandler(self.drivers, self.track_name, self.session_name, self.year, self.session_key,
+                                   db_path=self.db_path, raw=delta, metrics=self.metrics,
+                                   policy=self.builder.policy, leaderboard=self.leaderboard,
+                                   degradation=self.analysis.degradation, hash_inputs=False)
+                    db.save_to_db()
+                self.on_update(self)
+        logger.info("Live poll %s: %s records, %s laps changed, %s drivers updated",
+                    self.polls, len(lap_data) + len(tire_data), len(delta.laps), len(dirty))
+        return len(delta.laps)
+
+    def session_over(self, now=None):
+        # past date_end (without the grace period finished sessions get for late corrections)
+        now = (now or datetime.now(timezone.utc)) + FINISHED_GRACE
+        return session_finished(self.session_info, now=now)
+
+    async def run(self, max_polls=None):
+        # polls every `interval` seconds until the session is over and a poll brings nothing new
+        if not await self.start():
+            logger.error("Invalid session key.")
+            return self
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            changed = await self.poll()
+            if max_polls and self.polls >= max_polls:
+                break
+            if not changed and self.session_over():
+                logger.info("Session is over, live mode stopped after %s polls", self.polls)
+                break
+            await asyncio.sleep(max(0.0, self.interval - (loop.time() - started)))
+        self.metrics.update(self.builder.lap_counts())
+        return self
@@ -1,37 +1,120 @@
 # logging_config.py
+import atexit
 import logging
 import os
-from datetime import datetime
+import queue
 import re
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from .defaults import DEFAULT_LOG_DIR
+
+# Modules only call get_logger() at import, which has no side effects. Handlers are attached
+# by configure_logging() (main.py, or lazily by setup_logger on the first Session run).
+# Records go through a queue, console and file output happen on the listener thread.
+
+LOGGER_NAME = "f1_logger"
+LOG_FILE = "f1_pipeline.log"
+MAX_BYTES = 10 * 1024 * 1024
+BACKUP_COUNT = 5
+CONSOLE_FORMAT = '%(asctime)s — %(levelname)s — %(message)s'
+FILE_FORMAT = '%(asctime)s — %(levelname)s — %(processName)s — %(message)s'
+
+_handlers = []
+_listeners = []
+_worker_queue = None
+_forwarding = False # worker process: records go to the parent's queue
+
 
 def clean_filename(name):
     return re.sub(r'[^\w\w-]', '_', name.strip().lower())
 
-def setup_logger(track_name="unknowntrack", session_name="unknownsession", log_level=logging.INFO):
-    os.makedirs("logs", exist_ok=True)
-
-    clean_track = clean_filename(track_name)
-    clean_session = clean_filename(session_name)
+def get_logger():
+    return logging.getLogger(LOGGER_NAME)
 
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    
-    log_filename = f"logs/f1_{timestamp}.log"
+def is_configured():
+    return bool(_listeners) or _forwarding
 
-    logger = logging.getLogger("f1_logger")
-    logger.setLevel(log_level)
+def _reset_handlers(logger):
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
 
-    if not logger.handlers:
-        file_handler = logging.FileHandler(log_filename)
-        file_handler.setLevel(log_level)
+def configure_logging(log_dir=DEFAULT_LOG_DIR, level=logging.INFO, console=True, max_bytes=MAX_BYTES,
+                      backup_count=BACKUP_COUNT):
+    # explicit setup: queue handler on the logger, file/console handlers on a listener thread.
+    # log_dir None -> no log file
+    global _forwarding
+    logger = get_logger()
+    shutdown_logging()
+    _reset_handlers(logger)
+    logger.setLevel(level)
+    _forwarding = False
 
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+        file_handler = RotatingFileHandler(os.path.join(log_dir, LOG_FILE), maxBytes=max_bytes,
+                                           backupCount=backup_count, encoding="utf-8", delay=True)
+        file_handler.setFormatter(logging.Formatter(FILE_FORMAT))
+        _handlers.append(file_handler)
+    if console:
         console_handler = logging.StreamHandler()
-        console_handler.setLevel(log_level)
+        console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+        _handlers.append(console_handler)
 
-        formatter = logging.Formatter('%(asctime)s — %(levelname)s — %(message)s')
-        file_handler.setFormatter(formatter)
-        console_handler.setFormatter(formatter)
+    records = queue.SimpleQueue()
+    listener = QueueListener(records, *_handlers, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+    logger.addHandler(QueueHandler(records))
+    return logger
+
+def setup_logger(track_name="unknowntrack", session_name="unknownsession", log_level=logging.INFO):
+    # kept for existing callers: configures logging on first use, afterwards just returns the logger
+    if not is_configured():
+        configure_logging(level=log_level)
+    return get_logger()
 
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
+def worker_log_queue():
+    # queue that worker processes log into. Only this process writes (and rotates) the log file,
+    # so several workers never rotate the same file. None when logging is not configured.
+    global _worker_queue
+    if not _listeners:
+        return None
+    if _worker_queue is None:
+        import multiprocessing
+        _worker_queue = multiprocessing.Queue(-1)
+        listener = QueueListener(_worker_queue, *_handlers, respect_handler_level=True)
+        listener.start()
+        _listeners.append(listener)
+    return _worker_queue
 
+def configure_worker_logging(log_queue, level=logging.INFO):
+    # in a worker process: forward records to the parent. Handlers inherited through fork are
+    # dropped, their listener thread does not exist in this process. Counts as configured, so
+    # setup_logger() in Session.run does not open the log file here as well
+    global _forwarding
+    logger = get_logger()
+    _handlers.clear()
+    _listeners.clear()
+    _reset_handlers(logger)
+    logger.setLevel(level)
+    _forwarding = True
+    if log_queue is None:
+        return logger # warnings still reach stderr through logging.lastResort
+    logger.addHandler(QueueHandler(log_queue))
     return logger
+
+def shutdown_logging():
+    # flush queued records and close files
+    global _worker_queue, _forwarding
+    _forwarding = False
+    for listener in _listeners:
+        listener.stop()
+    _listeners.clear()
+    for handler in _handlers:
+        handler.close()
+    _handlers.clear()
+    if _worker_queue is not None:
+        _worker_queue.close()
+        _worker_queue = None
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,109 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+
+class PipelineMetrics:
+    # stage timers and counters for one Session run. Timestamps are wall clock based
+    # so traces of several worker processes line up when merged.
+    def __init__(self, name=None):
+        self.name = name
+        self.stages = [] # dicts in completion order: name, start, duration, pid, tid
+        self.counters = Counter()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start_wall = time.time()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            with self._lock:
+                self.stages.append({'name': name, 'start': start_wall, 'duration': duration,
+                                    'pid': os.getpid(), 'tid': threading.get_ident()})
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def update(self, values):
+        with self._lock:
+            self.counters.update(values)
+
+    def stage_totals(self):
+        totals = {}
+        for s in self.stages:
+            totals[s['name']] = totals.get(s['name'], 0.0) + s['duration']
+        return totals
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'stages': {name: round(seconds, 6) for name, seconds in self.stage_totals().items()},
+            'counters': dict(self.counters),
+            'events': list(self.stages),
+        }
+
+    def trace_events(self):
+        # Chrome trace "complete" events (ph X) plus one counter sample (ph C) at the end
+        events = [
+            {'name': s['name'], 'cat': 'pipeline', 'ph': 'X', 'ts': int(s['start'] * 1e6),
+             'dur': int(s['duration'] * 1e6), 'pid': s['pid'], 'tid': s['tid'],
+             'args': {'session': self.name} if self.name else {}}
+            for s in sorted(self.stages, key=lambda s: s['start'])
+        ]
+        if self.stages and self.counters:
+            last = max(self.stages, key=lambda s: s['start'] + s['duration'])
+            events.append({'name': self.name or 'counters', 'ph': 'C', 'pid': last['pid'],
+                           'ts': int((last['start'] + last['duration']) * 1e6), 'args': dict(self.counters)})
+        return events
+
+    def report(self):
+        lines = [f"Metrics for {self.name}" if self.name else "Metrics"]
+        for name, seconds in self.stage_totals().items():
+            lines.append(f"    {name:<16} {seconds * 1000:10.1f} ms")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"    {name:<16} {value:>10}")
+        return "\n".join(lines)
+
+
+def dump_json(metrics, path):
+    # one PipelineMetrics or a list of them (batch runs)
+    data = metrics.to_dict() if isinstance(metrics, PipelineMetrics) else [m.to_dict() for m in metrics]
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+def dump_chrome_trace(metrics, path):
+    # open in chrome://tracing or https://ui.perfetto.dev
+    metrics = [metrics] if isinstance(metrics, PipelineMetrics) else metrics
+    with open(path, "w") as f:
+        json.dump({'traceEvents': [e for m in metrics for e in m.trace_events()], 'displayTimeUnit': 'ms'}, f)
+
+def from_dict(data):
+    # rebuild metrics returned by a batch worker
+    metrics = PipelineMetrics(data.get('name'))
+    metrics.stages = list(data.get('events', []))
+    metrics.counters.update(data.get('counters', {}))
+    return metrics
+
+
+@contextlib.contextmanager
+def profiled(path=None, limit=25):
+    # cProfile around a block. Stats go to `path` (.prof, for snakeviz/pstats), the top `limit` entries to stdout
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if path:
+            profiler.dump_stats(path)
+        if limit:
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(limit)
@@ -0,0 +1,217 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from .cache import get_cache, OfflineCacheMiss
+from .defaults import DEFAULT_BASE_URL
+from .json_stream import iter_json_array, read_chunks, CHUNK_SIZE
+from .logging_config import get_logger
+logger = get_logger()
+
+# session data can still be corrected shortly after the chequered flag
+FINISHED_GRACE = timedelta(hours=2)
+# (connect, read) seconds for a single request
+DEFAULT_TIMEOUT = (5, 30)
+POOL_SIZE = 8
+
+_http = None
+_http_lock = threading.Lock()
+_base_url = None
+_transfer = {'requests': 0, 'bytes_fetched': 0, 'bytes_from_cache': 0}
+_transfer_lock = threading.Lock()
+
+
+class DeadlineExceeded(TimeoutError):
+    # a transfer still running at its deadline (see `deadline` below)
+    pass
+
+
+def _count(name, value):
+    with _transfer_lock:
+        _transfer[name] += value
+
+def transfer_stats():
+    # process wide totals, take the difference around a run
+    with _transfer_lock:
+        return dict(_transfer)
+
+
+def configure_base_url(base_url=None):
+    # None -> $OPENF1_BASE_URL or the public API
+    global _base_url
+    _base_url = base_url.rstrip("/") if base_url else None
+    return get_base_url()
+
+def get_base_url():
+    return _base_url or os.environ.get("OPENF1_BASE_URL", DEFAULT_BASE_URL).rstrip("/")
+
+def api_url(endpoint):
+    # e.g. api_url("laps?session_key=9472")
+    return f"{get_base_url()}/{endpoint}"
+
+
+def get_http_session():
+    # one keep-alive session per process, shared by every fetch thread
+    global _http
+    if _http is None:
+        with _http_lock:
+            if _http is None:
+                # requests is only imported once something actually goes to the network
+                import requests
+                from requests.adapters import HTTPAdapter
+                http = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+                http.mount("https://", adapter)
+                http.mount("http://", adapter)
+                _http = http
+    return _http
+
+
+def session_finished(session_info, now=None):
+    date_end = (session_info or {}).get("date_end")
+    if not date_end:
+        return False
+    try:
+        end = datetime.fromisoformat(date_end)
+    except ValueError:
+        return False
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    return end + FINISHED_GRACE < now
+
+
+def _remaining(url, timeout, deadline):
+    # deadline: time.monotonic() by which the whole transfer must be done, None for no limit.
+    # -> (connect, read) timeout that does not wait past it
+    if deadline is None:
+        return timeout
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded(f"{url}: deadline passed")
+    connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+    return (min(connect, remaining), min(read, remaining))
+
+
+def get_json(url, permanent=False, ttl=None, timeout=DEFAULT_TIMEOUT, deadline=None):
+    # permanent -> never expires. otherwise ttl (defaults to the catalog ttl)
+    cache = get_cache()
+    if not permanent and ttl is None:
+        ttl = cache.catalog_ttl
+
+    body = cache.get(url, None if permanent else ttl, permanent=permanent)
+    if body is not None:
+        logger.debug("Cache hit: %s", url)
+        _count('bytes_from_cache', len(body))
+        return json.loads(body)
+
+    if cache.offline:
+        raise OfflineCacheMiss(f"{url} is not cached (offline mode)")
+
+    body = _fetch(url, timeout, deadline)
+    data = json.loads(body)
+    cache.put(url, body, permanent=permanent)
+    return data
+
+
+def get_live_json(url, timeout=DEFAULT_TIMEOUT):
+    # polls of a running session, never cached: every poll asks for a different slice
+    if get_cache().offline:
+        raise OfflineCacheMiss(f"{url} is live data (offline mode)")
+    return json.loads(_fetch(url, timeout))
+
+
+def _fetch(url, timeout, deadline=None):
+    _count('requests', 1)
+    if deadline is None:
+        response = get_http_session().get(url, timeout=timeout)
+        response.raise_for_status()
+        body = response.content
+        _count('bytes_fetched', len(body))
+        return body
+
+    # read in chunks so a slow body is cut off at the deadline, not only a silent socket
+    response = get_http_session().get(url, timeout=_remaining(url, timeout, deadline), stream=True)
+    try:
+        response.raise_for_status()
+        chunks = []
+        for chunk in _read_until(response, url, CHUNK_SIZE, deadline):
+            chunks.append(chunk)
+            _count('bytes_fetched', len(chunk))
+    finally:
+        response.close()
+    return b''.join(chunks)
+
+
+def _read_until(response, url, chunk_size, deadline):
+    # body chunks. With a deadline every read returns what has arrived so far (read1, urllib3 >= 2.3) and the
+    # deadline is checked in between: a dripping body stops at it, a silent socket at the read timeout
+    if deadline is None:
+        yield from response.iter_content(chunk_size=chunk_size)
+        return
+    read1 = getattr(response.raw, 'read1', None)
+    if read1 is not None:
+        chunks = iter(lambda: read1(chunk_size, decode_content=True), b'')
+    else:
+        chunks = response.iter_content(chunk_size=chunk_size)
+    for chunk in chunks:
+        if time.monotonic() > deadline:
+            raise DeadlineExceeded(f"{url}: deadline passed during the transfer")
+        yield chunk
+
+
+def open_json_stream(url, permanent=False, ttl=None, timeout=DEFAULT_TIMEOUT, chunk_size=CHUNK_SIZE, deadline=None,
+                     cache=True):
+    # resolves the source now (cache file or open response), records are parsed as they are consumed.
+    # deadline also covers the reads while the records are consumed (DeadlineExceeded, nothing is cached).
+    # cache=False: always fetched, the body is never written to the response cache (car_data)
+    use_cache = cache
+    cache = get_cache()
+    if not permanent and ttl is None:
+        ttl = cache.catalog_ttl
+
+    path = cache.lookup(url, None if permanent else ttl, permanent=permanent) if use_cache else None
+    if path is not None:
+        logger.debug("Cache hit (stream): %s", url)
+        _count('bytes_from_cache', os.path.getsize(path))
+        return iter_json_array(read_chunks(path, chunk_size))
+
+    if cache.offline:
+        raise OfflineCacheMiss(f"{url} is not cached (offline mode)")
+
+    _count('requests', 1)
+    response = get_http_session().get(url, timeout=_remaining(url, timeout, deadline), stream=True)
+    response.raise_for_status()
+    if not use_cache:
+        return iter_json_array(_read_uncached(response, url, chunk_size, deadline))
+    return iter_json_array(_tee_to_cache(response, url, permanent, chunk_size, deadline))
+
+
+def _read_uncached(response, url, chunk_size, deadline=None):
+    try:
+        for chunk in _read_until(response, url, chunk_size, deadline):
+            _count('bytes_fetched', len(chunk))
+            yield chunk
+    finally:
+        response.close()
+
+
+def _tee_to_cache(response, url, permanent, chunk_size, deadline=None):
+    # writes the body to the cache while it is parsed, only complete bodies are kept
+    cache = get_cache()
+    tmp_path = cache.temp_path(url)
+    complete = False
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in _read_until(response, url, chunk_size, deadline):
+                f.write(chunk)
+                _count('bytes_fetched', len(chunk))
+                yield chunk
+        complete = True
+    finally:
+        response.close()
+        if complete:
+            cache.put_file(url, tmp_path, permanent=permanent)
+        elif os.path.exists(tmp_path):
+            os.remove(tmp_path)
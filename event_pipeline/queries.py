@@ -0,0 +1,83 @@
+from .utils import format_time
+
+# read side of the summary tables maintained by db_schema.refresh_session_aggregates
+
+
+def driver_weekend_pace(conn, track_name, year):
+    # every driver's best soft lap and race pace across all sessions of one weekend
+    cur = conn.cursor()
+    cur.execute('''
+        SELECT d.name, p.sessions, p.best_soft_time, p.best_race_pace, p.avg_race_pace
+        FROM DriverEventPace p
+        JOIN Event e ON e.event_id = p.event_id
+        JOIN Driver d ON d.driver_id = p.driver_id
+        WHERE e.name = ? AND e.year = ?
+        ORDER BY p.best_race_pace IS NULL, p.best_race_pace''', (track_name.strip().title(), int(year)))
+    return [
+        {'driver': name, 'sessions': sessions, 'best_soft_time': soft,
+         'best_race_pace': best_pace, 'avg_race_pace': avg_pace}
+        for name, sessions, soft, best_pace, avg_pace in cur.fetchall()
+    ]
+
+def team_pace_trend(conn, year, team_name=None):
+    # team race pace per session through a season, in session order
+    query = '''
+        SELECT t.team_name, e.name, s.name, t.race_pace, t.compound
+        FROM TeamSessionPace t
+        JOIN Session s ON s.session_id = t.session_id
+        JOIN Event e ON e.event_id = t.event_id
+        WHERE t.year = ?'''
+    params = [int(year)]
+    if team_name:
+        query += " AND t.team_name = ?"
+        params.append(team_name.strip().title())
+    query += " ORDER BY t.team_name, s.session_key, s.session_id"
+
+    cur = conn.cursor()
+    cur.execute(query, params)
+    return [
+        {'team': team, 'event': event, 'session': session, 'race_pace': pace, 'compound': compound}
+        for team, event, session, pace, compound in cur.fetchall()
+    ]
+
+def fastest_soft_leaderboard(conn, year, limit=20):
+    # season-wide best soft lap per driver and where it was set
+    cur = conn.cursor()
+    cur.execute('''
+        SELECT d.name, b.best_soft_time, e.name, s.name
+        FROM DriverSeasonBest b
+        JOIN Driver d ON d.driver_id = b.driver_id
+        JOIN Session s ON s.session_id = b.session_id
+        JOIN Event e ON e.event_id = s.event_id
+        WHERE b.year = ?
+        ORDER BY b.best_soft_time
+        LIMIT ?''', (int(year), limit))
+    return [
+        {'driver': name, 'best_soft_time': soft, 'event': event, 'session': session}
+        for name, soft, event, session in cur.fetchall()
+    ]
+
+
+def print_driver_weekend_pace(rows, track_name, year):
+    print(f"\nWeekend pace at {track_name.title()}, {year}")
+    print('-' * 60)
+    for r in rows:
+        print(f"{r['driver']} ({r['sessions']} sessions)")
+        print(f"    Best Soft: {format_time(r['best_soft_time'])}  "
+              f"Best Race Pace: {format_time(r['best_race_pace'])}  Avg Race Pace: {format_time(r['avg_race_pace'])}")
+
+def print_team_pace_trend(rows, year):
+    print(f"\nTeam race pace trend, {year}")
+    print('-' * 60)
+    team = None
+    for r in rows:
+        if r['team'] != team:
+            team = r['team']
+            print(team)
+        print(f"    {r['event']} {r['session']}: {format_time(r['race_pace'])} ({r['compound']})")
+
+def print_fastest_soft_leaderboard(rows, year):
+    print(f"\nFastest Soft Laps, {year} season")
+    print('-' * 60)
+    for idx, r in enumerate(rows, 1):
+        print(f"{idx}. {r['driver']}: {format_time(r['best_soft_time'])} ({r['event']} {r['session']})")
@@ -0,0 +1,300 @@
+import csv
+import io
+import json
+import os
+from .utils import format_time
+
+# Session reports in several formats. Computation and output are separate:
+# - session_report() turns a LapAnalyzer into plain data (also what batch workers send back)
+# - a renderer turns that data into text, one string per session
+# - ReportWriter joins the strings in memory and writes them in large chunks, one writer per output file.
+# A season rendered into one file costs a few writes, not a print() per line.
+
+DEFAULT_BUFFER_SIZE = 1 << 20 # characters held before a write
+RULE = '-' * 60
+
+
+def session_report(analyzer, session_key=None, k=None):
+    # plain, picklable data: session info + the leaderboard tables (top k rows, all by default).
+    # Race pace rows carry the tyre degradation on their compound, all fits are under 'degradation'.
+    # Sector tables are empty when the analyzer has no sector analysis
+    year = analyzer.year
+    tables = analyzer.leaderboard.to_dict(k)
+    for row in tables['race_pace']:
+        fit = analyzer.degradation.get((row['number'], row['compound']))
+        row['deg_rate'] = fit.deg_rate if fit else None
+        row['deg_r2'] = fit.r2 if fit else None
+    return {
+        'track': analyzer.track_name,
+        'session': analyzer.session_name,
+        'year': int(year) if str(year).isdigit() else year,
+        'session_key': session_key,
+        **tables,
+        'degradation': [fit.to_dict() for fit in sorted(analyzer.degradation.values(),
+                                                        key=lambda fit: (fit.number, str(fit.compound)))],
+        **sector_tables(analyzer, k),
+    }
+
+
+def sector_tables(analyzer, k=None):
+    # theoretical best lap ranking (top k) and the session best sector owners
+    sectors = analyzer.sectors
+    if sectors is None:
+        return {'theoretical_best': [], 'session_best_sectors': []}
+
+    def name(number):
+        driver = analyzer.drivers.get(number)
+        return driver.name if driver else f"Driver {number}"
+
+    ranked = sectors.ranked()
+    ranked = ranked if k is None else ranked[:k]
+    leader = ranked[0].theoretical_best if ranked else None
+    return {
+        'theoretical_best': [
+            {'rank': rank, 'number': d.number, 'driver': name(d.number),
+             'sector_1': d.best_sectors[0], 'sector_2': d.best_sectors[1], 'sector_3': d.best_sectors[2],
+             'theoretical_best': d.theoretical_best, 'best_lap': d.best_lap, 'ideal_gap': d.ideal_gap,
+             'top_speed': d.top_speed, 'gap': d.theoretical_best - leader,
+             'session_best': sectors.owned_sectors(d.number)}
+            for rank, d in enumerate(ranked, 1)
+        ],
+        'session_best_sectors': [
+            {'sector': sector, 'number': best[0], 'driver': name(best[0]), 'time': best[1]}
+            for sector, best in enumerate(sectors.session_best, 1) if best
+        ],
+    }
+
+
+def format_sector(seconds):
+    return "N/A" if seconds is None else f"{seconds:.3f}"
+
+
+def format_deg(rate, r2=None):
+    if rate is None:
+        return "N/A"
+    return f"{rate:+.3f} s/lap" + (f" (r2 {r2:.2f})" if r2 is not None else "")
+
+
+class Renderer:
+    # header/footer wrap all sessions of one output, render() is one session
+    name = None
+
+    def header(self):
+        return ''
+
+    def footer(self):
+        return ''
+
+    def render(self, report):
+        raise NotImplementedError
+
+
+class TextRenderer(Renderer):
+    # the console layout of LapAnalyzer.summary(). The sections are also printed on their own
+    name = 'text'
+
+    def render(self, report):
+        lines = (self.title(report) + self.fastest_soft(report) + self.race_pace(report)
+                 + self.team_pace(report) + self.sectors(report))
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def title(report):
+        return ['', f"Summary for {report['session'].title()} at {report['track'].title()}, {report['year']}", RULE]
+
+    @staticmethod
+    def fastest_soft(report):
+        lines = ['', "Fastest Soft Tire Performance", RULE]
+        for row in report['fastest_soft']:
+            lines.append(f"{row['driver']} (#{row['number']})")
+            lines.append(f"    Fastest Lap (SOFT): {format_time(row['time'])}")
+        return lines
+
+    @staticmethod
+    def race_pace(report):
+        lines = ['', "Fastest Race Pace Performance", RULE]
+        for row in report['race_pace']:
+            lines.append(f"{row['driver']} (#{row['number']})")
+            lines.append(f"    AVG RACE PACE ({row['compound']}): {format_time(row['pace'])}")
+            if row.get('deg_rate') is not None:
+                lines.append(f"    TYRE DEG ({row['compound']}): {format_deg(row['deg_rate'], row['deg_r2'])}")
+        return lines
+
+    @staticmethod
+    def team_pace(report):
+        lines = ['', "--- Team Race Pace Averages (MEDIUM/HARD) ---"]
+        lines.extend(f"{row['team']}: {format_time(row['pace'])} ({row['compound']})" for row in report['team_pace'])
+        return lines + ['']
+
+    @staticmethod
+    def sectors(report):
+        # only shown when the session has sector times
+        if not report.get('theoretical_best'):
+            return []
+        lines = ["Theoretical Best Lap (best sectors)", RULE]
+        for row in report['theoretical_best']:
+            owned = ''.join(f" *S{sector}" for sector in row['session_best'])
+            lines.append(f"{row['driver']} (#{row['number']}){owned}")
+            lines.append(f"    THEORETICAL BEST: {format_time(row['theoretical_best'])} "
+                         f"({' / '.join(format_sector(row[f'sector_{i}']) for i in (1, 2, 3))})")
+            lines.append(f"    BEST LAP: {format_time(row['best_lap'])} ({row['ideal_gap']:+.3f} to ideal)"
+                         if row['ideal_gap'] is not None else f"    BEST LAP: {format_time(row['best_lap'])}")
+        lines.append('')
+        lines.extend(f"Session best S{row['sector']}: {format_sector(row['time'])} {row['driver']} (#{row['number']})"
+                     for row in report['session_best_sectors'])
+        return lines + ['']
+
+
+class JsonLinesRenderer(Renderer):
+    # one JSON object per session and line
+    name = 'jsonl'
+
+    def render(self, report):
+        return json.dumps(report, separators=(',', ':')) + '\n'
+
+
+class CsvRenderer(Renderer):
+    # one row per ranked driver/team, all tables of all sessions under one header. Times in seconds,
+    # theoretical_best rows: time is the theoretical best, gap to the fastest one
+    name = 'csv'
+    COLUMNS = ['year', 'track', 'session', 'session_key', 'table', 'rank', 'number', 'driver', 'team',
+               'compound', 'time', 'gap', 'deg_rate', 'deg_r2', 'sector_1', 'sector_2', 'sector_3', 'best_lap',
+               'ideal_gap', 'top_speed']
+
+    def header(self):
+        return self._rows([self.COLUMNS])
+
+    def render(self, report):
+        info = [report['year'], report['track'], report['session'], report['session_key']]
+        rows = [info + ['fastest_soft', r['rank'], r['number'], r['driver'], '', r['compound'], r['time'], r['gap']]
+                for r in report['fastest_soft']]
+        rows += [info + ['race_pace', r['rank'], r['number'], r['driver'], '', r['compound'], r['pace'], r['gap'],
+                         r.get('deg_rate'), r.get('deg_r2')]
+                 for r in report['race_pace']]
+        rows += [info + ['team_pace', r['rank'], '', '', r['team'], r['compound'], r['pace'], r['gap']]
+                 for r in report['team_pace']]
+        rows += [info + ['theoretical_best', r['rank'], r['number'], r['driver'], '', '', r['theoretical_best'],
+                         r['gap'], '', '', r['sector_1'], r['sector_2'], r['sector_3'], r['best_lap'], r['ideal_gap'],
+                         r['top_speed']]
+                 for r in report.get('theoretical_best', ())]
+        return self._rows([row + [''] * (len(self.COLUMNS) - len(row)) for row in rows])
+
+    @staticmethod
+    def _rows(rows):
+        out = io.StringIO()
+        csv.writer(out, lineterminator='\n').writerows(rows)
+        return out.getvalue()
+
+
+class MarkdownRenderer(Renderer):
+    # one section per session with a table per ranking
+    name = 'markdown'
+
+    def render(self, report):
+        lines = [f"## {report['session'].title()} at {report['track'].title()}, {report['year']}", '']
+        lines += self._table("Fastest Soft Tire Performance", ['#', 'Driver', 'No.', 'Fastest Lap (SOFT)', 'Gap'],
+                             [[r['rank'], r['driver'], r['number'], format_time(r['time']), f"+{r['gap']:.3f}"]
+                              for r in report['fastest_soft']])
+        lines += self._table("Fastest Race Pace Performance",
+                             ['#', 'Driver', 'No.', 'Compound', 'Avg Race Pace', 'Gap', 'Tyre Deg'],
+                             [[r['rank'], r['driver'], r['number'], r['compound'], format_time(r['pace']),
+                               f"+{r['gap']:.3f}", format_deg(r.get('deg_rate'), r.get('deg_r2'))]
+                              for r in report['race_pace']])
+        lines += self._table("Team Race Pace Averages (MEDIUM/HARD)", ['#', 'Team', 'Compound', 'Avg Race Pace', 'Gap'],
+                             [[r['rank'], r['team'], r['compound'], format_time(r['pace']), f"+{r['gap']:.3f}"]
+                              for r in report['team_pace']])
+        if report.get('theoretical_best'):
+            lines += self._table("Theoretical Best Lap",
+                                 ['#', 'Driver', 'No.', 'S1', 'S2', 'S3', 'Theoretical Best', 'Best Lap', 'To Ideal',
+                                  'Session Best'],
+                                 [[r['rank'], r['driver'], r['number'], format_sector(r['sector_1']),
+                                   format_sector(r['sector_2']), format_sector(r['sector_3']),
+                                   format_time(r['theoretical_best']), format_time(r['best_lap']),
+                                   format_sector(r['ideal_gap']), ' '.join(f"S{i}" for i in r['session_best'])]
+                                  for r in report['theoretical_best']])
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _table(title, columns, rows):
+        lines = [f"### {title}", '']
+        if not rows:
+            return lines + ["_No data_", '']
+        lines.append('| ' + ' | '.join(columns) + ' |')
+        lines.append('|' + '|'.join('---' for _ in columns) + '|')
+        for row in rows:
+            lines.append('| ' + ' | '.join(str(value).replace('|', '\\|') for value in row) + ' |')
+        return lines + ['']
+
+
+FORMATS = {cls.name: cls for cls in (TextRenderer, JsonLinesRenderer, CsvRenderer, MarkdownRenderer)}
+EXTENSIONS = {'.txt': 'text', '.jsonl': 'jsonl', '.csv': 'csv', '.md': 'markdown'}
+
+
+def format_for(path, fmt=None):
+    # explicit format first, then the file extension, text otherwise
+    if fmt:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown report format '{fmt}', choose from {', '.join(FORMATS)}")
+        return fmt
+    return EXTENSIONS.get(os.path.splitext(str(path))[1].lower(), 'text')
+
+
+class ReportWriter:
+    # renders reports into one output. `target` is a path (opened and closed here) or an open text
+    # stream such as sys.stdout (only flushed). Rendered text is written once buffer_size characters
+    # are pending and on close()
+    def __init__(self, target, fmt=None, buffer_size=DEFAULT_BUFFER_SIZE):
+        self._owned = isinstance(target, (str, os.PathLike))
+        self.renderer = FORMATS[format_for(target if self._owned else '', fmt)]()
+        self.buffer_size = buffer_size
+        self.sessions = 0
+        self.writes = 0 # calls to the underlying file's write()
+        self._chunks = []
+        self._pending = 0
+        self._stream = open(target, 'w', encoding='utf-8') if self._owned else target
+        self._add(self.renderer.header())
+
+    def write(self, report):
+        self._add(self.renderer.render(report))
+        self.sessions += 1
+
+    def write_all(self, reports):
+        for report in reports:
+            self.write(report)
+
+    def flush(self):
+        if self._chunks:
+            self._stream.write(''.join(self._chunks))
+            self.writes += 1
+            self._chunks, self._pending = [], 0
+        self._stream.flush()
+
+    def close(self):
+        if self._stream is None:
+            return
+        self._add(self.renderer.footer())
+        self.flush()
+        if self._owned:
+            self._stream.close()
+        self._stream = None
+
+    def _add(self, text):
+        if not text:
+            return
+        self._chunks.append(text)
+        self._pending += len(text)
+        if self._pending >= self.buffer_size:
+            self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_reports(reports, target, fmt=None, buffer_size=DEFAULT_BUFFER_SIZE):
+    # many sessions into one file, returns the writer (sessions/writes counts)
+    with ReportWriter(target, fmt, buffer_size) as writer:
+        writer.write_all(reports)
+    return writer
@@ -0,0 +1,165 @@
+from array import array
+
+# Sector times and speed traps. Ingest keeps them as typed per lap columns (SectorColumns), the analysis
+# works on all drivers at once: best sector per driver, theoretical best lap (sum of the best sectors),
+# gap between the best actual lap and that ideal, session best sector owners and top speed.
+# Deleted and pit out laps are skipped like in DriverBuilder. No lap filter: best sectors are the fastest.
+
+SECTOR_FIELDS = ('duration_sector_1', 'duration_sector_2', 'duration_sector_3')
+SPEED_FIELDS = ('i1_speed', 'i2_speed', 'st_speed')
+NAN = float('nan')
+
+
+class SectorColumns:
+    # per lap: driver, lap number, usable flag and lap/sector times + speeds (nan when missing)
+    FIELDS = ('lap_duration',) + SECTOR_FIELDS + SPEED_FIELDS
+    __slots__ = ('drivers', 'lap_numbers', 'usable', 'values')
+
+    def __init__(self):
+        self.drivers = array('q')
+        self.lap_numbers = array('q')
+        self.usable = array('b')
+        self.values = {name: array('d') for name in self.FIELDS}
+
+    def __len__(self):
+        return len(self.drivers)
+
+    def add(self, lap):
+        lap_number = lap.get('lap_number')
+        self.drivers.append(lap.get('driver_number') or 0)
+        self.lap_numbers.append(-1 if lap_number is None else lap_number)
+        self.usable.append(not lap.get('deleted', False) and not lap.get('is_pit_out_lap', False))
+        for name, column in self.values.items():
+            value = lap.get(name)
+            column.append(NAN if value is None else value)
+
+    def record(self, lap_data):
+        # passes laps through (list or stream) while keeping the sector fields
+        for lap in lap_data:
+            self.add(lap)
+            yield lap
+
+    @classmethod
+    def from_laps(cls, lap_data):
+        # OpenF1 lap dicts, one column at a time
+        lap_data = list(lap_data)
+        columns = cls()
+        columns.drivers = array('q', [lap.get('driver_number') or 0 for lap in lap_data])
+        columns.lap_numbers = array('q', [-1 if lap.get('lap_number') is None else lap['lap_number']
+                                          for lap in lap_data])
+        columns.usable = array('b', [not (lap.get('deleted', False) or lap.get('is_pit_out_lap', False))
+                                     for lap in lap_data])
+        for name in cls.FIELDS:
+            values = [lap.get(name) for lap in lap_data]
+            columns.values[name] = array('d', [NAN if value is None else value for value in values])
+        return columns
+
+    @classmethod
+    def from_records(cls, records):
+        # lap_store.lap_record() tuples (RawSessionData.laps)
+        columns = cls()
+        columns.drivers = array('q', [record[0] or 0 for record in records])
+        columns.lap_numbers = array('q', [-1 if record[1] is None else record[1] for record in records])
+        columns.usable = array('b', [not (record[3] or record[4]) for record in records])
+        for name, idx in zip(cls.FIELDS, (2, 5, 6, 7, 8, 9, 10)):
+            columns.values[name] = array('d', [NAN if record[idx] is None else record[idx] for record in records])
+        return columns
+
+    @classmethod
+    def from_store(cls, store):
+        # a columnar_store.LapStore
+        columns = cls()
+        columns.drivers = array('q', store.driver_number.astype('int64').tobytes())
+        columns.lap_numbers = array('q', store.lap_number.astype('int64').tobytes())
+        columns.usable = array('b', store.usable().astype('int8').tobytes())
+        for name in cls.FIELDS:
+            columns.values[name] = array('d', getattr(store, name).astype('float64').tobytes())
+        return columns
+
+    def matrix(self):
+        # (drivers, usable, values n x len(FIELDS)) as numpy arrays
+        import numpy as np
+        values = np.empty((len(self), len(self.FIELDS)))
+        for idx, name in enumerate(self.FIELDS):
+            values[:, idx] = np.frombuffer(self.values[name], dtype=np.float64)
+        return (np.frombuffer(self.drivers, dtype=np.int64), np.frombuffer(self.usable, dtype=np.int8).astype(bool),
+                values)
+
+
+class DriverSectors:
+    __slots__ = ('number', 'best_sectors', 'best_lap', 'theoretical_best', 'ideal_gap', 'top_speed')
+
+    def __init__(self, number, best_sectors, best_lap, theoretical_best, ideal_gap, top_speed):
+        self.number = number
+        self.best_sectors = best_sectors # (s1, s2, s3), None for a sector without a time
+        self.best_lap = best_lap
+        self.theoretical_best = theoretical_best # sum of the best sectors, None unless all three are known
+        self.ideal_gap = ideal_gap # best_lap - theoretical_best
+        self.top_speed = top_speed # speed trap (st_speed), km/h
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class SectorSummary:
+    def __init__(self, drivers, session_best):
+        self.drivers = drivers # number -> DriverSectors
+        self.session_best = session_best # per sector (number, time) of the session best, None without times
+
+    def __len__(self):
+        return len(self.drivers)
+
+    def get(self, number):
+        return self.drivers.get(number)
+
+    def ranked(self):
+        # drivers with a theoretical best, fastest first
+        return sorted((d for d in self.drivers.values() if d.theoretical_best is not None),
+                      key=lambda d: (d.theoretical_best, d.number))
+
+    def owned_sectors(self, number):
+        # sector numbers (1-3) this driver holds the session best of
+        return [idx for idx, best in enumerate(self.session_best, 1) if best and best[0] == number]
+
+
+def _value(x):
+    return None if x != x else float(x) # nan -> None
+
+
+def analyse_sectors(columns):
+    # SectorColumns -> SectorSummary, one pass of grouped reductions over every lap of every driver
+    import numpy as np
+    drivers, usable, values = columns.matrix()
+    rows = usable & (drivers != 0)
+    drivers, values = drivers[rows], values[rows]
+    if not len(drivers):
+        return SectorSummary({}, [None] * len(SECTOR_FIELDS))
+
+    # laps sorted by driver, then one reduceat per column over the driver runs
+    order = np.argsort(drivers, kind='stable')
+    drivers, values = drivers[order], values[order]
+    starts = np.flatnonzero(np.r_[True, drivers[1:] != drivers[:-1]])
+    numbers = drivers[starts]
+    n_times = 1 + len(SECTOR_FIELDS)
+    times = np.where(np.isnan(values[:, :n_times]), np.inf, values[:, :n_times])
+    best = np.minimum.reduceat(times, starts, axis=0)
+    best[np.isinf(best)] = np.nan
+    top_speed = np.fmax.reduceat(values[:, -1], starts) # nan only when the driver has no speed at all
+
+    # rounded to the timing precision (ms), + 0.0 turns -0.0 into 0.0
+    theoretical = np.round(best[:, 1:].sum(axis=1), 3) + 0.0 # nan when a sector is missing
+    ideal_gap = np.round(best[:, 0] - theoretical, 3) + 0.0
+
+    # session best per sector: the first lap (in driver order) with the lowest time
+    fastest = np.argmin(times[:, 1:], axis=0)
+    session_best = [
+        (int(drivers[lap]), float(times[lap, 1 + sector])) if np.isfinite(times[lap, 1 + sector]) else None
+        for sector, lap in enumerate(fastest.tolist())
+    ]
+
+    result = {}
+    for idx, number in enumerate(numbers.tolist()):
+        result[number] = DriverSectors(
+            number, tuple(_value(t) for t in best[idx, 1:].tolist()), _value(best[idx, 0]),
+            _value(theoretical[idx]), _value(ideal_gap[idx]), _value(top_speed[idx]))
+    return SectorSummary(result, session_best)
@@ -1,29 +1,135 @@
-from .data_ingestor import SessionFetcher, DataIngestor
+import logging
+from .data_ingestor import SessionFetcher, DataIngestor, builder_for
 from .lap_analyzer import LapAnalyzer
 from .db_handler import DBHandler
+from .db_schema import DEFAULT_DB_PATH, get_connection
+from .lap_store import find_session, load_raw_session
+from .sectors import SectorColumns
+from .cache import get_cache
+from .metrics import PipelineMetrics
+from .openf1_client import transfer_stats
 from .logging_config import setup_logger
 
 class Session:
-    def __init__(self, track_name, session_name, year):
+    def __init__(self, track_name, session_name, year, engine='python', stream=False, db_path=DEFAULT_DB_PATH,
+                 source='api', lap_store_dir=None, lap_filter=None, telemetry_dir=None):
         self.track_name = track_name
         self.session_name = session_name
         self.year = year
         self.session_key = None
         self.drivers = {}
         self.teams = {}
+        self.sectors = None # SectorColumns of the session's laps
+        self.analyzer = None # LapAnalyzer of the last run, report() for the renderers
+        self.engine = engine # DriverBuilder engine: 'python' or 'numpy'
+        self.stream = stream
+        self.db_path = db_path
+        self.source = source # 'api' or 'db' (re-analyse stored laps, no network)
+        self.lap_store_dir = lap_store_dir # reuse/write memory mapped lap stores of finished sessions
+        self.lap_filter = lap_filter # lap_filters.FilterPolicy, None -> default filters
+        self.telemetry_dir = telemetry_dir # ingest car_data into a telemetry store here (API runs only)
+        self.telemetry = None # telemetry.LapTelemetry of the last run
+        self.metrics = PipelineMetrics(f"{track_name} - {session_name} ({year})")
 
-    def run(self):
+    def run(self, show_summary=True):
         logger = setup_logger(self.track_name, self.session_name)
+        self.metrics = PipelineMetrics(self.metrics.name)
+        cache = get_cache()
+        cache_before = (cache.hits, cache.misses)
+        transfer_before = transfer_stats()
 
-        self.session_key = SessionFetcher(self.track_name, self.session_name, self.year).get_session_key()
-        if not self.session_key:
-            logger.error("Invalid session key.")
-            return
-        
-        self.drivers, self.teams = DataIngestor(self.session_key).load_data()
+        try:
+            with self.metrics.stage('run'):
+                self._run(logger, show_summary)
+        finally:
+            transfer = transfer_stats()
+            self.metrics.update({name: transfer[name] - transfer_before[name] for name in transfer})
+            self.metrics.update({'cache_hits': cache.hits - cache_before[0],
+                                 'cache_misses': cache.misses - cache_before[1]})
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(self.metrics.report())
 
-        analyzer = LapAnalyzer(self.drivers, self.teams, self.track_name, self.session_name, self.year)
-        analyzer.summary()
+    def _run(self, logger, show_summary):
+        raw = None
+        finished = False
+        if self.source == 'db':
+            with self.metrics.stage('load_db'):
+                found = self.load_from_db()
+            if not found:
+                logger.error("Session not found in database.")
+                return
+        else:
+            fetcher = SessionFetcher(self.track_name, self.session_name, self.year)
+            with self.metrics.stage('session_key'):
+                self.session_key = fetcher.get_session_key()
+            if not self.session_key:
+                logger.error("Invalid session key.")
+                return
 
-        db = DBHandler(self.drivers, self.track_name, self.session_name, self.year, self.session_key)
-        db.save_to_db()
\ No newline at end of file
+            finished = fetcher.is_finished()
+            if self.lap_store_dir and finished and self.has_lap_store():
+                from .columnar_store import open_store
+                from .columnar_filter import ColumnarDriverBuilder
+                logger.info("Loading session %s from lap store", self.session_key)
+                with self.metrics.stage('lap_store'):
+                    store = open_store(self.session_key, self.lap_store_dir)
+                    self.drivers, self.teams = ColumnarDriverBuilder.from_store(store, self.lap_filter)
+                    self.sectors = SectorColumns.from_store(store)
+                usable = int(store.usable().sum())
+                kept = sum(driver.stats.count for driver in self.drivers.values())
+                self.metrics.update({'laps_seen': len(store), 'laps_usable': usable,
+                                     'laps_filtered': usable - kept, 'laps_kept': kept})
+            else:
+                ingestor = DataIngestor(self.session_key, finished=finished, engine=self.engine, stream=self.stream,
+                                        keep_raw=True, store_dir=self.lap_store_dir if finished else None,
+                                        metrics=self.metrics, policy=self.lap_filter)
+                self.drivers, self.teams = ingestor.load_data()
+                raw = ingestor.raw
+                self.sectors = ingestor.sectors
+
+        analyzer = self.analyzer = LapAnalyzer(self.drivers, self.teams, self.track_name, self.session_name, self.year,
+                                               sector_laps=self.sectors)
+        if show_summary:
+            with self.metrics.stage('analysis'):
+                analyzer.summary()
+
+        db = DBHandler(self.drivers, self.track_name, self.session_name, self.year, self.session_key,
+                       db_path=self.db_path, raw=raw, metrics=self.metrics, policy=self.lap_filter,
+                       leaderboard=analyzer.leaderboard, degradation=analyzer.degradation,
+                       sectors=analyzer.sectors)
+        with self.metrics.stage('db_save'):
+            db.save_to_db()
+
+        if self.telemetry_dir and self.source != 'db':
+            with self.metrics.stage('telemetry'):
+                self.load_telemetry(finished)
+
+    def load_telemetry(self, finished):
+        # car_data -> telemetry store -> per lap aggregates in LapTelemetry
+        from .telemetry import TelemetryIngestor
+        from .db_schema import replace_lap_telemetry
+        ingestor = TelemetryIngestor(self.session_key, finished=finished, store_dir=self.telemetry_dir,
+                                     metrics=self.metrics)
+        _, self.telemetry = ingestor.load()
+        conn = get_connection(self.db_path)
+        row = find_session(conn, self.track_name, self.year, self.session_name)
+        if row is not None:
+            with conn:
+                replace_lap_telemetry(conn, row[0], self.telemetry.rows())
+
+    def load_from_db(self):
+        conn = get_connection(self.db_path)
+        row = find_session(conn, self.track_name, self.year, self.session_name)
+        if row is None:
+            return False
+        session_id, self.session_key = row
+        lap_data, driver_data, tire_data = load_raw_session(conn, session_id)
+        builder = builder_for(self.engine)(lap_data, driver_data, tire_data, self.lap_filter)
+        self.drivers, self.teams = builder.build()
+        self.sectors = SectorColumns.from_laps(lap_data)
+        self.metrics.update(builder.lap_counts())
+        return True
+
+    def has_lap_store(self):
+        from .columnar_store import has_store
+        return has_store(self.session_key, self.lap_store_dir)
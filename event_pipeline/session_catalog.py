@@ -0,0 +1,197 @@
+import os
+import sqlite3
+import threading
+from .defaults import DEFAULT_CATALOG_PATH
+from .openf1_client import api_url, get_json, session_finished
+from .logging_config import get_logger
+logger = get_logger()
+
+
+def catalog_key(circuit_short_name, year, session_name):
+    return ((circuit_short_name or '').strip().lower(), int(year), (session_name or '').strip().lower())
+
+
+class SessionCatalog:
+    def __init__(self, path=DEFAULT_CATALOG_PATH):
+        self.path = path
+        self._index = None # (circuit, year, session_name) -> session_key
+        self._tracks = set() # (circuit, year)
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory and not self._ready:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        if self._ready:
+            return conn
+        conn.executescript('''
+        CREATE TABLE IF NOT EXISTS CatalogSession (
+            session_key         INTEGER PRIMARY KEY,
+            meeting_key         INTEGER,
+            circuit_short_name  TEXT NOT NULL,
+            year                INTEGER NOT NULL,
+            session_name        TEXT NOT NULL,
+            session_type        TEXT,
+            country_name        TEXT,
+            date_start          TEXT,
+            date_end            TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_catalog_lookup ON CatalogSession(circuit_short_name, year, session_name);
+        CREATE INDEX IF NOT EXISTS idx_catalog_meeting ON CatalogSession(meeting_key);
+        ''')
+        self._ready = True
+        return conn
+
+    def _load(self):
+        index = {}
+        tracks = set()
+        conn = self._connect()
+        try:
+            rows = conn.execute('''
+                SELECT circuit_short_name, year, session_name, session_key
+                FROM CatalogSession ORDER BY date_start, session_key''').fetchall()
+        finally:
+            conn.close()
+        for circuit, year, session_name, session_key in rows:
+            # first session wins, same as scanning the full list
+            index.setdefault(catalog_key(circuit, year, session_name), session_key)
+            tracks.add((circuit.lower(), year))
+        self._index = index
+        self._tracks = tracks
+
+    def last_session_key(self):
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT MAX(session_key) FROM CatalogSession").fetchone()[0]
+        finally:
+            conn.close()
+
+    def open_session_keys(self, now=None):
+        # sessions cataloged before they were over: no date_end yet, or one that has not passed
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute("SELECT session_key, date_end FROM CatalogSession").fetchall()
+        finally:
+            conn.close()
+        return [row['session_key'] for row in rows if not session_finished(dict(row), now=now)]
+
+    def add_sessions(self, sessions):
+        rows = [
+            (s.get('session_key'), s.get('meeting_key'), s.get('circuit_short_name', ''), s.get('year'),
+             s.get('session_name', ''), s.get('session_type'), s.get('country_name'),
+             s.get('date_start'), s.get('date_end'))
+            for s in sessions if s.get('session_key') and s.get('year')
+        ]
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany('''
+                    INSERT OR REPLACE INTO CatalogSession
+                    (session_key, meeting_key, circuit_short_name, year, session_name,
+                     session_type, country_name, date_start, date_end)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''', rows)
+        finally:
+            conn.close()
+        self._index = None
+        return len(rows)
+
+    def refresh(self):
+        # delta update: sessions newer than the last one we have seen, and again from the oldest session
+        # that was still open (keys grow with time) so its date_end gets updated once it is known
+        last_key = self.last_session_key()
+        open_keys = self.open_session_keys()
+        if last_key is None:
+            url = api_url("sessions")
+        elif open_keys:
+            url = api_url(f"sessions?session_key>={min(open_keys)}")
+        else:
+            url = api_url(f"sessions?session_key>{last_key}")
+        try:
+            sessions = get_json(url, ttl=0)
+        except Exception as e:
+            logger.error("Failed to refresh session catalog: %s", e)
+            return 0
+        added = self.add_sessions(sessions)
+        logger.info("Session catalog refreshed: %s new or updated sessions", added)
+        return added
+
+    def _ensure_loaded(self):
+        with self._lock:
+            if self._index is None:
+                self._load()
+
+    def lookup(self, circuit_short_name, year, session_name):
+        self._ensure_loaded()
+        return self._index.get(catalog_key(circuit_short_name, year, session_name))
+
+    def has_track(self, circuit_short_name, year):
+        self._ensure_loaded()
+        return ((circuit_short_name or '').strip().lower(), int(year)) in self._tracks
+
+    def resolve(self, circuit_short_name, year, session_name):
+        session_key = self.lookup(circuit_short_name, year, session_name)
+        if session_key is None:
+            self.refresh()
+            session_key = self.lookup(circuit_short_name, year, session_name)
+        return session_key
+
+    def get_session(self, session_key):
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            row = conn.execute("SELECT * FROM CatalogSession WHERE session_key = ?", (session_key,)).fetchone()
+        finally:
+            conn.close()
+        return dict(row) if row else None
+
+    def sessions_for_meeting(self, meeting_key):
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute('''
+                SELECT * FROM CatalogSession WHERE meeting_key = ?
+                ORDER BY date_start''', (meeting_key,)).fetchall()
+        finally:
+            conn.close()
+        return [dict(row) for row in rows]
+
+    def find_sessions(self, years=None, session_type=None):
+        query = "SELECT * FROM CatalogSession WHERE 1 = 1"
+        params = []
+        if years:
+            query += f" AND year IN ({', '.join('?' for _ in years)})"
+            params.extend(int(y) for y in years)
+        if session_type:
+            query += " AND lower(session_type) = ?"
+            params.append(session_type.lower())
+        query += " ORDER BY date_start, session_key"
+
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute(query, params).fetchall()
+        finally:
+            conn.close()
+        return [dict(row) for row in rows]
+
+
+_catalog = None
+
+def get_catalog():
+    global _catalog
+    if _catalog is None:
+        _catalog = SessionCatalog()
+    return _catalog
+
+def configure_catalog(path=DEFAULT_CATALOG_PATH):
+    global _catalog
+    _catalog = SessionCatalog(path)
+    return _catalog
+
+def reset_catalog():
+    # drops the configured catalog, the next get_catalog() opens the default one
+    global _catalog
+    _catalog = None
@@ -1,6 +1,8 @@
 from .driver import Driver
 
 class Team:
+    __slots__ = ('name', 'drivers')
+
     def __init__(self, name):
         self.name = name
         self.drivers = []
@@ -10,6 +12,6 @@ class Team:
         self.drivers.append(driver)
     
     def team_avg(self, compound=None):
-        # avg lap times of teams
-        avg_times = [driver.avg_lap_time(compound) for driver in self.drivers if driver.avg_lap_time(compound)]
-        return sum(avg_times) / len(avg_times) if avg_times else None
\ No newline at end of file
+        # avg lap times of teams, driver averages are O(1)
+        avg_times = [avg for avg in (driver.avg_lap_time(compound) for driver in self.drivers) if avg]
+        return sum(avg_times) / len(avg_times) if avg_times else None
@@ -0,0 +1,377 @@
+import json
+import os
+import shutil
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import quote
+import numpy as np
+from .defaults import DEFAULT_TELEMETRY_DIR
+from .openf1_client import DEFAULT_TIMEOUT, api_url, get_json, open_json_stream
+from .metrics import PipelineMetrics
+from .logging_config import get_logger
+logger = get_logger()
+
+# Car telemetry (OpenF1 car_data, ~3.7 samples per second and car) per lap.
+# car_data is far too big for one request and one json.loads, so:
+# - every driver's running time is split into windows, fetched in parallel and parsed as a stream
+# - records are folded into `interval` second buckets while they are parsed (Downsampler)
+# - buckets are appended to fixed width column files on disk, driver after driver (TelemetryWriter)
+# - per lap aggregates come from the buckets between the laps' start timestamps (lap_telemetry)
+# Memory is bounded by the windows in flight (2 per worker) and their buckets, not by the session length.
+# A store missing a window (or the laps) is marked incomplete: it serves the run but is never reused.
+
+TELEMETRY_VERSION = 1
+DEFAULT_WINDOW = 600 # seconds of car_data per request
+DEFAULT_INTERVAL = 1.0 # seconds per stored bucket
+DEFAULT_WORKERS = 8
+FULL_THROTTLE = 98 # throttle % counted as flat out
+LAST_LAP_TIME = 180 # seconds fetched after a lap without a duration
+
+# fixed width columns, one file each. Sums and counts keep lap averages weighted by raw records
+SAMPLE_COLUMNS = {
+    'time': np.float64,          # bucket start, seconds since the epoch
+    'samples': np.uint16,        # car_data records in the bucket
+    'speed_max': np.float32,     # km/h
+    'speed_sum': np.float32,
+    'throttle_sum': np.float32,  # %
+    'full_throttle': np.uint16,  # records at >= FULL_THROTTLE
+    'braking': np.uint16,        # records with the brake on
+}
+TYPECODES = {np.float64: 'd', np.float32: 'f', np.uint16: 'H'}
+
+
+def parse_date(value):
+    # OpenF1 ISO timestamp -> seconds since the epoch (UTC when no offset is given)
+    date = datetime.fromisoformat(value)
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date.timestamp()
+
+
+def format_date(seconds):
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat(timespec='milliseconds')
+
+
+class Downsampler:
+    # folds car_data records of one driver into interval buckets as they stream past
+    __slots__ = ('interval', 'columns', 'records', '_bucket', '_samples', '_speed_max', '_speed_sum',
+                 '_throttle_sum', '_full', '_braking')
+
+    def __init__(self, interval=DEFAULT_INTERVAL):
+        self.interval = interval
+        self.columns = {name: array(TYPECODES[dtype]) for name, dtype in SAMPLE_COLUMNS.items()}
+        self.records = 0
+        self._bucket = None
+
+    def add(self, record):
+        date = record.get('date')
+        if not date:
+            return
+        bucket = parse_date(date) // self.interval
+        if bucket != self._bucket:
+            self._close()
+            self._bucket = bucket
+            self._samples = self._full = self._braking = 0
+            self._speed_max = self._speed_sum = self._throttle_sum = 0.0
+        speed = record.get('speed') or 0
+        throttle = record.get('throttle') or 0
+        self.records += 1
+        self._samples += 1
+        self._speed_max = max(self._speed_max, speed)
+        self._speed_sum += speed
+        self._throttle_sum += throttle
+        self._full += throttle >= FULL_THROTTLE
+        self._braking += bool(record.get('brake'))
+
+    def _close(self):
+        if self._bucket is None:
+            return
+        columns = self.columns
+        columns['time'].append(self._bucket * self.interval)
+        columns['samples'].append(min(self._samples, 0xFFFF))
+        columns['speed_max'].append(self._speed_max)
+        columns['speed_sum'].append(self._speed_sum)
+        columns['throttle_sum'].append(self._throttle_sum)
+        columns['full_throttle'].append(min(self._full, 0xFFFF))
+        columns['braking'].append(min(self._braking, 0xFFFF))
+        self._bucket = None
+
+    def finish(self):
+        # {column: numpy array} in time order
+        self._close()
+        columns = {name: np.frombuffer(self.columns[name], dtype=dtype) for name, dtype in SAMPLE_COLUMNS.items()}
+        order = np.argsort(columns['time'], kind='stable')
+        return {name: column[order] for name, column in columns.items()}
+
+
+def driver_windows(lap_data, window=DEFAULT_WINDOW, interval=DEFAULT_INTERVAL):
+    # driver -> [(start, end)] seconds from the first lap start to the last lap end. Edges sit on `interval`
+    # boundaries (window rounded to whole buckets) so no bucket is split between two windows
+    spans = {}
+    for lap in lap_data:
+        driver, date = lap.get('driver_number'), lap.get('date_start')
+        if not driver or not date:
+            continue
+        start = parse_date(date)
+        end = start + (lap.get('lap_duration') or LAST_LAP_TIME)
+        first, last = spans.get(driver, (start, end))
+        spans[driver] = (min(first, start), max(last, end))
+    step = max(1, round(window / interval))
+    windows = {}
+    for driver, (first, last) in sorted(spans.items()):
+        first_bucket, last_bucket = int(first // interval), int(-(-last // interval))
+        windows[driver] = [(k * interval, min(k + step, last_bucket) * interval)
+                           for k in range(first_bucket, last_bucket, step)]
+    return windows
+
+
+class TelemetryStore:
+    # read side: columns are memory mapped, samples of one driver are contiguous and in time order
+    def __init__(self, path, header, columns):
+        self.path = path
+        self.header = header
+        self.session_key = header['session_key']
+        self.interval = header['interval']
+        self.drivers = {int(n): tuple(span) for n, span in header['drivers'].items()} # number -> (offset, count)
+        for name, column in columns.items():
+            setattr(self, name, column)
+
+    def __len__(self):
+        return self.header['n_samples']
+
+    def driver_slice(self, number):
+        offset, count = self.drivers.get(number, (0, 0))
+        return slice(offset, offset + count)
+
+    @classmethod
+    def open(cls, path):
+        with open(os.path.join(path, "header.json")) as f:
+            header = json.load(f)
+        if header.get('version') != TELEMETRY_VERSION:
+            raise ValueError(f"Unsupported telemetry store version in {path}")
+        n = header['n_samples']
+        columns = {
+            name: np.memmap(os.path.join(path, f"{name}.bin"), dtype=dtype, mode='r', shape=(n,)) if n
+            else np.empty(0, dtype)
+            for name, dtype in SAMPLE_COLUMNS.items()
+        }
+        return cls(path, header, columns)
+
+
+def telemetry_path(session_key, store_dir=DEFAULT_TELEMETRY_DIR):
+    return os.path.join(store_dir, str(session_key))
+
+def has_telemetry(session_key, store_dir=DEFAULT_TELEMETRY_DIR):
+    # a complete store of the current version
+    try:
+        with open(os.path.join(telemetry_path(session_key, store_dir), "header.json")) as f:
+            header = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return header.get('version') == TELEMETRY_VERSION and header.get('complete', False)
+
+def open_telemetry(session_key, store_dir=DEFAULT_TELEMETRY_DIR):
+    return TelemetryStore.open(telemetry_path(session_key, store_dir))
+
+
+class TelemetryWriter:
+    # appends downsampled buckets to the column files. Drivers must arrive one after the other
+    def __init__(self, session_key, store_dir=DEFAULT_TELEMETRY_DIR, interval=DEFAULT_INTERVAL):
+        self.session_key = session_key
+        self.path = telemetry_path(session_key, store_dir)
+        self.tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        self.interval = interval
+        self.drivers = {} # number -> [offset, count]
+        self.n_samples = 0
+        if os.path.exists(self.tmp_path):
+            shutil.rmtree(self.tmp_path)
+        os.makedirs(self.tmp_path)
+        self._files = {name: open(os.path.join(self.tmp_path, f"{name}.bin"), "wb") for name in SAMPLE_COLUMNS}
+
+    def append(self, driver, columns):
+        n = len(columns['time'])
+        span = self.drivers.setdefault(driver, [self.n_samples, 0])
+        if span[0] + span[1] != self.n_samples:
+            raise ValueError(f"Telemetry of driver {driver} is not contiguous")
+        for name, f in self._files.items():
+            columns[name].astype(SAMPLE_COLUMNS[name], copy=False).tofile(f)
+        span[1] += n
+        self.n_samples += n
+
+    def close(self, complete=True):
+        # complete=False: some car_data is missing, the store is not reused by later runs
+        for f in self._files.values():
+            f.close()
+        header = {
+            'version': TELEMETRY_VERSION,
+            'session_key': self.session_key,
+            'complete': complete,
+            'interval': self.interval,
+            'n_samples': self.n_samples,
+            'drivers': {str(number): span for number, span in self.drivers.items()},
+            'columns': {name: np.dtype(dtype).str for name, dtype in SAMPLE_COLUMNS.items()},
+        }
+        # header last: a store without one is never opened
+        with open(os.path.join(self.tmp_path, "header.json"), "w") as f:
+            json.dump(header, f)
+        if os.path.exists(self.path):
+            shutil.rmtree(self.path)
+        os.replace(self.tmp_path, self.path)
+        return self.path
+
+
+class TelemetryIngestor:
+    def __init__(self, session_key, finished=False, store_dir=DEFAULT_TELEMETRY_DIR, window=DEFAULT_WINDOW,
+                 interval=DEFAULT_INTERVAL, workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT, metrics=None):
+        self.session_key = session_key
+        self.finished = finished # finished sessions keep their laps cached and their store is reused
+        self.store_dir = store_dir
+        self.window = window
+        self.interval = interval
+        self.workers = workers
+        self.timeout = timeout
+        self.metrics = metrics or PipelineMetrics() # car_data_records, telemetry_samples, telemetry_requests
+        self.laps_failed = False
+
+    def car_data_url(self, driver, start, end):
+        return api_url(f"car_data?session_key={self.session_key}&driver_number={driver}"
+                       f"&date>={quote(format_date(start))}&date<{quote(format_date(end))}")
+
+    def fetch_laps(self):
+        # same request (and cache entry) as DataIngestor
+        self.laps_failed = False
+        try:
+            return get_json(api_url(f"laps?session_key={self.session_key}"), permanent=self.finished, ttl=0,
+                            timeout=self.timeout)
+        except Exception as e:
+            logger.error("Failed to fetch laps for telemetry of session %s: %s", self.session_key, e)
+            self.laps_failed = True
+            return []
+
+    def fetch_window(self, driver, start, end):
+        # one window, downsampled while it is parsed -> (columns, records, ok)
+        # a failed window keeps what arrived before the error and reports ok=False
+        sampler = Downsampler(self.interval)
+        url = self.car_data_url(driver, start, end)
+        try:
+            for record in open_json_stream(url, timeout=self.timeout, cache=False):
+                sampler.add(record)
+        except Exception as e:
+            logger.error("Failed to fetch car data from %s: %s", url, e)
+            return sampler.finish(), sampler.records, False
+        return sampler.finish(), sampler.records, True
+
+    def load(self, lap_data=None):
+        # -> (TelemetryStore, LapTelemetry)
+        if lap_data is None:
+            lap_data = self.fetch_laps()
+        if self.finished and has_telemetry(self.session_key, self.store_dir):
+            store = open_telemetry(self.session_key, self.store_dir)
+        else:
+            store = self.ingest(lap_data)
+        return store, lap_telemetry(store, lap_data)
+
+    def ingest(self, lap_data):
+        # windows in flight are capped, results are written in driver order as they complete
+        windows = driver_windows(lap_data, self.window, self.interval)
+        jobs = [(driver, start, end) for driver, spans in windows.items() for start, end in spans]
+        writer = TelemetryWriter(self.session_key, self.store_dir, self.interval)
+        pending = deque()
+        records = failed = 0
+
+        def write_next():
+            nonlocal records, failed
+            driver, future = pending.popleft()
+            columns, n, ok = future.result()
+            writer.append(driver, columns)
+            records += n
+            failed += not ok
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for job in jobs:
+                pending.append((job[0], pool.submit(self.fetch_window, *job)))
+                if len(pending) >= 2 * self.workers:
+                    write_next()
+            while pending:
+                write_next()
+        writer.close(complete=not failed and not self.laps_failed)
+        if failed:
+            logger.warning("Telemetry of session %s is incomplete: %s of %s windows failed", self.session_key,
+                           failed, len(jobs))
+        self.metrics.update({'telemetry_requests': len(jobs), 'car_data_records': records,
+                             'telemetry_samples': writer.n_samples, 'telemetry_failed_windows': failed})
+        logger.debug("Telemetry for session %s: %s records -> %s samples", self.session_key, records,
+                     writer.n_samples)
+        return open_telemetry(self.session_key, self.store_dir)
+
+
+class LapTelemetry:
+    # per lap aggregates as columns, one entry per lap with samples
+    FIELDS = ('number', 'lap_number', 'samples', 'top_speed', 'avg_speed', 'avg_throttle', 'full_throttle',
+              'braking')
+
+    def __init__(self, columns):
+        for name in self.FIELDS:
+            setattr(self, name, columns[name])
+
+    def __len__(self):
+        return len(self.number)
+
+    def rows(self):
+        # (number, lap_number, samples, top_speed, avg_speed, avg_throttle, full_throttle, braking)
+        return list(zip(*(getattr(self, name).tolist() for name in self.FIELDS)))
+
+    def top_speed_of(self, number):
+        speeds = self.top_speed[self.number == number]
+        return float(speeds.max()) if len(speeds) else None
+
+
+def lap_bounds(lap_data):
+    # (numbers, lap_numbers, starts, ends) of laps with a start time. A lap ends at start + lap_duration,
+    # at the driver's next lap start without a duration
+    laps = sorted((lap['driver_number'], parse_date(lap['date_start']), lap.get('lap_number'), lap.get('lap_duration'))
+                  for lap in lap_data if lap.get('driver_number') and lap.get('date_start'))
+    numbers = np.array([lap[0] for lap in laps], dtype=np.int64)
+    starts = np.array([lap[1] for lap in laps], dtype=np.float64)
+    lap_numbers = np.array([-1 if lap[2] is None else lap[2] for lap in laps], dtype=np.int64)
+    durations = np.array([np.nan if lap[3] is None else lap[3] for lap in laps], dtype=np.float64)
+    next_start = np.append(starts[1:], np.inf)
+    next_start[np.append(numbers[1:] != numbers[:-1], True)] = np.inf
+    ends = np.where(np.isnan(durations), np.minimum(next_start, starts + LAST_LAP_TIME), starts + durations)
+    return numbers, lap_numbers, starts, ends
+
+
+def lap_telemetry(store, lap_data):
+    # buckets starting in [lap start, lap end) belong to the lap (so lap edges are accurate to one interval).
+    # Sums over the lap come from prefix sums, maxima from one reduceat, for all laps of all drivers at once
+    numbers, lap_numbers, starts, ends = lap_bounds(lap_data)
+    lo = np.zeros(len(numbers), dtype=np.int64)
+    hi = np.zeros(len(numbers), dtype=np.int64)
+    for number in np.unique(numbers).tolist():
+        laps = numbers == number
+        rows = store.driver_slice(number)
+        times = store.time[rows]
+        lo[laps] = rows.start + np.searchsorted(times, starts[laps], side='left')
+        hi[laps] = rows.start + np.searchsorted(times, ends[laps], side='left')
+
+    def lap_sum(name):
+        prefix = np.concatenate(([0.0], np.cumsum(getattr(store, name), dtype=np.float64)))
+        return prefix[hi] - prefix[lo]
+
+    samples = lap_sum('samples')
+    has = (hi > lo) & (samples > 0)
+    speed_max = np.append(store.speed_max, 0).astype(np.float64) # sentinel: reduceat indices may equal len
+    bounds = np.stack([lo, hi], axis=1).ravel()
+    top = np.maximum.reduceat(speed_max, bounds)[::2] if len(bounds) else np.empty(0)
+
+    count = np.where(has, samples, 1)
+    columns = {
+        'number': numbers[has], 'lap_number': lap_numbers[has], 'samples': samples[has].astype(np.int64),
+        'top_speed': top[has], 'avg_speed': (lap_sum('speed_sum') / count)[has],
+        'avg_throttle': (lap_sum('throttle_sum') / count)[has],
+        'full_throttle': (lap_sum('full_throttle') / count)[has], # share of the lap's records
+        'braking': (lap_sum('braking') / count)[has],
+    }
+    return LapTelemetry(columns)
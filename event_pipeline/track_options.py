@@ -1,8 +1,7 @@
 from collections import defaultdict
-import requests
-from .data_ingestor import DataIngestor
-from .logging_config import setup_logger
-logger = setup_logger()
+from .openf1_client import api_url, get_json
+from .logging_config import get_logger
+logger = get_logger()
 
 class TrackBuilder:
     def __init__(self, track_data):
@@ -40,7 +39,7 @@ class TrackBuilder:
                 index = int(choice) - 1
                 if 0 <= index < len(self.track_options):
                     selected = self.track_options[index]
-                    logger.info(f"Selected track: {selected['name']} ({selected['country']}, {selected['year']})")
+                    logger.info("Selected track: %s (%s, %s)", selected['name'], selected['country'], selected['year'])
                     return selected['name']
             logger.warning("Invalid entry. Select again")
     
@@ -51,13 +50,13 @@ class TrackOptions:
 
     def safe_get(self, url):
         try:
-            return requests.get(url).json()
+            return get_json(url)
         except Exception as e:
-            logger.error(f"Failed to fetch from {url}: {e}")
+            logger.error("Failed to fetch from %s: %s", url, e)
             return []
 
     def get_track_options(self):
-        url = f"https://api.openf1.org/v1/meetings?year={self.year}"
+        url = api_url(f"meetings?year={self.year}")
         track_data = self.safe_get(url)
         track_builder = TrackBuilder(track_data)
         return track_builder.build(), track_builder
\ No newline at end of file
@@ -1,23 +1,203 @@
-from event_pipeline.session import Session
-from event_pipeline.track_options import TrackOptions
+import argparse
+from event_pipeline.defaults import (DEFAULT_CACHE_DIR, DEFAULT_CATALOG_TTL, DEFAULT_MAX_BYTES, DEFAULT_STORE_DIR,
+                                     DEFAULT_TELEMETRY_DIR, DEFAULT_DB_PATH, DEFAULT_LOG_DIR, REPORT_FORMATS)
 
-def run_analysis():
+# pipeline modules are imported by the command that needs them, --help and short commands stay fast
+
+def lap_filter_spec(text):
+    # argparse type: validates COMPOUND=STRATEGY[:ARG] early, the policy is built later
+    from event_pipeline.data_filter import FILTER_SETTINGS
+    from event_pipeline.lap_filters import parse_filter
+    compound, sep, strategy = text.partition('=')
+    if not (compound.strip() and sep):
+        raise argparse.ArgumentTypeError(f"expected COMPOUND=STRATEGY[:ARG], got '{text}'")
+    try:
+        parse_filter(strategy, FILTER_SETTINGS)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return text
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="F1 practice session analyzer")
+    parser.add_argument('--offline', action='store_true', help="Serve OpenF1 data only from the local cache")
+    parser.add_argument('--api-url', help="OpenF1 base URL, e.g. a local stand-in (default: $OPENF1_BASE_URL or "
+                                          "https://api.openf1.org/v1)")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="Directory for cached OpenF1 responses")
+    parser.add_argument('--cache-ttl', type=int, default=DEFAULT_CATALOG_TTL,
+                        help="Seconds before cached session/meeting catalogs are refreshed")
+    parser.add_argument('--cache-max-mb', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="Size limit of the response cache in MB")
+    parser.add_argument('--engine', choices=['python', 'numpy'], default='python',
+                        help="Lap filtering engine (numpy is faster on large lap sets)")
+    parser.add_argument('--lap-filter', action='append', default=[], type=lap_filter_spec, metavar='COMPOUND=STRATEGY[:ARG]',
+                        help="Lap outlier filter per compound, can be repeated: percentile[:Q], ratio[:R], iqr[:K], "
+                             "mad[:K], e.g. 'MEDIUM=iqr:1.5' or 'default=ratio:1.1'")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="SQLite database file for results")
+    parser.add_argument('--from-db', action='store_true',
+                        help="Re-analyse laps already stored in the database instead of calling the API")
+    parser.add_argument('--lap-store', nargs='?', const=DEFAULT_STORE_DIR, default=None, metavar='DIR',
+                        help="Keep finished sessions as memory mapped lap stores and reload them from there")
+    parser.add_argument('--telemetry', nargs='?', const=DEFAULT_TELEMETRY_DIR, default=None, metavar='DIR',
+                        help="Also ingest car telemetry (downsampled car_data) and store per lap speed, throttle "
+                             "and braking")
+    parser.add_argument('--stream', action='store_true',
+                        help="Parse lap data incrementally instead of loading the whole payload")
+    parser.add_argument('--log-dir', default=DEFAULT_LOG_DIR, help="Directory for the rotated log file")
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'])
+    parser.add_argument('--metrics', metavar='FILE', help="Write stage timings and counters as JSON")
+    parser.add_argument('--trace', metavar='FILE', help="Write stage timings in Chrome trace format")
+    parser.add_argument('--report', metavar='FILE',
+                        help="Write the session summary (every session in batch mode) to FILE")
+    parser.add_argument('--report-format', choices=REPORT_FORMATS,
+                        help="Report format (default: from the FILE extension .jsonl/.csv/.md, text otherwise)")
+    parser.add_argument('--profile', nargs='?', const='f1_profile.prof', metavar='FILE',
+                        help="Run a single session under cProfile and save the stats (default: f1_profile.prof)")
+
+    subparsers = parser.add_subparsers(dest='command')
+    batch = subparsers.add_parser('batch', help="Analyse many sessions without prompts")
+    batch.add_argument('--years', nargs='+', type=int, default=[], help="Season(s) to analyse, e.g. 2024 2025")
+    batch.add_argument('--session-type', help="Session type filter, e.g. practice")
+    batch.add_argument('--tracks', nargs='+', help="Limit --years to these circuit short names")
+    batch.add_argument('--session', action='append', default=[], metavar='TRACK,SESSION,YEAR',
+                       help="Explicit session, can be repeated, e.g. 'Silverstone,Practice 1,2025'")
+    batch.add_argument('--workers', type=int, help="Worker processes (default: CPU count)")
+    batch.add_argument('--show-summary', action='store_true', help="Print each session summary")
+    batch.add_argument('--profile-dir', metavar='DIR', help="Write one cProfile file per session to DIR")
+
+    live = subparsers.add_parser('live', help="Follow a running session, update rankings as laps come in")
+    live.add_argument('--track', required=True, help="Circuit short name, e.g. Silverstone")
+    live.add_argument('--session', required=True, help="Session name, e.g. 'Practice 2'")
+    live.add_argument('--year', type=int, required=True)
+    live.add_argument('--interval', type=float, default=10.0, help="Seconds between polls")
+    live.add_argument('--max-polls', type=int, help="Stop after this many polls (default: when the session ends)")
+
+    query = subparsers.add_parser('query', help="Cross-session results from the database")
+    # not 'report': that is the top level --report FILE
+    query.add_argument('query_report', metavar='report', choices=['weekend', 'team-trend', 'leaderboard'])
+    query.add_argument('--year', type=int, required=True)
+    query.add_argument('--track', help="Event name for the weekend report, e.g. Silverstone")
+    query.add_argument('--team', help="Limit team-trend to one team")
+    query.add_argument('--limit', type=int, default=20, help="Leaderboard size")
+    return parser.parse_args(argv)
+
+def run_analysis(session_options=None, profile=None):
+    # returns the Session that ran, or None
+    from event_pipeline.metrics import profiled
+    from event_pipeline.session import Session
+    from event_pipeline.track_options import TrackOptions
     try:
         year = input('Enter Year: ').strip()
         track_options, builder = TrackOptions(year).get_track_options()
         track_name = builder.pick_track()
         session_name = input('Enter Session Name: ').strip().lower()
-        
+
         if not (track_name and session_name and year.isdigit()):
             print("Invalid input. Please enter valid track, session and year")
-            return
-        
-        Session(track_name, session_name, year).run()
+            return None
+
+        session = Session(track_name, session_name, year, **(session_options or {}))
+        if profile:
+            with profiled(profile):
+                session.run()
+            print(f"Profile written to {profile}")
+        else:
+            session.run()
+        return session
     except Exception as e:
         print(f"Error: {e}")
+        return None
 
+def write_metrics(metrics, args):
+    from event_pipeline.metrics import dump_chrome_trace, dump_json
+    if args.metrics:
+        dump_json(metrics, args.metrics)
+    if args.trace:
+        dump_chrome_trace(metrics, args.trace)
 
-if __name__ == "__main__":
-    run_analysis()
+def write_session_report(session, args):
+    from event_pipeline.report import write_reports
+    if args.report and session.analyzer is not None:
+        write_reports([session.analyzer.report(session.session_key)], args.report, args.report_format)
 
-    
+def build_lap_filter(args):
+    # None keeps the default filters
+    if not args.lap_filter:
+        return None
+    from event_pipeline.data_filter import DEFAULT_POLICY, FILTER_SETTINGS
+    return DEFAULT_POLICY.with_specs(args.lap_filter, FILTER_SETTINGS)
+
+def build_session_options(args):
+    return dict(engine=args.engine, stream=args.stream, db_path=args.db,
+                source='db' if args.from_db else 'api', lap_store_dir=args.lap_store,
+                lap_filter=build_lap_filter(args), telemetry_dir=args.telemetry)
+
+def run_batch(args, cache_options):
+    from event_pipeline.batch import BatchRunner, jobs_from_spec, parse_job
+    jobs = [parse_job(text) for text in args.session]
+    if args.years:
+        jobs.extend(jobs_from_spec(args.years, args.session_type, args.tracks))
+    if not jobs:
+        print("No sessions selected. Use --years and/or --session")
+        return 1
+
+    result = BatchRunner(jobs, workers=args.workers, show_summary=args.show_summary,
+                         cache_options=cache_options, session_options=build_session_options(args),
+                         base_url=args.api_url, profile_dir=args.profile_dir, report=bool(args.report)).run()
+    result.print_report()
+    if args.report:
+        writer = result.write_report(args.report, args.report_format)
+        print(f"Report for {writer.sessions} sessions written to {args.report}")
+    write_metrics(result.metrics(), args)
+    return 0 if not result.failed else 1
+
+def run_live(args):
+    import asyncio
+    from event_pipeline.live import LiveSession
+    live = LiveSession(args.track, args.session, args.year, interval=args.interval, db_path=args.db,
+                       lap_filter=build_lap_filter(args))
+    try:
+        asyncio.run(live.run(max_polls=args.max_polls))
+    except KeyboardInterrupt:
+        print(f"Live mode stopped after {live.polls} polls")
+    write_metrics(live.metrics, args)
+    return 0 if live.session_key else 1
+
+def run_query(args):
+    from event_pipeline import queries
+    from event_pipeline.db_schema import get_connection
+    conn = get_connection(args.db)
+    if args.query_report == 'weekend':
+        if not args.track:
+            print("The weekend report needs --track")
+            return 1
+        rows = queries.driver_weekend_pace(conn, args.track, args.year)
+        queries.print_driver_weekend_pace(rows, args.track, args.year)
+    elif args.query_report == 'team-trend':
+        rows = queries.team_pace_trend(conn, args.year, args.team)
+        queries.print_team_pace_trend(rows, args.year)
+    else:
+        rows = queries.fastest_soft_leaderboard(conn, args.year, args.limit)
+        queries.print_fastest_soft_leaderboard(rows, args.year)
+    return 0
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    from event_pipeline.cache import configure_cache
+    from event_pipeline.logging_config import configure_logging
+    from event_pipeline.openf1_client import configure_base_url
+    configure_logging(log_dir=args.log_dir, level=args.log_level)
+    cache_options = dict(cache_dir=args.cache_dir, catalog_ttl=args.cache_ttl,
+                         max_bytes=args.cache_max_mb * 1024 * 1024, offline=args.offline)
+    configure_cache(**cache_options)
+    configure_base_url(args.api_url)
+    if args.command == 'batch':
+        raise SystemExit(run_batch(args, cache_options))
+    if args.command == 'live':
+        raise SystemExit(run_live(args))
+    if args.command == 'query':
+        raise SystemExit(run_query(args))
+    session = run_analysis(build_session_options(args), profile=args.profile)
+    if session is not None:
+        write_metrics(session.metrics, args)
+        write_session_report(session, args)
@@ -0,0 +1,43 @@
+import pytest
+from event_pipeline import session_catalog
+from event_pipeline.batch import BatchResult, jobs_from_spec, parse_job, run_job
+from event_pipeline.session_catalog import SessionCatalog
+
+def test_parse_job():
+    assert parse_job("Silverstone, Practice 1, 2025") == ("Silverstone", "Practice 1", "2025")
+    with pytest.raises(ValueError):
+        parse_job("Silverstone,Practice 1")
+
+def test_jobs_from_spec(tmp_path, mocker):
+    catalog = SessionCatalog(str(tmp_path / "catalog.db"))
+    catalog.add_sessions([
+        {"session_key": 1, "circuit_short_name": "Sakhir", "year": 2024, "session_name": "Practice 1",
+         "session_type": "Practice", "date_start": "2024-02-29T11:30:00+00:00", "date_end": "2024-02-29T12:30:00+00:00"},
+        {"session_key": 2, "circuit_short_name": "Sakhir", "year": 2024, "session_name": "Race",
+         "session_type": "Race", "date_start": "2024-03-02T15:00:00+00:00", "date_end": "2024-03-02T17:00:00+00:00"},
+        {"session_key": 3, "circuit_short_name": "Sakhir", "year": 2099, "session_name": "Practice 1",
+         "session_type": "Practice", "date_start": "2099-02-29T11:30:00+00:00", "date_end": "2099-02-29T12:30:00+00:00"},
+    ])
+    mocker.patch.object(catalog, 'refresh')
+    mocker.patch.object(session_catalog, '_catalog', catalog)
+
+    # unfinished sessions are skipped
+    assert jobs_from_spec([2024, 2099], "practice") == [("Sakhir", "Practice 1", "2024")]
+
+def test_run_job_reports_failure(mocker):
+    mock_session = mocker.patch('event_pipeline.batch.Session')
+    mock_session.return_value.session_key = None
+    mock_session.return_value.drivers = {}
+
+    result = run_job(("Sakhir", "Practice 1", "2024"))
+    assert not result['ok']
+    assert result['error'] == "Invalid session key"
+
+    mock_session.return_value.session_key = 9472
+    mock_session.return_value.drivers = {1: object()}
+    assert run_job(("Sakhir", "Practice 1", "2024"))['ok']
+
+def test_batch_result():
+    result = BatchResult([{'ok': True}, {'ok': False}, {'ok': True}])
+    assert len(result.succeeded) == 2
+    assert len(result.failed) == 1
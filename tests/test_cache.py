@@ -0,0 +1,93 @@
+import json
+import pytest
+from event_pipeline import cache as cache_module
+from event_pipeline.cache import ResponseCache, OfflineCacheMiss
+from event_pipeline.openf1_client import get_json, session_finished
+
+URL = "https://api.openf1.org/v1/laps?session_key=1"
+
+def test_put_and_get(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    cache.put(URL, b'[{"lap_number": 1}]', permanent=True)
+    assert cache.get(URL) == b'[{"lap_number": 1}]'
+    assert cache.hits == 1
+
+def test_ttl_expiry(tmp_path, mocker):
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    cache.put(URL, b'[]')
+    mocker.patch('event_pipeline.cache.time.time', return_value=10**12)
+    assert cache.get(URL, ttl=60) is None
+
+    # offline mode serves stale entries instead of missing
+    cache.offline = True
+    assert cache.get(URL, ttl=60) == b'[]'
+
+def test_lru_eviction(tmp_path):
+    cache = ResponseCache(cache_dir=str(tmp_path), max_bytes=25)
+    cache.put("a", b"x" * 10)
+    cache.put("b", b"x" * 10)
+    cache.get("a")
+    cache.put("c", b"x" * 10)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.total_bytes() <= 25
+
+def test_eviction_order(tmp_path, mocker):
+    cache = ResponseCache(cache_dir=str(tmp_path), max_bytes=35, catalog_ttl=60)
+    clock = mocker.patch('event_pipeline.cache.time.time', return_value=1000.0)
+    cache.put("finished", b"x" * 10, permanent=True)
+    cache.put("stale", b"x" * 10)
+    clock.return_value = 2000.0
+    cache.put("fresh", b"x" * 10)
+    cache.get("stale") # recently used, but past the ttl
+
+    # expired first, then other ttl entries, permanent ones last
+    clock.return_value = 2001.0
+    cache.put("new", b"x" * 10)
+    assert cache.get("stale") is None and cache.get("finished") is not None
+    clock.return_value = 2002.0
+    cache.put("newer", b"x" * 10)
+    assert cache.get("fresh") is None and cache.get("finished") is not None
+
+    # the entry just written is never the one evicted, even when it does not fit
+    cache.put("huge", b"x" * 50)
+    assert cache.get("huge") is not None
+
+def test_get_json_uses_cache(tmp_path, mocker):
+    mocker.patch.object(cache_module, '_cache', ResponseCache(cache_dir=str(tmp_path)))
+    mock_get = mocker.patch('event_pipeline.openf1_client.get_http_session').return_value.get
+    mock_get.return_value.content = json.dumps([{"driver_number": 1}]).encode()
+
+    assert get_json(URL, permanent=True) == [{"driver_number": 1}]
+    assert get_json(URL, permanent=True) == [{"driver_number": 1}]
+    mock_get.assert_called_once()
+
+def test_open_session_payload_is_not_kept_once_finished(tmp_path, mocker):
+    mocker.patch.object(cache_module, '_cache', ResponseCache(cache_dir=str(tmp_path)))
+    mock_get = mocker.patch('event_pipeline.openf1_client.get_http_session').return_value.get
+    mock_get.return_value.content = b'[{"lap_number": 1}]'
+    # running session: DataIngestor reads with ttl=0, the partial payload is stored non permanent
+    assert get_json(URL, ttl=0) == [{"lap_number": 1}]
+
+    # finished: the partial payload is a miss, the final one is fetched and kept for good
+    mock_get.return_value.content = b'[{"lap_number": 1}, {"lap_number": 2}]'
+    assert len(get_json(URL, permanent=True)) == 2
+    assert len(get_json(URL, permanent=True)) == 2
+    assert mock_get.call_count == 2
+
+    cache = cache_module.get_cache()
+    cache.put("open", b'[1]', permanent=False)
+    assert cache.get("open", None) == b'[1]' and cache.get("open", permanent=True) is None
+
+def test_offline_miss(tmp_path, mocker):
+    mocker.patch.object(cache_module, '_cache', ResponseCache(cache_dir=str(tmp_path), offline=True))
+    mock_get = mocker.patch('event_pipeline.openf1_client.get_http_session').return_value.get
+    with pytest.raises(OfflineCacheMiss):
+        get_json(URL)
+    mock_get.assert_not_called()
+
+def test_session_finished():
+    assert session_finished({"date_end": "2024-07-05T12:30:00+00:00"})
+    assert not session_finished({"date_end": "2999-07-05T12:30:00+00:00"})
+    assert not session_finished(None)
@@ -0,0 +1,52 @@
+import random
+from event_pipeline.columnar_filter import ColumnarDriverBuilder
+from event_pipeline.data_filter import DriverBuilder
+
+COMPOUNDS = ["SOFT", "MEDIUM", "HARD", "INTERMEDIATE", None]
+
+def make_session(seed, n_drivers=20, n_laps=40):
+    rng = random.Random(seed)
+    driver_data, lap_data, tire_data = [], [], []
+    for number in range(1, n_drivers + 1):
+        if rng.random() > 0.1:
+            driver_data.append({"driver_number": number, "first_name": f"First{number}",
+                                "last_name": f"Last{number}", "team_name": f"Team {number % 7}"})
+        lap = 1
+        for stint_number in range(1, rng.randint(1, 5) + 1):
+            length = rng.randint(1, 12)
+            tire_data.append({"driver_number": number, "stint_number": stint_number,
+                              "compound": rng.choice(COMPOUNDS), "lap_start": lap, "lap_end": lap + length - 1,
+                              "tyre_age_at_start": rng.choice([0, 2, None])})
+            lap += length + rng.randint(0, 2) # gaps leave laps without a stint
+        for lap_number in range(1, rng.randint(1, n_laps) + 1):
+            lap_data.append({
+                "driver_number": number,
+                "lap_number": lap_number,
+                "lap_duration": None if rng.random() < 0.05 else round(rng.uniform(60, 110), 3),
+                "is_pit_out_lap": rng.random() < 0.1,
+                "deleted": rng.random() < 0.03,
+            })
+    rng.shuffle(lap_data)
+    rng.shuffle(tire_data)
+    return lap_data, driver_data, tire_data
+
+def ages(values):
+    return [None if age != age else age for age in values] # nan -> None so lists compare equal
+
+def snapshot(drivers, teams):
+    return (
+        [(k, d.name, d.number, d.team_name, list(d.lap_times), [(c, list(l)) for c, l in d.compound_laps.items()],
+          [(c, ages(d.compound_ages[c]), list(d.compound_stints[c])) for c in d.compound_laps])
+         for k, d in drivers.items()],
+        [(k, [d.number for d in t.drivers]) for k, t in teams.items()],
+    )
+
+def test_columnar_matches_python_builder():
+    for seed in range(25):
+        lap_data, driver_data, tire_data = make_session(seed)
+        expected = snapshot(*DriverBuilder(lap_data, driver_data, tire_data).build())
+        actual = snapshot(*ColumnarDriverBuilder(lap_data, driver_data, tire_data).build())
+        assert actual == expected, f"seed {seed}"
+
+def test_columnar_empty_input():
+    assert ColumnarDriverBuilder([], [], []).build() == ({}, {})
@@ -0,0 +1,36 @@
+import numpy as np
+from event_pipeline.columnar_filter import ColumnarDriverBuilder
+from event_pipeline.columnar_store import write_store, open_store
+from event_pipeline.data_filter import DriverBuilder
+from event_pipeline.lap_analyzer import LapAnalyzer
+from event_pipeline.lap_store import RawSessionData
+from tests.test_columnar_filter import make_session, snapshot
+
+def recorded_laps(lap_data):
+    raw = RawSessionData()
+    list(raw.record(lap_data))
+    return raw.laps
+
+def test_store_round_trip(tmp_path):
+    for seed in range(5):
+        lap_data, driver_data, tire_data = make_session(seed)
+        write_store(9000 + seed, recorded_laps(lap_data), driver_data, tire_data, str(tmp_path))
+
+        store = open_store(9000 + seed, str(tmp_path))
+        assert isinstance(store.lap_duration, np.memmap)
+        assert len(store) == len(lap_data)
+
+        expected = snapshot(*DriverBuilder(lap_data, driver_data, tire_data).build())
+        assert snapshot(*ColumnarDriverBuilder.from_store(store)) == expected
+
+def test_analyzer_from_store(tmp_path):
+    lap_data, driver_data, tire_data = make_session(1)
+    write_store(1, recorded_laps(lap_data), driver_data, tire_data, str(tmp_path))
+    analyzer = LapAnalyzer.from_store(open_store(1, str(tmp_path)), "sakhir", "practice 1", 2024)
+    assert set(analyzer.drivers) == set(DriverBuilder(lap_data, driver_data, tire_data).build()[0])
+
+def test_empty_store(tmp_path):
+    write_store(2, [], [], [], str(tmp_path))
+    store = open_store(2, str(tmp_path))
+    assert len(store) == 0
+    assert ColumnarDriverBuilder.from_store(store) == ({}, {})
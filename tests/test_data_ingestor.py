@@ -0,0 +1,143 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from event_pipeline import cache as cache_module
+from event_pipeline.cache import ResponseCache
+from event_pipeline.columnar_store import has_store
+from event_pipeline.data_ingestor import DataIngestor
+
+LATENCY = 0.3
+
+PAYLOADS = {
+    '/v1/laps': [{"driver_number": 1, "lap_number": 2, "lap_duration": 90.5}],
+    '/v1/drivers': [{"driver_number": 1, "first_name": "Max", "last_name": "Verstappen", "team_name": "Red Bull Racing"}],
+    '/v1/stints': [{"driver_number": 1, "stint_number": 1, "compound": "SOFT", "lap_start": 1, "lap_end": 10}],
+}
+
+class StandInHandler(BaseHTTPRequestHandler):
+    delays = {}
+    statuses = {}
+    drips = {} # path -> seconds the body takes, sent in 10 pieces
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        time.sleep(self.delays.get(path, LATENCY))
+        body = json.dumps(PAYLOADS.get(path, [])).encode()
+        self.send_response(self.statuses.get(path, 200))
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        drip = self.drips.get(path)
+        if not drip:
+            self.wfile.write(body)
+            return
+        step = max(1, len(body) // 10)
+        for start in range(0, len(body), step):
+            self.wfile.write(body[start:start + step])
+            self.wfile.flush()
+            time.sleep(drip / 10)
+
+    def log_message(self, *args):
+        pass
+
+class LocalURLs:
+    def __init__(self, base):
+        self.base = base
+
+    def lap_data_url(self):
+        return f"{self.base}/v1/laps?session_key=1"
+
+    def driver_data_url(self):
+        return f"{self.base}/v1/drivers?session_key=1"
+
+    def tire_data_url(self):
+        return f"{self.base}/v1/stints?session_key=1"
+
+@pytest.fixture
+def stand_in(tmp_path, mocker):
+    mocker.patch.object(cache_module, '_cache', ResponseCache(cache_dir=str(tmp_path)))
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    StandInHandler.delays = {}
+    StandInHandler.statuses = {}
+    StandInHandler.drips = {}
+
+def test_fetch_all_is_concurrent(stand_in):
+    ingestor = DataIngestor(1)
+    ingestor.url_builder = LocalURLs(stand_in)
+
+    start = time.perf_counter()
+    laps, drivers, stints = ingestor.fetch_all()
+    elapsed = time.perf_counter() - start
+
+    assert laps == PAYLOADS['/v1/laps']
+    assert drivers == PAYLOADS['/v1/drivers']
+    assert stints == PAYLOADS['/v1/stints']
+    # bounded by the slowest endpoint, not the sum of all three
+    assert elapsed < LATENCY * 2
+
+def test_fetch_all_deadline(stand_in):
+    StandInHandler.delays = {'/v1/stints': 2}
+    ingestor = DataIngestor(1, deadline=0.8)
+    ingestor.url_builder = LocalURLs(stand_in)
+
+    start = time.perf_counter()
+    laps, drivers, stints = ingestor.fetch_all()
+
+    assert time.perf_counter() - start < 1.5
+    assert laps == PAYLOADS['/v1/laps']
+    assert stints == []
+
+def test_stream_matches_full_load(stand_in):
+    streaming = DataIngestor(1, finished=True, stream=True)
+    streaming.url_builder = LocalURLs(stand_in)
+    laps, drivers, stints = streaming.fetch_all()
+    assert not isinstance(laps, list)
+    assert list(laps) == PAYLOADS['/v1/laps']
+
+    # the streamed body was written to the cache on the way through
+    cache = cache_module.get_cache()
+    assert cache.get(streaming.url_builder.lap_data_url()) == json.dumps(PAYLOADS['/v1/laps']).encode()
+
+    ingestor = DataIngestor(1, finished=True)
+    ingestor.url_builder = LocalURLs(stand_in)
+    expected_drivers, expected_teams = ingestor.load_data()
+    drivers_out, teams_out = streaming.load_data()
+    assert [(d.name, d.lap_times) for d in drivers_out.values()] == [(d.name, d.lap_times) for d in expected_drivers.values()]
+    assert list(teams_out) == list(expected_teams)
+
+def test_incomplete_ingest_writes_no_store(stand_in, tmp_path):
+    StandInHandler.statuses = {'/v1/stints': 500}
+    store_dir = str(tmp_path / "laps")
+    ingestor = DataIngestor(1, finished=True, store_dir=store_dir)
+    ingestor.url_builder = LocalURLs(stand_in)
+    drivers, _ = ingestor.load_data()
+
+    assert ingestor.failed == {'stints'}
+    assert drivers[1].lap_times # the run itself still uses what arrived
+    assert not has_store(1, store_dir)
+
+    # once every endpoint answers the store is written
+    StandInHandler.statuses = {}
+    ingestor.load_data()
+    assert ingestor.failed == set() and has_store(1, store_dir)
+
+def test_deadline_covers_the_lap_stream(stand_in, tmp_path):
+    # the laps body is still arriving when the deadline passes: read while building, not in fetch_all
+    StandInHandler.delays = {'/v1/laps': 0.1}
+    StandInHandler.drips = {'/v1/laps': 3}
+    ingestor = DataIngestor(1, finished=True, stream=True, deadline=0.8, store_dir=str(tmp_path / "laps"))
+    ingestor.url_builder = LocalURLs(stand_in)
+
+    start = time.perf_counter()
+    drivers, _ = ingestor.load_data()
+    assert time.perf_counter() - start < 1.5
+    assert ingestor.failed == {'laps'} and drivers == {}
+    # the cut off body is neither cached nor stored
+    assert cache_module.get_cache().get(ingestor.url_builder.lap_data_url()) is None
+    assert not has_store(1, str(tmp_path / "laps"))
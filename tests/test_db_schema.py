@@ -0,0 +1,132 @@
+import sqlite3
+from event_pipeline.db_handler import session_input_hash
+from event_pipeline.db_schema import (
+    create_table, insert_session_summary, get_connection, close_connections, migrate, replace_lap_telemetry,
+    schema_version, MIGRATIONS
+)
+from event_pipeline.driver import Driver
+
+def make_drivers():
+    drivers = []
+    for number, name, team, laps in [
+        (4, "lando norris", "McLaren", [(88.1, "SOFT"), (90.2, "MEDIUM")]),
+        (81, "oscar piastri", "McLaren", [(88.3, "SOFT"), (91.0, "HARD")]),
+        (1, "max verstappen", "Red Bull Racing", [(90.5, "MEDIUM")]),
+    ]:
+        driver = Driver(name, number, team)
+        for lap_time, compound in laps:
+            driver.add_lap(lap_time, compound)
+        drivers.append(driver)
+    return drivers
+
+def test_insert_session_summary():
+    conn = sqlite3.connect(":memory:")
+    create_table(conn)
+    statements = []
+    conn.set_trace_callback(statements.append)
+
+    insert_session_summary(conn, "silverstone", 2025, "practice 1", 9947, make_drivers())
+    conn.set_trace_callback(None)
+
+    # lookups do not grow with the number of drivers
+    assert len([s for s in statements if s.lstrip().startswith("SELECT")]) == 6
+
+    rows = conn.execute('''
+        SELECT d.name, t.name, p.number, a.fastest_soft_time, a.avg_med_time, a.avg_hard_time, a.best_avg_compound
+        FROM Analysis a
+        JOIN DriverSessionParticipation p ON p.session_driver_id = a.session_driver_id
+        JOIN Driver d ON d.driver_id = p.driver_id
+        JOIN Team t ON t.team_id = p.team_id
+        ORDER BY p.number''').fetchall()
+    assert rows == [
+        ("Max Verstappen", "Red Bull Racing", 1, None, 90.5, None, "MEDIUM"),
+        ("Lando Norris", "Mclaren", 4, 88.1, 90.2, None, "MEDIUM"),
+        ("Oscar Piastri", "Mclaren", 81, 88.3, None, 91.0, "HARD"),
+    ]
+
+def test_rerun_reuses_rows():
+    conn = sqlite3.connect(":memory:")
+    create_table(conn)
+    insert_session_summary(conn, "silverstone", 2025, "practice 1", 9947, make_drivers())
+    insert_session_summary(conn, "silverstone", 2025, "practice 1", 9947, make_drivers())
+
+    assert conn.execute("SELECT COUNT(*) FROM Driver").fetchone()[0] == 3
+    assert conn.execute("SELECT COUNT(*) FROM Team").fetchone()[0] == 2
+    assert conn.execute("SELECT COUNT(*) FROM DriverSessionParticipation").fetchone()[0] == 3
+
+def test_rerun_replaces_analysis_in_place():
+    conn = sqlite3.connect(":memory:")
+    create_table(conn)
+    insert_session_summary(conn, "silverstone", 2025, "practice 1", 9947, make_drivers())
+    drivers = make_drivers()
+    drivers[0].add_lap(87.5, "SOFT")
+    insert_session_summary(conn, "silverstone", 2025, "practice 1", 9947, drivers)
+
+    assert conn.execute("SELECT COUNT(*) FROM Analysis").fetchone()[0] == 3
+    assert conn.execute("SELECT MIN(fastest_soft_time) FROM Analysis").fetchone()[0] == 87.5
+
+def test_rerun_drops_analysis_of_missing_drivers():
+    conn = sqlite3.connect(":memory:")
+    create_table(conn)
+    insert_session_summary(conn, "silverstone", 2025, "practice 1", 9947, make_drivers())
+    insert_session_summary(conn, "silverstone", 2025, "practice 1", 9947, make_drivers()[:2])
+    numbers = conn.execute('''
+        SELECT p.number FROM Analysis a
+        JOIN DriverSessionParticipation p ON p.session_driver_id = a.session_driver_id ORDER BY 1''').fetchall()
+    assert numbers == [(4,), (81,)]
+
+    insert_session_summary(conn, "silverstone", 2025, "practice 1", 9947, [])
+    assert conn.execute("SELECT COUNT(*) FROM Analysis").fetchone()[0] == 0
+
+def test_lap_telemetry_joins_the_caller_transaction():
+    conn = sqlite3.connect(":memory:")
+    create_table(conn)
+    insert_session_summary(conn, "silverstone", 2025, "practice 1", 9947, make_drivers())
+    session_id = conn.execute("SELECT session_id FROM Session").fetchone()[0]
+    replace_lap_telemetry(conn, session_id, [(4, 1, 80, 320.0, 210.0, 70.0, 0.6, 0.1)])
+    assert conn.in_transaction
+    conn.rollback()
+    assert conn.execute("SELECT COUNT(*) FROM LapTelemetry").fetchone()[0] == 0
+
+def test_unchanged_inputs_skip_write():
+    conn = sqlite3.connect(":memory:")
+    create_table(conn)
+    drivers = {d.number: d for d in make_drivers()}
+    input_hash = session_input_hash(drivers)
+
+    assert insert_session_summary(conn, "silverstone", 2025, "practice 1", 9947, drivers.values(), input_hash)
+    assert not insert_session_summary(conn, "silverstone", 2025, "practice 1", 9947, drivers.values(), input_hash)
+
+    drivers[4].add_lap(87.5, "SOFT")
+    assert session_input_hash(drivers) != input_hash
+    assert insert_session_summary(conn, "silverstone", 2025, "practice 1", 9947, drivers.values(), session_input_hash(drivers))
+
+def test_upgrade_dedupes_old_analysis_rows():
+    conn = sqlite3.connect(":memory:")
+    conn.executescript('''
+    CREATE TABLE Session (session_id INTEGER PRIMARY KEY, event_id INTEGER NOT NULL, name TEXT NOT NULL, session_key INTEGER);
+    CREATE TABLE Analysis (analysis_id INTEGER PRIMARY KEY AUTOINCREMENT, session_driver_id INTEGER NOT NULL,
+        fastest_soft_time REAL, avg_med_time REAL, avg_hard_time REAL, best_avg_compound TEXT);
+    INSERT INTO Analysis (session_driver_id, fastest_soft_time) VALUES (1, 90.0), (1, 89.0), (2, 91.0);
+    ''')
+    create_table(conn)
+    assert conn.execute("SELECT session_driver_id, fastest_soft_time FROM Analysis ORDER BY 1").fetchall() == [(1, 89.0), (2, 91.0)]
+
+def test_get_connection_is_tuned_and_reused(tmp_path):
+    path = str(tmp_path / "f1.db")
+    conn = get_connection(path)
+    try:
+        assert get_connection(path) is conn
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+        assert schema_version(conn) == MIGRATIONS[-1][0]
+    finally:
+        close_connections()
+
+def test_migrate_is_applied_once():
+    conn = sqlite3.connect(":memory:")
+    migrate(conn)
+    statements = []
+    conn.set_trace_callback(statements.append)
+    migrate(conn)
+    assert not any("CREATE TABLE IF NOT EXISTS Event" in s for s in statements)
@@ -0,0 +1,67 @@
+import sqlite3
+import statistics
+import pytest
+from benchmarks.synthetic import COMPOUND_DEG, generate_session
+from event_pipeline.columnar_filter import ColumnarDriverBuilder
+from event_pipeline.data_filter import DriverBuilder
+from event_pipeline.db_schema import insert_session_summary, migrate
+from event_pipeline.degradation import fit_degradation, fit_sessions
+from event_pipeline.driver import Driver
+from event_pipeline.lap_analyzer import LapAnalyzer
+
+def fits_of(fits):
+    return {key: (pytest.approx(f.deg_rate), pytest.approx(f.r2), f.laps, f.stints) for key, f in fits.items()}
+
+def test_stints_share_the_slope_not_the_intercept():
+    driver = Driver("Lando Norris", 4, "McLaren")
+    # two MEDIUM runs 0.8 s apart (fuel), both +0.07 s per lap of tyre age; the second set starts used
+    for age in range(6):
+        driver.add_lap(90.0 + 0.07 * age, "MEDIUM", age, 2)
+    for age in range(3, 10):
+        driver.add_lap(89.2 + 0.07 * age, "MEDIUM", age, 4)
+    driver.add_lap(101.5, "MEDIUM", 10, 4) # traffic
+    driver.add_lap(88.0, "SOFT", 1, 1) # too few laps
+    driver.add_lap(91.0, "HARD") # no stint
+
+    fits = fit_degradation({4: driver})
+    assert list(fits) == [(4, "MEDIUM")]
+    fit = fits[(4, "MEDIUM")]
+    assert fit.deg_rate == pytest.approx(0.07) and fit.r2 == pytest.approx(1.0)
+    assert (fit.laps, fit.stints) == (13, 2)
+
+def test_synthetic_degradation_is_recovered():
+    sessions = [DriverBuilder(*generate_session(2024000 + 10 * i)).build()[0] for i in range(20)]
+    fits = fit_sessions(sessions)
+    for compound, rate in COMPOUND_DEG.items():
+        rates = [f.deg_rate for session in fits for (_, c), f in session.items() if c == compound]
+        assert statistics.median(rates) == pytest.approx(rate, abs=0.015)
+
+    # one batched solve == one solve per session
+    assert [fits_of(f) for f in fits] == [fits_of(fit_degradation(drivers)) for drivers in sessions]
+
+def test_engines_fit_the_same_laps():
+    laps, drivers, stints = generate_session(2024010)
+    expected = fit_degradation(DriverBuilder(laps, drivers, stints).build()[0])
+    assert expected
+    assert fits_of(fit_degradation(ColumnarDriverBuilder(laps, drivers, stints).build()[0])) == fits_of(expected)
+
+def test_degradation_is_stored_and_reported():
+    laps, drivers, stints = generate_session(2024000)
+    built, teams = DriverBuilder(laps, drivers, stints).build()
+    analyzer = LapAnalyzer(built, teams, "sakhir", "practice 1", 2024)
+
+    conn = sqlite3.connect(":memory:")
+    migrate(conn)
+    insert_session_summary(conn, "Sakhir", 2024, "Practice 1", 2024000, built.values(),
+                           degradation=analyzer.degradation)
+    rows = conn.execute('''
+        SELECT p.number, g.compound, g.deg_rate, g.r2, g.laps, g.stints FROM Degradation g
+        JOIN DriverSessionParticipation p ON p.session_driver_id = g.session_driver_id''').fetchall()
+    assert {(n, c): (rate, r2, laps, stints) for n, c, rate, r2, laps, stints in rows} == fits_of(analyzer.degradation)
+    conn.close()
+
+    report = analyzer.report()
+    for row in report['race_pace']:
+        fit = analyzer.degradation.get((row['number'], row['compound']))
+        assert row['deg_rate'] == (fit.deg_rate if fit else None)
+    assert len(report['degradation']) == len(analyzer.degradation)
@@ -0,0 +1,53 @@
+import pytest
+from event_pipeline.driver import NO_AGE, Driver
+from event_pipeline.team import Team
+from event_pipeline.utils import best_avg_lap
+
+def make_driver(number, laps):
+    driver = Driver(f"Driver {number}", number, "McLaren")
+    for lap_time, compound in laps:
+        driver.add_lap(lap_time, compound)
+    return driver
+
+def test_running_aggregates():
+    driver = make_driver(4, [(90.5, "SOFT"), (92.0, "MEDIUM"), (89.9, "SOFT"), (93.0, "MEDIUM"), (94.0, "HARD")])
+
+    assert driver.fastest_soft_time == 89.9
+    assert driver.avg_med == pytest.approx(92.5)
+    assert driver.avg_hard == 94.0
+    assert driver.avg_lap_time() == pytest.approx(sum([90.5, 92.0, 89.9, 93.0, 94.0]) / 5)
+    assert (driver.best_avg, driver.best_avg_compound) == (pytest.approx(92.5), "MEDIUM")
+    assert list(driver.compound_laps["SOFT"]) == [90.5, 89.9]
+    assert sorted(driver.lap_times) == [89.9, 90.5, 92.0, 93.0, 94.0]
+
+def test_lap_tyre_columns():
+    driver = Driver("Lando Norris", 4)
+    driver.add_lap(90.0, "MEDIUM", 3, 2)
+    driver.add_lap(90.2, "MEDIUM", float('nan'), None) # numpy engine, no stint
+    driver.add_lap(90.4, "MEDIUM")
+    assert list(driver.compound_ages["MEDIUM"]) == [3, NO_AGE, NO_AGE]
+    assert list(driver.compound_stints["MEDIUM"]) == [2, 0, 0]
+    # 8 + 2 + 1 bytes per lap
+    assert sum(a.itemsize for a in (driver.compound_laps["MEDIUM"], driver.compound_ages["MEDIUM"],
+                                    driver.compound_stints["MEDIUM"])) == 11
+
+def test_empty_driver():
+    driver = Driver("Lando Norris", 4)
+    assert driver.fastest_soft_time is None
+    assert driver.avg_lap_time("MEDIUM") is None
+    assert driver.best_avg_lap() == (None, None)
+
+def test_slots():
+    driver = Driver("Lando Norris", 4)
+    with pytest.raises(AttributeError):
+        driver.extra = 1
+    assert not hasattr(Team("McLaren"), "__dict__")
+
+def test_team_avg():
+    team = Team("McLaren")
+    team.add_driver(make_driver(4, [(90.0, "MEDIUM")]))
+    team.add_driver(make_driver(81, [(91.0, "MEDIUM"), (92.0, "HARD")]))
+
+    assert team.team_avg("MEDIUM") == pytest.approx(90.5)
+    assert team.team_avg("HARD") == 92.0
+    assert best_avg_lap(team) == (pytest.approx(90.5), "MEDIUM")
@@ -0,0 +1,43 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = {'requests', 'urllib3', 'numpy', 'sqlite3'}
+BUDGET_US = 50_000 # generous: both stay under a few ms, the full pipeline import chain is 60+ ms
+
+def import_profile(*args):
+    # -X importtime: (cumulative µs of top level imports after interpreter startup, modules imported)
+    result = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=ROOT, capture_output=True,
+                            text=True, check=True, env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"})
+    total, modules, started = 0, set(), False
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.add(name.strip())
+        if name.strip() == "site":
+            started = True
+        elif started and not name.startswith("  "):
+            total += int(cumulative)
+    return total, modules
+
+def best_of(args, runs=3):
+    profiles = [import_profile(*args) for _ in range(runs)]
+    return min(total for total, _ in profiles), profiles[0][1]
+
+def test_import_package_is_cheap():
+    total, modules = best_of(["-c", "import event_pipeline"])
+    assert not modules & HEAVY
+    assert total < BUDGET_US
+
+def test_main_help_is_cheap():
+    total, modules = best_of(["main.py", "--help"])
+    assert not modules & HEAVY
+    assert not {m for m in modules if m.startswith("event_pipeline.")} - {"event_pipeline.defaults"}
+    assert total < BUDGET_US
+
+def test_session_import_defers_network_and_numpy():
+    # batch workers import Session on spawn; requests and numpy load on first use
+    _, modules = import_profile("-c", "import event_pipeline.session")
+    assert not modules & {'requests', 'urllib3', 'numpy'}
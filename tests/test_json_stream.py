@@ -0,0 +1,28 @@
+import json
+import pytest
+from event_pipeline.json_stream import iter_json_array, read_chunks
+
+LAPS = [{"driver_number": n, "lap_number": i, "lap_duration": 90.123 + i, "segments": [2049, 2051, None],
+         "name": "Pérez"} for n in (1, 11) for i in range(1, 30)]
+
+def chunked(body, size):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+@pytest.mark.parametrize("size", [1, 3, 17, 4096])
+def test_chunk_boundaries(size):
+    body = json.dumps(LAPS).encode()
+    assert list(iter_json_array(chunked(body, size))) == LAPS
+
+def test_scalars_split_across_chunks():
+    assert list(iter_json_array([b'[1, 2.', b'25, "a', b'b"]'])) == [1, 2.25, "ab"]
+
+def test_read_from_file(tmp_path):
+    path = tmp_path / "laps.json"
+    path.write_text(json.dumps(LAPS))
+    assert list(iter_json_array(read_chunks(str(path), chunk_size=100))) == LAPS
+
+def test_invalid_payloads():
+    with pytest.raises(ValueError):
+        list(iter_json_array([b'{"detail": "Not found"}']))
+    with pytest.raises(ValueError):
+        list(iter_json_array([b'[{"a": 1}, {"a"']))
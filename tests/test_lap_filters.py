@@ -0,0 +1,78 @@
+import random
+import numpy as np
+import pytest
+from event_pipeline.columnar_filter import ColumnarDriverBuilder, LapGroups
+from event_pipeline.data_filter import DEFAULT_POLICY, FILTER_SETTINGS, DriverBuilder
+from event_pipeline.db_handler import session_input_hash
+from event_pipeline.lap_filters import IQR, MAD, FilterPolicy, Percentile, RatioToBest, parse_filter, quantile
+from event_pipeline.live import IncrementalDriverBuilder
+from tests.test_columnar_filter import make_session, snapshot
+
+POLICIES = {
+    'default': DEFAULT_POLICY,
+    'iqr': DEFAULT_POLICY.with_specs(['MEDIUM=iqr', 'HARD=iqr:1.0', 'default=iqr:2'], FILTER_SETTINGS),
+    'mad': DEFAULT_POLICY.with_specs(['MEDIUM=mad', 'SOFT=mad:2', 'default=ratio:1.1'], FILTER_SETTINGS),
+    'no-fallback': FilterPolicy({'SOFT': Percentile(0.5)}, MAD(2.5)),
+}
+
+def laps_of(times):
+    return [(t, n) for n, t in enumerate(times, start=1)]
+
+def test_percentile_matches_full_sort_with_ties():
+    rng = random.Random(7)
+    for _ in range(200):
+        laps = laps_of([rng.choice([80.0, 80.5, 81.0, 90.0]) for _ in range(rng.randint(1, 15))])
+        kept = Percentile(0.9).select(laps)
+        assert sorted(kept) == sorted(sorted(laps, key=lambda x: x[0])[:int(len(laps) * 0.9)])
+        assert kept == sorted(kept, key=lambda x: x[1]) # lap order is kept
+
+def test_statistical_filters_drop_slow_laps():
+    laps = laps_of([90.1, 90.3, 89.9, 90.2, 104.5, 90.0, 90.4, 98.0])
+    assert [t for t, _ in IQR(1.5).select(laps)] == [90.1, 90.3, 89.9, 90.2, 90.0, 90.4]
+    assert [t for t, _ in MAD(3.0).select(laps)] == [90.1, 90.3, 89.9, 90.2, 90.0, 90.4]
+    assert [t for t, _ in RatioToBest(1.04, 65).select(laps)] == [90.1, 90.3, 89.9, 90.2, 90.0, 90.4]
+    # too few laps for quartiles -> fallback
+    assert IQR(1.5, min_laps=5, fallback=RatioToBest(1.01)).select(laps_of([90.0, 95.0])) == [(90.0, 1)]
+
+def test_group_quantiles_match_python():
+    rng = random.Random(3)
+    groups = [[round(rng.uniform(80, 100), 3) for _ in range(rng.randint(1, 30))] for _ in range(40)]
+    times = np.array([t for g in groups for t in g])
+    ids = np.array([i for i, g in enumerate(groups) for _ in g])
+    lap_groups = LapGroups(times, ids, len(groups))
+    rows = np.arange(len(groups))
+    for q in (0.25, 0.5, 0.75):
+        assert lap_groups.quantile(times, rows, q).tolist() == [quantile(g, q) for g in groups]
+    assert lap_groups.kth_smallest(times, rows, np.zeros(len(groups), dtype=np.int64)).tolist() == \
+        [min(g) for g in groups]
+
+@pytest.mark.parametrize('name', POLICIES)
+def test_engines_agree(name):
+    policy = POLICIES[name]
+    for seed in range(15):
+        lap_data, driver_data, tire_data = make_session(seed)
+        expected = snapshot(*DriverBuilder(lap_data, driver_data, tire_data, policy).build())
+        actual = snapshot(*ColumnarDriverBuilder(lap_data, driver_data, tire_data, policy).build())
+        assert actual == expected, f"seed {seed}"
+
+def test_incremental_builder_uses_policy():
+    policy = POLICIES['iqr']
+    lap_data, driver_data, tire_data = make_session(1)
+    expected, _ = DriverBuilder(lap_data, driver_data, tire_data, policy).build()
+    builder = IncrementalDriverBuilder(driver_data, policy)
+    builder.apply(tire_data=tire_data)
+    for start in range(0, len(lap_data), 37):
+        builder.apply(lap_data[start:start + 37])
+    assert {n: sorted(d.lap_times) for n, d in builder.drivers.items()} == \
+        {n: sorted(d.lap_times) for n, d in expected.items()}
+
+def test_policy_settings_and_parsing():
+    assert DEFAULT_POLICY.settings()['MEDIUM'] == {
+        'strategy': 'percentile', 'q': 0.9, 'min_laps': 5,
+        'fallback': {'strategy': 'ratio', 'ratio': 1.04, 'floor': 65}}
+    assert parse_filter('ratio', FILTER_SETTINGS).settings() == DEFAULT_POLICY.settings()['default']
+    with pytest.raises(ValueError):
+        parse_filter('median', FILTER_SETTINGS)
+
+    drivers, _ = DriverBuilder(*make_session(2)).build()
+    assert session_input_hash(drivers) != session_input_hash(drivers, POLICIES['iqr'].settings())
@@ -0,0 +1,45 @@
+import sqlite3
+from event_pipeline.data_filter import DriverBuilder
+from event_pipeline.db_schema import migrate, insert_event, insert_session
+from event_pipeline.lap_store import RawSessionData, sync_raw_session, load_raw_session, find_session
+
+DRIVERS = [{"driver_number": 4, "first_name": "Lando", "last_name": "Norris", "team_name": "Mclaren"}]
+STINTS = [
+    {"driver_number": 4, "stint_number": 1, "compound": "SOFT", "lap_start": 1, "lap_end": 3, "tyre_age_at_start": 0},
+    {"driver_number": 4, "stint_number": 2, "compound": "MEDIUM", "lap_start": 4, "lap_end": 10, "tyre_age_at_start": 2},
+]
+LAPS = [{"driver_number": 4, "lap_number": n, "lap_duration": 88.0 + n * 0.1, "is_pit_out_lap": n == 1}
+        for n in range(1, 11)]
+
+def setup_session():
+    conn = sqlite3.connect(":memory:")
+    migrate(conn)
+    event_id = insert_event(conn, "silverstone", 2025)
+    return conn, insert_session(conn, event_id, "practice 1", 9947)
+
+def recorded(laps=LAPS):
+    raw = RawSessionData(DRIVERS, STINTS)
+    list(raw.record(laps))
+    return raw
+
+def test_round_trip_matches_api_build():
+    conn, session_id = setup_session()
+    sync_raw_session(conn, session_id, recorded())
+
+    assert find_session(conn, "Silverstone", "2025", "Practice 1") == (session_id, 9947)
+    lap_data, driver_data, tire_data = load_raw_session(conn, session_id)
+    from_db, _ = DriverBuilder(lap_data, driver_data, tire_data).build()
+    from_api, _ = DriverBuilder(LAPS, DRIVERS, STINTS).build()
+
+    assert list(from_db[4].lap_times) == list(from_api[4].lap_times)
+    assert from_db[4].name == from_api[4].name
+    assert conn.execute("SELECT compound, COUNT(*) FROM Lap GROUP BY compound ORDER BY 1").fetchall() == [("MEDIUM", 7), ("SOFT", 3)]
+
+def test_sync_is_incremental():
+    conn, session_id = setup_session()
+    assert sync_raw_session(conn, session_id, recorded()) > 0
+    assert sync_raw_session(conn, session_id, recorded()) == 0
+
+    changed = [dict(lap) for lap in LAPS] + [{"driver_number": 4, "lap_number": 11, "lap_duration": 89.0}]
+    changed[5]["lap_duration"] = 95.0
+    assert sync_raw_session(conn, session_id, recorded(changed)) == 2
@@ -0,0 +1,71 @@
+import sqlite3
+import pytest
+from benchmarks.synthetic import generate_session
+from event_pipeline.data_filter import DriverBuilder
+from event_pipeline.db_schema import insert_session_summary, migrate
+from event_pipeline.lap_analyzer import LapAnalyzer
+from event_pipeline.leaderboard import Ranking, SessionLeaderboard
+from event_pipeline.live import IncrementalDriverBuilder
+from event_pipeline.utils import best_avg_lap
+
+def test_ranking_queries():
+    ranking = Ranking()
+    for key, value in [('VER', 90.4), ('NOR', 90.1), ('LEC', 90.9), ('HAM', 90.1), ('ALO', 91.5)]:
+        ranking.update(key, value)
+    assert [k for k, _, _ in ranking.top()] == ['NOR', 'HAM', 'VER', 'LEC', 'ALO'] # ties: first seen first
+    assert ranking.rank('VER') == 3 and ranking.gap('VER') == pytest.approx(0.3)
+    assert ranking.percentile('NOR') == 100.0 and ranking.percentile('ALO') == 0.0
+    assert ranking.value_at(50) == 90.4 and ranking.value_at(0) == 90.1
+
+    ranking.update('ALO', 89.8, 'SOFT') # moves to the front
+    ranking.update('HAM', None) # removed
+    assert ranking.top(2) == [('ALO', 89.8, 'SOFT'), ('NOR', 90.1, None)]
+    assert ranking.rank('HAM') is None and 'HAM' not in ranking and len(ranking) == 4
+    assert ranking.leader() == ('ALO', 89.8, 'SOFT')
+
+def expected_order(drivers, teams):
+    soft = sorted((d for d in drivers.values() if d.fastest_soft_time), key=lambda d: d.fastest_soft_time)
+    pace = sorted((d for d in drivers.values() if best_avg_lap(d)[0]), key=lambda d: best_avg_lap(d)[0])
+    team = sorted((t for t in teams.values() if best_avg_lap(t)[0]), key=lambda t: best_avg_lap(t)[0])
+    return [d.number for d in soft], [d.number for d in pace], [t.name for t in team]
+
+def board_order(board):
+    return ([k for k, _, _ in board.fastest_soft.top()], [k for k, _, _ in board.race_pace.top()],
+            [k for k, _, _ in board.team_pace.top()])
+
+def test_incremental_updates_match_a_fresh_build():
+    laps, drivers, stints = generate_session(2024010)
+    builder = IncrementalDriverBuilder(drivers)
+    board = SessionLeaderboard(builder.drivers, builder.teams)
+    builder.apply(tire_data=stints)
+    for start in range(0, len(laps), 60):
+        _, dirty = builder.apply(laps[start:start + 60])
+        board.update(dirty)
+        assert board_order(board) == expected_order(builder.drivers, builder.teams)
+
+    full, teams = DriverBuilder(laps, drivers, stints).build()
+    assert board_order(board) == board_order(SessionLeaderboard(full, teams))
+
+def test_summary_and_db_read_the_leaderboard(capsys):
+    laps, drivers, stints = generate_session(2024000)
+    built, teams = DriverBuilder(laps, drivers, stints).build()
+    analyzer = LapAnalyzer(built, teams, "sakhir", "practice 1", 2024)
+    analyzer.print_fastest_soft()
+    leader_number, leader_time, _ = analyzer.leaderboard.fastest_soft.leader()
+    out = capsys.readouterr().out.splitlines()
+    assert out[3] == f"{built[leader_number].name} (#{leader_number})"
+
+    data = analyzer.leaderboard.to_dict(k=3)
+    assert [r['rank'] for r in data['race_pace']] == [1, 2, 3] and data['race_pace'][0]['gap'] == 0
+    assert data['fastest_soft'][0]['time'] == leader_time
+
+    conn = sqlite3.connect(":memory:")
+    migrate(conn)
+    insert_session_summary(conn, "Sakhir", 2024, "Practice 1", 2024000, built.values(),
+                           leaderboard=analyzer.leaderboard)
+    rows = conn.execute('''
+        SELECT p.number, a.soft_rank, a.pace_rank FROM Analysis a
+        JOIN DriverSessionParticipation p ON p.session_driver_id = a.session_driver_id''').fetchall()
+    assert {n: (soft, pace) for n, soft, pace in rows} == {
+        n: (analyzer.leaderboard.fastest_soft.rank(n), analyzer.leaderboard.race_pace.rank(n)) for n in built}
+    conn.close()
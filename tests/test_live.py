@@ -0,0 +1,99 @@
+import asyncio
+import sqlite3
+from datetime import datetime, timedelta, timezone
+import pytest
+from benchmarks.run import local_api
+from benchmarks.stand_in import StandInAPI
+from benchmarks.synthetic import generate_scale
+from event_pipeline.data_filter import DriverBuilder
+from event_pipeline.degradation import fit_degradation
+from event_pipeline.live import IncrementalDriverBuilder, LapWatermark, LiveSession
+
+def driver_stats(drivers):
+    return {
+        number: (driver.stats.count, driver.stats.fastest, pytest.approx(driver.stats.total),
+                 {c: s.count for c, s in driver.compound_stats.items()})
+        for number, driver in drivers.items()
+    }
+
+def test_incremental_build_matches_full_build():
+    _, payloads = generate_scale('session')
+    laps, drivers, stints = next(iter(payloads.values()))
+    expected = DriverBuilder(laps, drivers, stints)
+    expected.build()
+
+    builder = IncrementalDriverBuilder(drivers)
+    builder.apply(tire_data=stints)
+    changed = 0
+    for start in range(0, len(laps), 50):
+        delta, dirty = builder.apply(laps[start:start + 50])
+        changed += len(delta.laps)
+        assert dirty == {lap['driver_number'] for lap in laps[start:start + 50]}
+    assert changed == len(laps)
+    assert driver_stats(builder.drivers) == driver_stats(expected.drivers)
+    assert builder.lap_counts() == expected.lap_counts()
+    assert {t: len(team.drivers) for t, team in builder.teams.items()} == \
+        {t: len(team.drivers) for t, team in expected.teams.items()}
+
+    # replayed records change nothing
+    delta, dirty = builder.apply(laps[:100], stints)
+    assert not delta.laps and not dirty
+
+def test_watermark_waits_for_running_laps():
+    watermark = LapWatermark()
+    watermark.update([
+        {'driver_number': 1, 'lap_number': 3, 'lap_duration': 90.1, 'date_start': '2024-03-01T12:00:00.000+00:00'},
+        {'driver_number': 4, 'lap_number': 2, 'lap_duration': None, 'date_start': '2024-03-01T12:00:30.000+00:00'},
+        {'driver_number': 1, 'lap_number': 4, 'lap_duration': None, 'date_start': '2024-03-01T12:01:30.100+00:00'},
+    ])
+    assert watermark.value() == '2024-03-01T12:00:30.000+00:00'
+    watermark.update([{'driver_number': 4, 'lap_number': 2, 'lap_duration': 91.0,
+                       'date_start': '2024-03-01T12:00:30.000+00:00'}])
+    assert watermark.value() == '2024-03-01T12:01:30.100+00:00'
+    # abandoned laps stop holding the watermark back
+    watermark.update([{'driver_number': 4, 'lap_number': 3, 'lap_duration': 95.0,
+                       'date_start': '2024-03-01T12:10:00.000+00:00'}])
+    assert watermark.value() == '2024-03-01T12:10:00.000+00:00'
+
+def test_live_session_against_stand_in(tmp_path):
+    catalog, payloads = generate_scale('session')
+    info = catalog[0]
+    laps, drivers, stints = payloads[info['session_key']]
+    info['date_end'] = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat() # still running
+
+    session_start = datetime.fromisoformat(info['date_start'])
+    now = [session_start]
+    updates = []
+    db_path = str(tmp_path / "f1.db")
+
+    async def follow(live):
+        assert await live.start()
+        for minutes in range(5, 90, 5):
+            now[0] = session_start + timedelta(minutes=minutes)
+            await live.poll()
+
+    with StandInAPI.synthetic(catalog, payloads, clock=lambda: now[0]) as api, local_api(api, str(tmp_path)):
+        live = LiveSession(info['circuit_short_name'], info['session_name'], info['year'], db_path=db_path,
+                           on_update=lambda live: updates.append(len(live.analyzer().drivers)))
+        asyncio.run(follow(live))
+        assert api.statuses == {200: api.requests}
+
+    expected = DriverBuilder(laps, drivers, stints)
+    expected.build()
+    assert driver_stats(live.drivers) == driver_stats(expected.drivers)
+    assert updates and updates[-1] == 20
+    # refitted per poll for the changed drivers only, same fits as one fit of the whole session
+    expected_fits = fit_degradation(expected.drivers)
+    assert set(live.analyzer().degradation) == set(expected_fits)
+    assert all(live.analyzer().degradation[key].deg_rate == pytest.approx(fit.deg_rate)
+               for key, fit in expected_fits.items())
+
+    # every poll downloads the new laps plus at most one running lap per driver, never the whole session again
+    assert live.metrics.counters['laps_fetched'] <= len(laps) + live.polls * len(drivers)
+    assert live.watermark.value() is not None
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM Lap").fetchone()[0] == len(laps)
+    assert conn.execute("SELECT COUNT(*) FROM Lap WHERE compound = 'Unknown'").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM Analysis").fetchone()[0] == 20
+    conn.close()
@@ -0,0 +1,74 @@
+import glob
+import os
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from logging.handlers import QueueHandler
+import pytest
+from event_pipeline import logging_config
+from event_pipeline.batch import run_job
+from event_pipeline.logging_config import (configure_logging, configure_worker_logging, get_logger,
+                                           shutdown_logging, worker_log_queue)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def clean_logger():
+    yield get_logger()
+    shutdown_logging()
+    logging_config._reset_handlers(get_logger())
+
+def log_lines(worker, count):
+    logger = get_logger()
+    for i in range(count):
+        logger.info("worker %s line %s %s", worker, i, "x" * 100)
+    return count
+
+def run_from_empty_db(db_path):
+    # Session.run calls setup_logger(), which must keep forwarding to the parent
+    result = run_job(("Nowhere", "Race", "2024"), session_options={'source': 'db', 'db_path': db_path})
+    handlers = get_logger().handlers
+    return result['ok'], [type(h) for h in handlers], logging_config.is_configured()
+
+def read_log_files(log_dir):
+    lines = []
+    for path in glob.glob(os.path.join(log_dir, "f1_pipeline.log*")):
+        with open(path, encoding="utf-8") as f:
+            lines.extend(f.read().splitlines())
+    return lines
+
+def test_import_has_no_side_effects(tmp_path):
+    code = ("import event_pipeline.session, event_pipeline.batch, event_pipeline.driver, logging;"
+            "assert not logging.getLogger('f1_logger').handlers")
+    subprocess.run([sys.executable, "-c", code], cwd=tmp_path, check=True,
+                   env={**os.environ, "PYTHONPATH": ROOT, "PYTHONDONTWRITEBYTECODE": "1"})
+    assert os.listdir(tmp_path) == []
+
+def test_records_are_written_by_the_listener(tmp_path, clean_logger):
+    configure_logging(log_dir=str(tmp_path), console=False)
+    assert [type(h) for h in clean_logger.handlers] == [QueueHandler]
+    clean_logger.debug("not enabled %s", "never formatted")
+    clean_logger.info("Found session_key: %s", 9472)
+    shutdown_logging()
+
+    lines = read_log_files(str(tmp_path))
+    assert len(lines) == 1 and lines[0].endswith("Found session_key: 9472")
+
+def test_worker_processes_share_one_rotated_file(tmp_path, clean_logger, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    configure_logging(log_dir=str(tmp_path), console=False, max_bytes=20_000, backup_count=50)
+    log_queue = worker_log_queue()
+    with ProcessPoolExecutor(max_workers=2, initializer=configure_worker_logging, initargs=(log_queue,)) as pool:
+        assert sum(pool.map(log_lines, range(4), [200] * 4)) == 800
+        db_path = str(tmp_path / "empty.db")
+        assert pool.submit(run_from_empty_db, db_path).result() == (False, [QueueHandler], True)
+    shutdown_logging()
+
+    lines = read_log_files(str(tmp_path))
+    assert len(glob.glob(os.path.join(tmp_path, "f1_pipeline.log.*"))) > 1 # rotated
+    assert len(lines) == 801
+    assert sum(line.endswith("Session not found in database.") for line in lines) == 1
+    # one writer: no torn or interleaved lines
+    worker_lines = [line for line in lines if "worker" in line]
+    assert len(worker_lines) == 800 and all(line.endswith("x" * 100) for line in worker_lines)
+    assert not os.path.exists(tmp_path / "logs") # the worker did not open its own log file
@@ -0,0 +1,63 @@
+import json
+import time
+from benchmarks.run import local_api
+from benchmarks.stand_in import StandInAPI
+from benchmarks.synthetic import generate_scale
+from event_pipeline.batch import BatchResult
+from event_pipeline.metrics import PipelineMetrics, dump_chrome_trace, dump_json, from_dict, profiled
+from event_pipeline.session import Session
+
+def test_stages_and_counters(tmp_path):
+    metrics = PipelineMetrics("Sakhir - Practice 1 (2024)")
+    with metrics.stage('run'):
+        with metrics.stage('fetch'):
+            time.sleep(0.01)
+    metrics.incr('laps_seen', 3)
+    metrics.update({'laps_seen': 2, 'rows_written': 0})
+
+    assert [s['name'] for s in metrics.stages] == ['fetch', 'run']
+    assert metrics.stage_totals()['fetch'] >= 0.01
+    assert metrics.counters == {'laps_seen': 5, 'rows_written': 0}
+
+    dump_chrome_trace(metrics, str(tmp_path / "trace.json"))
+    events = json.loads((tmp_path / "trace.json").read_text())['traceEvents']
+    assert [e['ph'] for e in events] == ['X', 'X', 'C']
+    run, fetch = events[0], events[1]
+    assert run['name'] == 'run' and run['ts'] <= fetch['ts'] and fetch['dur'] <= run['dur']
+
+    dump_json([metrics], str(tmp_path / "metrics.json"))
+    restored = from_dict(json.loads((tmp_path / "metrics.json").read_text())[0])
+    assert restored.stage_totals() == metrics.stage_totals()
+    assert BatchResult([{'ok': True, 'metrics': metrics.to_dict()}]).stage_totals().keys() == {'run', 'fetch'}
+
+def test_session_run_metrics(tmp_path):
+    catalog, payloads = generate_scale('session')
+    info = catalog[0]
+    laps = payloads[info['session_key']][0]
+    args = (info['circuit_short_name'], info['session_name'], str(info['year']))
+
+    with StandInAPI.synthetic(catalog, payloads) as api, local_api(api, str(tmp_path)):
+        session = Session(*args, db_path=str(tmp_path / "f1.db"), lap_store_dir=str(tmp_path / "laps"))
+        session.run(show_summary=False)
+        first = session.metrics.counters
+        assert set(session.metrics.stage_totals()) == {'run', 'session_key', 'fetch', 'build', 'write_store', 'db_save'}
+        assert first['laps_seen'] == len(laps)
+        assert first['laps_kept'] == sum(d.stats.count for d in session.drivers.values())
+        assert first['laps_usable'] == first['laps_kept'] + first['laps_filtered']
+        assert first['requests'] == 4 and first['bytes_fetched'] > 0 and first['cache_misses'] >= 3
+        assert first['rows_written'] > len(laps)
+
+        # second run: from the lap store, nothing new to write
+        session = Session(*args, db_path=str(tmp_path / "f1.db"), lap_store_dir=str(tmp_path / "laps"))
+        session.run(show_summary=False)
+        second = session.metrics.counters
+        assert 'lap_store' in session.metrics.stage_totals()
+        assert second['laps_kept'] == first['laps_kept']
+        assert second['requests'] == 0 and second['rows_written'] == 0
+
+def test_profiled(tmp_path, capsys):
+    path = tmp_path / "run.prof"
+    with profiled(str(path), limit=5):
+        sum(range(1000))
+    assert path.stat().st_size > 0
+    assert "cumulative" in capsys.readouterr().out
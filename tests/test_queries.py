@@ -0,0 +1,61 @@
+import sqlite3
+import pytest
+from event_pipeline import queries
+from event_pipeline.db_schema import migrate, insert_session_summary
+from event_pipeline.driver import Driver
+
+def make_driver(name, number, team, laps):
+    driver = Driver(name, number, team)
+    for lap_time, compound in laps:
+        driver.add_lap(lap_time, compound)
+    return driver
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    migrate(conn)
+    insert_session_summary(conn, "silverstone", 2025, "practice 1", 100, [
+        make_driver("lando norris", 4, "McLaren", [(88.0, "SOFT"), (90.0, "MEDIUM")]),
+        make_driver("oscar piastri", 81, "McLaren", [(88.4, "SOFT"), (92.0, "MEDIUM")]),
+        make_driver("max verstappen", 1, "Red Bull Racing", [(88.2, "SOFT"), (91.5, "HARD")]),
+    ])
+    insert_session_summary(conn, "silverstone", 2025, "practice 2", 101, [
+        make_driver("lando norris", 4, "McLaren", [(87.6, "SOFT"), (89.0, "MEDIUM")]),
+        make_driver("max verstappen", 1, "Red Bull Racing", [(88.5, "SOFT"), (90.5, "MEDIUM")]),
+    ])
+    insert_session_summary(conn, "spielberg", 2025, "practice 1", 102, [
+        make_driver("max verstappen", 1, "Red Bull Racing", [(64.9, "SOFT")]),
+    ])
+    return conn
+
+def test_driver_weekend_pace(conn):
+    rows = queries.driver_weekend_pace(conn, "Silverstone", 2025)
+    assert [r['driver'] for r in rows] == ["Lando Norris", "Max Verstappen", "Oscar Piastri"]
+    assert rows[0]['sessions'] == 2
+    assert rows[0]['best_soft_time'] == 87.6
+    assert rows[0]['avg_race_pace'] == pytest.approx(89.5)
+
+def test_team_pace_trend(conn):
+    rows = queries.team_pace_trend(conn, 2025, "mclaren")
+    assert [(r['session'], r['race_pace'], r['compound']) for r in rows] == [
+        ("Practice 1", pytest.approx(91.0), "MEDIUM"),
+        ("Practice 2", 89.0, "MEDIUM"),
+    ]
+
+def test_leaderboard_is_updated_on_rerun(conn):
+    rows = queries.fastest_soft_leaderboard(conn, 2025)
+    assert [(r['driver'], r['best_soft_time'], r['event']) for r in rows] == [
+        ("Max Verstappen", 64.9, "Spielberg"),
+        ("Lando Norris", 87.6, "Silverstone"),
+        ("Oscar Piastri", 88.4, "Silverstone"),
+    ]
+
+    # re-run replaces the analysis, the aggregate follows
+    insert_session_summary(conn, "spielberg", 2025, "practice 1", 102, [
+        make_driver("max verstappen", 1, "Red Bull Racing", [(90.0, "MEDIUM")]),
+    ])
+    rows = queries.fastest_soft_leaderboard(conn, 2025, limit=2)
+    assert [(r['driver'], r['best_soft_time'], r['event'], r['session']) for r in rows] == [
+        ("Lando Norris", 87.6, "Silverstone", "Practice 2"),
+        ("Max Verstappen", 88.2, "Silverstone", "Practice 1"),
+    ]
@@ -0,0 +1,114 @@
+import csv
+import io
+import json
+import pytest
+import main
+from benchmarks.synthetic import generate_session
+from event_pipeline import lap_analyzer
+from event_pipeline.batch import BatchResult
+from event_pipeline.data_filter import DriverBuilder
+from event_pipeline.defaults import REPORT_FORMATS
+from event_pipeline.lap_analyzer import LapAnalyzer
+from event_pipeline.report import FORMATS, ReportWriter, format_for, write_reports
+
+def make_report(seed, track="sakhir", session="practice 1"):
+    built, teams = DriverBuilder(*generate_session(seed)).build()
+    return LapAnalyzer(built, teams, track, session, "2024").report(session_key=seed)
+
+class CountingStream(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def write(self, text):
+        self.calls += 1
+        return super().write(text)
+
+def test_text_report_is_the_console_summary(capsys, mocker):
+    built, teams = DriverBuilder(*generate_session(2024000)).build()
+    analyzer = LapAnalyzer(built, teams, "sakhir", "practice 1", "2024")
+    build = mocker.spy(lap_analyzer, 'session_report')
+    analyzer.print_summary()
+    analyzer.print_fastest_soft()
+    analyzer.print_race_pace()
+    analyzer.print_team_pace()
+    printed = capsys.readouterr().out
+
+    out = CountingStream()
+    analyzer.summary(out)
+    assert out.getvalue() == printed
+    assert out.calls == 1
+    # one report behind every section, rebuilt after an update
+    assert build.call_count == 1
+    analyzer.update([4])
+    analyzer.print_race_pace()
+    assert build.call_count == 2
+
+def test_report_file_and_query_report_do_not_clash():
+    args = main.parse_args(['--report', 'out.txt', 'query', 'weekend', '--year', '2025', '--track', 'Silverstone'])
+    assert args.report == 'out.txt' and args.query_report == 'weekend'
+
+def test_formats_render_every_session():
+    reports = [make_report(2024000), make_report(2024001, "jeddah", "practice 2")]
+    rows = sum(len(r['fastest_soft']) + len(r['race_pace']) + len(r['team_pace']) for r in reports)
+
+    out = io.StringIO()
+    write_reports(reports, out, 'jsonl')
+    assert [json.loads(line) for line in out.getvalue().splitlines()] == reports
+
+    out = io.StringIO()
+    write_reports(reports, out, 'csv')
+    table = list(csv.DictReader(io.StringIO(out.getvalue())))
+    assert len(table) == rows
+    first = reports[0]['race_pace'][0]
+    assert table[len(reports[0]['fastest_soft'])] == {
+        'year': '2024', 'track': 'sakhir', 'session': 'practice 1', 'session_key': '2024000', 'table': 'race_pace',
+        'rank': '1', 'number': str(first['number']), 'driver': first['driver'], 'team': '',
+        'compound': first['compound'], 'time': repr(first['pace']), 'gap': '0.0',
+        'deg_rate': repr(first['deg_rate']), 'deg_r2': repr(first['deg_r2']), 'sector_1': '', 'sector_2': '',
+        'sector_3': '', 'best_lap': '', 'ideal_gap': '', 'top_speed': ''}
+
+    out = io.StringIO()
+    write_reports(reports, out, 'markdown')
+    text = out.getvalue()
+    assert [line for line in text.splitlines() if line.startswith("## ")] == [
+        "## Practice 1 at Sakhir, 2024", "## Practice 2 at Jeddah, 2024"]
+    assert sum(line.startswith('| ') for line in text.splitlines()) == rows + 6 # + a header row per table
+
+def test_writer_buffers_until_close(tmp_path):
+    reports = [make_report(seed) for seed in range(2024000, 2024006)]
+    out = CountingStream()
+    with ReportWriter(out, 'text') as writer:
+        writer.write_all(reports)
+        assert out.calls == 0
+    assert out.calls == 1 and writer.sessions == 6
+
+    # small buffer: several writes, same output
+    small = CountingStream()
+    write_reports(reports, small, 'text', buffer_size=len(out.getvalue()) // 3)
+    assert small.getvalue() == out.getvalue()
+    assert 1 < small.calls <= 4
+
+    path = tmp_path / "season.md"
+    write_reports(reports, str(path))
+    assert path.read_text(encoding='utf-8').count("\n## ") == 5 # markdown from the extension
+
+def test_format_selection():
+    assert list(FORMATS) == REPORT_FORMATS
+    assert format_for("season.jsonl") == 'jsonl' and format_for("season.CSV") == 'csv'
+    assert format_for("season.md") == 'markdown' and format_for("season.log") == 'text'
+    assert format_for("season.md", 'csv') == 'csv'
+    with pytest.raises(ValueError):
+        format_for("season.txt", 'html')
+
+def test_batch_result_writes_reports_in_job_order(tmp_path):
+    reports = [make_report(2024000), make_report(2024001)]
+    result = BatchResult([
+        {'ok': True, 'report': reports[0]},
+        {'ok': False, 'report': None},
+        {'ok': True, 'report': reports[1]},
+    ])
+    path = tmp_path / "batch.jsonl"
+    writer = result.write_report(str(path))
+    assert writer.sessions == 2 and writer.writes == 1
+    assert [json.loads(line)['session_key'] for line in path.read_text().splitlines()] == [2024000, 2024001]
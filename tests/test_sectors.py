@@ -0,0 +1,113 @@
+import math
+import sqlite3
+import pytest
+from benchmarks.synthetic import generate_session
+from event_pipeline.columnar_store import open_store, write_store
+from event_pipeline.data_filter import DriverBuilder
+from event_pipeline.db_schema import insert_event, insert_session, insert_session_summary, migrate
+from event_pipeline.lap_analyzer import LapAnalyzer
+from event_pipeline.lap_store import RawSessionData, load_raw_session, sync_raw_session
+from event_pipeline.report import MarkdownRenderer, TextRenderer
+from event_pipeline.sectors import SECTOR_FIELDS, SectorColumns, analyse_sectors
+
+def lap(driver, n, s1, s2, s3, st=300, **extra):
+    times = (s1, s2, s3)
+    total = sum(times) if None not in times else None
+    return {"driver_number": driver, "lap_number": n, "lap_duration": total, "duration_sector_1": s1,
+            "duration_sector_2": s2, "duration_sector_3": s3, "i1_speed": 280, "i2_speed": 270, "st_speed": st,
+            **extra}
+
+LAPS = [
+    lap(4, 1, 25.0, 30.0, 20.0, is_pit_out_lap=True, st=340), # out lap: ignored
+    lap(4, 2, 28.0, 31.0, 21.0, st=310),
+    lap(4, 3, 28.5, 30.5, 21.5),
+    lap(4, 4, 27.0, 29.0, 20.0, deleted=True), # deleted: ignored
+    lap(81, 1, 28.2, 30.8, 20.9, st=315),
+    lap(81, 2, 28.1, None, 21.1),
+    lap(16, 1, 29.0, None, 22.0), # no S2 at all: no theoretical best
+]
+
+def reference(lap_data):
+    # per driver best sectors in plain python
+    best = {}
+    for lap in lap_data:
+        if lap.get("deleted") or lap.get("is_pit_out_lap"):
+            continue
+        driver = best.setdefault(lap["driver_number"], {"lap": math.inf, "sectors": [math.inf] * 3, "speed": 0})
+        if lap["lap_duration"] is not None:
+            driver["lap"] = min(driver["lap"], lap["lap_duration"])
+        for idx, name in enumerate(SECTOR_FIELDS):
+            if lap[name] is not None:
+                driver["sectors"][idx] = min(driver["sectors"][idx], lap[name])
+        driver["speed"] = max(driver["speed"], lap["st_speed"] or 0)
+    return best
+
+def test_best_sectors_and_ideal_lap():
+    summary = analyse_sectors(SectorColumns.from_laps(LAPS))
+    norris, piastri, leclerc = summary.get(4), summary.get(81), summary.get(16)
+
+    assert norris.best_sectors == (28.0, 30.5, 21.0) and norris.theoretical_best == pytest.approx(79.5)
+    assert norris.best_lap == 80.0 and norris.ideal_gap == pytest.approx(0.5)
+    assert norris.top_speed == 310
+    assert piastri.best_sectors == (28.1, 30.8, 20.9) and piastri.ideal_gap == pytest.approx(0.1)
+    assert leclerc.best_sectors == (29.0, None, 22.0) and leclerc.theoretical_best is None
+    assert leclerc.best_lap is None and leclerc.ideal_gap is None
+
+    assert summary.session_best == [(4, 28.0), (4, 30.5), (81, 20.9)]
+    assert [d.number for d in summary.ranked()] == [4, 81]
+    assert summary.owned_sectors(4) == [1, 2] and summary.owned_sectors(16) == []
+    assert len(analyse_sectors(SectorColumns())) == 0
+
+def test_ingest_forms_agree(tmp_path):
+    lap_data, driver_data, tire_data = generate_session(2024000)
+    raw = RawSessionData(driver_data, tire_data)
+    list(raw.record(lap_data))
+    write_store(1, raw.laps, driver_data, tire_data, str(tmp_path))
+
+    summary = analyse_sectors(SectorColumns.from_laps(lap_data))
+    expected = {number: d.to_dict() for number, d in summary.drivers.items()}
+    for columns in (SectorColumns.from_records(raw.laps), SectorColumns.from_store(open_store(1, str(tmp_path)))):
+        summary = analyse_sectors(columns)
+        assert {number: d.to_dict() for number, d in summary.drivers.items()} == expected
+
+    for number, best in reference(lap_data).items():
+        driver = expected[number]
+        assert driver["best_sectors"] == tuple(best["sectors"])
+        assert driver["best_lap"] == best["lap"] and driver["top_speed"] == best["speed"]
+        assert driver["ideal_gap"] == pytest.approx(best["lap"] - sum(best["sectors"]))
+
+def test_sectors_are_stored_and_reported():
+    lap_data, driver_data, tire_data = generate_session(2024001)
+    conn = sqlite3.connect(":memory:")
+    migrate(conn)
+    session_id = insert_session(conn, insert_event(conn, "sakhir", 2024), "practice 1", 2024001)
+    raw = RawSessionData(driver_data, tire_data)
+    list(raw.record(lap_data))
+    sync_raw_session(conn, session_id, raw)
+
+    # the Lap table keeps the sector columns
+    columns = SectorColumns.from_laps(load_raw_session(conn, session_id)[0])
+    assert sorted(zip(columns.drivers, columns.lap_numbers, columns.values["duration_sector_2"])) == sorted(
+        (lap["driver_number"], lap["lap_number"], lap["duration_sector_2"]) for lap in lap_data)
+
+    built, teams = DriverBuilder(lap_data, driver_data, tire_data).build()
+    analyzer = LapAnalyzer(built, teams, "sakhir", "practice 1", 2024, sector_laps=columns)
+    insert_session_summary(conn, "sakhir", 2024, "practice 1", 2024001, built.values(), sectors=analyzer.sectors)
+    rows = conn.execute('''
+        SELECT p.number, s.best_sector_1, s.best_sector_2, s.best_sector_3, s.theoretical_best, s.ideal_gap
+        FROM SectorAnalysis s JOIN DriverSessionParticipation p ON p.session_driver_id = s.session_driver_id''')
+    assert {row[0]: row[1:] for row in rows} == {
+        d.number: (*d.best_sectors, d.theoretical_best, d.ideal_gap) for d in analyzer.sectors.drivers.values()}
+    owners = conn.execute('''
+        SELECT b.sector, p.number, b.sector_time FROM SessionSectorBest b
+        JOIN DriverSessionParticipation p ON p.session_driver_id = b.session_driver_id ORDER BY b.sector''')
+    assert [(number, time) for _, number, time in owners] == analyzer.sectors.session_best
+    conn.close()
+
+    report = analyzer.report(k=3)
+    assert [row["rank"] for row in report["theoretical_best"]] == [1, 2, 3]
+    assert report["theoretical_best"][0]["gap"] == 0.0
+    assert len(report["session_best_sectors"]) == 3
+    text = TextRenderer().render(report)
+    assert "Theoretical Best Lap" in text and text.count("THEORETICAL BEST:") == 3
+    assert "### Theoretical Best Lap" in MarkdownRenderer().render(report)
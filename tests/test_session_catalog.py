@@ -0,0 +1,48 @@
+from event_pipeline.session_catalog import SessionCatalog
+
+SESSIONS = [
+    {"session_key": 9500, "meeting_key": 1240, "circuit_short_name": "Spielberg", "year": 2024,
+     "session_name": "Practice 1", "session_type": "Practice", "date_start": "2024-06-28T10:30:00+00:00",
+     "date_end": "2024-06-28T11:30:00+00:00"},
+    {"session_key": 9501, "meeting_key": 1240, "circuit_short_name": "Spielberg", "year": 2024,
+     "session_name": "Qualifying", "session_type": "Qualifying", "date_start": "2024-06-29T14:00:00+00:00",
+     "date_end": "2024-06-29T15:00:00+00:00"},
+]
+
+def test_lookup_is_case_insensitive(tmp_path):
+    catalog = SessionCatalog(str(tmp_path / "catalog.db"))
+    catalog.add_sessions(SESSIONS)
+
+    assert catalog.lookup("spielberg", "2024", "practice 1") == 9500
+    assert catalog.lookup("Spielberg", 2024, "Practice 2") is None
+    assert catalog.has_track("SPIELBERG", 2024)
+    assert [s['session_key'] for s in catalog.sessions_for_meeting(1240)] == [9500, 9501]
+    assert [s['session_key'] for s in catalog.find_sessions([2024], "practice")] == [9500]
+
+def test_resolve_fetches_only_new_sessions(tmp_path, mocker):
+    catalog = SessionCatalog(str(tmp_path / "catalog.db"))
+    catalog.add_sessions(SESSIONS)
+    new_session = {"session_key": 9502, "meeting_key": 1241, "circuit_short_name": "Silverstone", "year": 2024,
+                   "session_name": "Practice 1", "session_type": "Practice"}
+    mock_get = mocker.patch('event_pipeline.session_catalog.get_json', return_value=[new_session])
+
+    assert catalog.resolve("silverstone", 2024, "practice 1") == 9502
+    mock_get.assert_called_once_with("https://api.openf1.org/v1/sessions?session_key>9501", ttl=0)
+
+    # known sessions resolve locally
+    assert catalog.resolve("spielberg", 2024, "qualifying") == 9501
+    mock_get.assert_called_once()
+
+def test_open_sessions_are_fetched_again(tmp_path, mocker):
+    catalog = SessionCatalog(str(tmp_path / "catalog.db"))
+    running = {"session_key": 9503, "meeting_key": 1241, "circuit_short_name": "Silverstone", "year": 2024,
+               "session_name": "Practice 2", "session_type": "Practice", "date_start": "2024-07-05T15:00:00+00:00"}
+    catalog.add_sessions(SESSIONS + [running])
+    assert catalog.open_session_keys() == [9503]
+
+    finished = dict(running, date_end="2024-07-05T16:00:00+00:00")
+    mock_get = mocker.patch('event_pipeline.session_catalog.get_json', return_value=[finished])
+    catalog.refresh()
+    mock_get.assert_called_once_with("https://api.openf1.org/v1/sessions?session_key>=9503", ttl=0)
+    assert catalog.get_session(9503)["date_end"] == finished["date_end"]
+    assert catalog.open_session_keys() == []
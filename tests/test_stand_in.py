@@ -0,0 +1,109 @@
+import sqlite3
+import time
+import pytest
+import requests
+from benchmarks.run import local_api
+from benchmarks.stand_in import RecordingSource, ReplaySource, StandInAPI, SyntheticSource, main, parse_args
+from benchmarks.synthetic import generate_scale
+from event_pipeline.batch import BatchRunner
+from event_pipeline.data_ingestor import DataIngestor, URLBuilder
+from event_pipeline.openf1_client import configure_base_url, get_base_url
+from event_pipeline.session import Session
+
+@pytest.fixture(scope='module')
+def weekend():
+    return generate_scale('weekend')
+
+def analysis_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute('''
+        SELECT d.name, a.fastest_soft_time, a.avg_med_time, a.avg_hard_time FROM Analysis a
+        JOIN DriverSessionParticipation p ON p.session_driver_id = a.session_driver_id
+        JOIN Driver d ON d.driver_id = p.driver_id ORDER BY d.name''').fetchall()
+    conn.close()
+    return rows
+
+def test_base_url_is_configurable(monkeypatch):
+    assert URLBuilder(9472).lap_data_url() == "https://api.openf1.org/v1/laps?session_key=9472"
+    monkeypatch.setenv("OPENF1_BASE_URL", "http://env:8000/v1")
+    assert URLBuilder(9472).tire_data_url() == "http://env:8000/v1/stints?session_key=9472"
+    try:
+        configure_base_url("http://localhost:8000/v1/")
+        assert URLBuilder(9472).driver_data_url() == "http://localhost:8000/v1/drivers?session_key=9472"
+    finally:
+        configure_base_url(None)
+    assert get_base_url() == "http://env:8000/v1"
+
+def test_injected_errors(weekend, tmp_path):
+    catalog, payloads = weekend
+    with StandInAPI.synthetic(catalog, payloads, error_rate=1.0) as api, local_api(api, str(tmp_path)):
+        laps, drivers, stints = DataIngestor(catalog[0]['session_key']).fetch_all()
+    assert (laps, drivers, stints) == ([], [], [])
+    assert sum(api.statuses.values()) == 3 and not api.statuses[200]
+
+def test_rate_limit(weekend):
+    catalog, payloads = weekend
+    with StandInAPI.synthetic(catalog, payloads, rate_limit=2) as api:
+        statuses = [requests.get(f"{api.base_url}/sessions").status_code for _ in range(4)]
+    assert statuses == [200, 200, 429, 429]
+
+def test_latency_and_slow_drip(weekend, tmp_path):
+    catalog, payloads = weekend
+    key = catalog[0]['session_key']
+    with StandInAPI.synthetic(catalog, payloads, latency=0.2, drip_bytes=16384, drip_delay=0.01) as api, \
+            local_api(api, str(tmp_path)):
+        start = time.perf_counter()
+        laps, _, _ = DataIngestor(key, stream=True).fetch_all()
+        laps = list(laps)
+        elapsed = time.perf_counter() - start
+    assert laps == payloads[key][0]
+    assert elapsed >= 0.2 + 0.01 * (len(str(laps)) // 16384 // 2)
+
+def test_record_and_replay(weekend, tmp_path):
+    catalog, payloads = weekend
+    info = catalog[1]
+    args = (info['circuit_short_name'], info['session_name'], str(info['year']))
+    recordings = str(tmp_path / "recorded")
+
+    with StandInAPI.synthetic(catalog, payloads) as upstream, \
+            StandInAPI(RecordingSource(recordings, upstream.base_url)) as recorder, \
+            local_api(recorder, str(tmp_path / "first")):
+        Session(*args, db_path=str(tmp_path / "first.db")).run(show_summary=False)
+        assert recorder.statuses == {200: 4}
+
+    # upstream is gone, the replay serves identical bodies
+    with StandInAPI.replay(recordings) as replay, local_api(replay, str(tmp_path / "second")):
+        Session(*args, db_path=str(tmp_path / "second.db")).run(show_summary=False)
+        assert replay.statuses == {200: 4}
+        assert requests.get(f"{replay.base_url}/laps?session_key=1").status_code == 404
+
+    assert analysis_rows(str(tmp_path / "first.db")) == analysis_rows(str(tmp_path / "second.db"))
+    assert len(analysis_rows(str(tmp_path / "second.db"))) == 20
+
+def test_batch_against_stand_in(weekend, tmp_path):
+    catalog, payloads = weekend
+    jobs = [(s['circuit_short_name'], s['session_name'], str(s['year'])) for s in catalog]
+    with StandInAPI.synthetic(catalog, payloads) as api:
+        result = BatchRunner(jobs, workers=2, cache_options={'cache_dir': str(tmp_path / "cache")},
+                             catalog_path=str(tmp_path / "catalog.db"), base_url=api.base_url,
+                             session_options={'db_path': str(tmp_path / "f1.db")}).run()
+    assert len(result.succeeded) == 3
+    assert api.statuses[200] >= 9
+
+@pytest.mark.parametrize('source, source_type', [
+    (['--synthetic', 'weekend'], SyntheticSource),
+    (['--replay', 'recorded'], ReplaySource),
+    (['--record', 'recorded', '--upstream', 'http://localhost:1/v1'], RecordingSource),
+])
+def test_cli(source, source_type, tmp_path, monkeypatch, mocker, capsys):
+    monkeypatch.chdir(tmp_path)
+    argv = source + ['--port', '0', '--latency', '0.1']
+    args = parse_args(argv)
+    assert args.port == 0 and args.latency == 0.1
+
+    served = mocker.spy(StandInAPI, 'start')
+    mocker.patch('benchmarks.stand_in.time.sleep', side_effect=KeyboardInterrupt)
+    main(argv)
+    api = served.call_args.args[0]
+    assert isinstance(api.source, source_type) and api.server is None
+    assert "OpenF1 stand-in on http://127.0.0.1:" in capsys.readouterr().out
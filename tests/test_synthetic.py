@@ -0,0 +1,54 @@
+import json
+import sqlite3
+from benchmarks import run as bench
+from benchmarks.stand_in import StandInAPI
+from benchmarks.synthetic import generate_catalog, generate_scale, generate_session
+from event_pipeline.data_filter import DriverBuilder
+from event_pipeline.session import Session
+
+def test_generator_is_deterministic():
+    assert generate_session(2024000) == generate_session(2024000)
+    laps, drivers, stints = generate_session(2024000)
+    assert len(drivers) == 20
+    assert {s['compound'] for s in stints} <= {'SOFT', 'MEDIUM', 'HARD'}
+
+    built, teams = DriverBuilder(laps, drivers, stints).build()
+    assert len(built) == 20 and len(teams) == 10
+    assert all(d.fastest_soft_time or d.best_avg for d in built.values())
+
+def test_scales():
+    catalog, payloads = generate_scale('weekend')
+    assert [s['session_name'] for s in catalog] == ['Practice 1', 'Practice 2', 'Practice 3']
+    assert set(payloads) == {s['session_key'] for s in catalog}
+    assert len(generate_catalog((2023, 2024), events=2)) == 12
+
+def test_stand_in_filters():
+    catalog, payloads = generate_scale('weekend')
+    api = StandInAPI.synthetic(catalog, payloads)
+    key = catalog[1]['session_key']
+    assert api.source.query('laps', f'session_key={key}') == payloads[key][0]
+    assert [s['session_key'] for s in api.source.query('sessions', f'session_key>{catalog[0]["session_key"]}')] == \
+        [s['session_key'] for s in catalog[1:]]
+
+def test_session_run_against_stand_in(tmp_path):
+    catalog, payloads = generate_scale('session')
+    info = catalog[0]
+    db_path = str(tmp_path / "f1.db")
+    with StandInAPI.synthetic(catalog, payloads) as api, bench.local_api(api, str(tmp_path)):
+        Session(info['circuit_short_name'], info['session_name'], str(info['year']), db_path=db_path).run(show_summary=False)
+        assert api.requests == 4 # catalog + laps/drivers/stints
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM Analysis").fetchone()[0] == 20
+    conn.close()
+
+def test_benchmark_report(tmp_path):
+    output = tmp_path / "bench.json"
+    assert bench.main(['--scales', 'session', '--repeat', '1', '--output', str(output)]) == 0
+    report = json.loads(output.read_text())
+    names = {r['name'] for r in report['results']}
+    assert {'build[python]', 'summary', 'insert_session_summary', 'session_run[python]'} <= names
+    assert all(r['peak_bytes'] > 0 for r in report['results'])
+    # identical results never count as a regression
+    assert bench.main(['--scales', 'session', '--repeat', '1', '--output', str(tmp_path / "again.json"),
+                       '--compare', str(output), '--threshold', '1000']) == 0
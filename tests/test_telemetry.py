@@ -0,0 +1,146 @@
+import json
+import sqlite3
+import tracemalloc
+import numpy as np
+import pytest
+from benchmarks.run import local_api
+from benchmarks.stand_in import StandInAPI
+from benchmarks.synthetic import generate_car_data, generate_scale, generate_session
+from event_pipeline.cache import get_cache
+from event_pipeline.session import Session
+from event_pipeline import telemetry
+from event_pipeline.telemetry import (Downsampler, TelemetryIngestor, TelemetryWriter, driver_windows, has_telemetry,
+                                      lap_bounds, lap_telemetry, open_telemetry, parse_date)
+
+@pytest.fixture(scope='module')
+def scale():
+    return generate_scale('session')
+
+def car_record(seconds, speed, throttle=100, brake=0):
+    date = f"2024-03-01T12:00:{seconds:06.3f}+00:00"
+    return {"driver_number": 4, "date": date, "speed": speed, "throttle": throttle, "brake": brake}
+
+def reference(laps, records, interval):
+    # per lap (samples, top speed, braking records) straight from the raw records
+    expected, by_driver = {}, {}
+    for bounds in zip(*lap_bounds(laps)):
+        by_driver.setdefault(bounds[0], []).append(bounds[1:])
+    for record in records:
+        bucket = parse_date(record["date"]) // interval * interval
+        number = record["driver_number"]
+        for lap_number, start, end in by_driver[number]:
+            if start <= bucket < end:
+                samples, top, braking = expected.get((number, lap_number), (0, 0, 0))
+                expected[(number, lap_number)] = (samples + 1, max(top, record["speed"]), braking + bool(record["brake"]))
+    return expected
+
+def test_downsample_and_lap_aggregates(tmp_path):
+    records = [car_record(0.1, 200), car_record(0.6, 250, 50), car_record(1.2, 300), car_record(1.5, 120, 0, 100),
+               car_record(2.4, 150, 99), car_record(3.1, 310)]
+    sampler = Downsampler(interval=1.0)
+    for record in records:
+        sampler.add(record)
+    columns = sampler.finish()
+    assert sampler.records == 6
+    assert columns["samples"].tolist() == [2, 2, 1, 1]
+    assert columns["speed_max"].tolist() == [250, 300, 150, 310]
+    assert columns["braking"].tolist() == [0, 1, 0, 0]
+
+    writer = TelemetryWriter(1, str(tmp_path))
+    writer.append(4, columns)
+    writer.close()
+    store = open_telemetry(1, str(tmp_path))
+    assert len(store) == 4 and store.drivers == {4: (0, 4)}
+
+    laps = [{"driver_number": 4, "lap_number": 1, "lap_duration": 2.0, "date_start": "2024-03-01T12:00:00+00:00"},
+            {"driver_number": 4, "lap_number": 2, "lap_duration": None, "date_start": "2024-03-01T12:00:02+00:00"},
+            {"driver_number": 81, "lap_number": 1, "lap_duration": 80.0, "date_start": "2024-03-01T12:00:00+00:00"}]
+    result = lap_telemetry(store, laps)
+    assert result.rows() == [
+        (4, 1, 4, 300.0, 217.5, 62.5, 0.5, 0.25),
+        (4, 2, 2, 310.0, 230.0, 99.5, 1.0, 0.0),
+    ]
+    assert result.top_speed_of(4) == 310.0 and result.top_speed_of(81) is None
+
+def test_windows_match_the_raw_records(scale, tmp_path):
+    catalog, payloads = scale
+    key = catalog[0]["session_key"]
+    laps = [lap for lap in payloads[key][0] if lap["driver_number"] in (4, 81)]
+    records = generate_car_data(laps)
+
+    with StandInAPI.synthetic(catalog, payloads) as api, local_api(api, str(tmp_path)):
+        # imports and HTTP connections are not part of the budget
+        TelemetryIngestor(key, store_dir=str(tmp_path / "warm-up")).load(laps[:1])
+        ingestor = TelemetryIngestor(key, store_dir=str(tmp_path / "telemetry"), window=60, workers=2)
+        tracemalloc.start()
+        store, result = ingestor.load(laps)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    counters = ingestor.metrics.counters
+    assert counters["car_data_records"] == len(records) and counters["telemetry_requests"] > 20
+    assert counters["telemetry_samples"] == len(store) < len(records) / 3
+    assert set(store.drivers) == {4, 81}
+    assert all(np.all(np.diff(store.time[store.driver_slice(n)]) >= 0) for n in store.drivers)
+    # the windows in flight, not the session: well below the raw car_data (stand-in server included)
+    assert peak < len(json.dumps(records)) / 2
+
+    expected = reference(laps, records, store.interval)
+    assert {(n, lap): (samples, top, round(braking * samples))
+            for n, lap, samples, top, _, _, _, braking in result.rows()} == expected
+
+def test_windows_sit_on_bucket_edges():
+    laps = [{"driver_number": 4, "lap_number": 1, "lap_duration": 95.3, "date_start": "2024-03-01T12:00:00.700+00:00"},
+            {"driver_number": 4, "lap_number": 2, "lap_duration": 91.1, "date_start": "2024-03-01T12:01:36+00:00"}]
+    windows = driver_windows(laps, window=40.3, interval=0.5)[4]
+    first, last = parse_date(laps[0]["date_start"]), parse_date(laps[1]["date_start"]) + 91.1
+    assert windows[0][0] <= first < windows[0][0] + 0.5 and windows[-1][1] >= last
+    assert all(start % 0.5 == 0 and end % 0.5 == 0 for start, end in windows)
+    assert all(a[1] == b[0] for a, b in zip(windows, windows[1:])) # contiguous, nothing fetched twice
+    assert {end - start for start, end in windows[:-1]} == {40.5}
+
+def test_failed_window_is_not_reused(scale, tmp_path, mocker):
+    catalog, payloads = scale
+    key = catalog[0]["session_key"]
+    laps = [lap for lap in payloads[key][0] if lap["driver_number"] == 4]
+    stream = telemetry.open_json_stream
+    calls = []
+    def flaky(url, **kwargs):
+        calls.append(url)
+        if len(calls) == 2:
+            raise OSError("429 Too Many Requests")
+        return stream(url, **kwargs)
+
+    with StandInAPI.synthetic(catalog, payloads) as api, local_api(api, str(tmp_path)):
+        mocker.patch.object(telemetry, "open_json_stream", flaky)
+        ingestor = TelemetryIngestor(key, finished=True, store_dir=str(tmp_path / "telemetry"), window=300, workers=1)
+        store, result = ingestor.load(laps)
+        assert ingestor.metrics.counters["telemetry_failed_windows"] == 1 and len(result)
+        assert not has_telemetry(key, str(tmp_path / "telemetry"))
+
+        # the next run of the finished session fetches again instead of keeping the hole
+        mocker.patch.object(telemetry, "open_json_stream", stream)
+        again = TelemetryIngestor(key, finished=True, store_dir=str(tmp_path / "telemetry"), window=300, workers=1)
+        store, _ = again.load(laps)
+        assert again.metrics.counters["telemetry_failed_windows"] == 0
+        assert has_telemetry(key, str(tmp_path / "telemetry")) and len(store) > 0
+        # car_data only lands in the telemetry store, never in the response cache
+        assert get_cache().lookup(calls[0], permanent=True) is None and get_cache().total_bytes() == 0
+
+def test_session_stores_lap_telemetry(scale, tmp_path):
+    catalog, _ = scale
+    info = catalog[0]
+    payloads = {info["session_key"]: generate_session(info["session_key"], laps_per_driver=6)}
+    with StandInAPI.synthetic(catalog, payloads) as api, local_api(api, str(tmp_path)):
+        session = Session(info["circuit_short_name"], info["session_name"], str(info["year"]),
+                          db_path=str(tmp_path / "f1.db"), telemetry_dir=str(tmp_path / "telemetry"))
+        session.run(show_summary=False)
+
+    assert "telemetry" in session.metrics.stage_totals()
+    conn = sqlite3.connect(str(tmp_path / "f1.db"))
+    rows = conn.execute('''
+        SELECT p.number, t.lap_number, t.top_speed FROM LapTelemetry t
+        JOIN DriverSessionParticipation p ON p.session_id = t.session_id AND p.driver_id = t.driver_id''').fetchall()
+    conn.close()
+    assert len(rows) == len(session.telemetry) > 0
+    assert sorted(rows) == sorted((n, lap, top) for n, lap, _, top, *_ in session.telemetry.rows())